@@ -2,31 +2,157 @@ import os
 import logging
 import csv
 import io
-from flask import Flask, render_template, request, flash, redirect, url_for, make_response
+import json
+import hashlib
+import time
+from flask import (Flask, render_template, request, flash, redirect, url_for, make_response,
+                   session, Response, stream_with_context, abort)
 from werkzeug.middleware.proxy_fix import ProxyFix
 from meal_optimizer import MealOptimizer
-import pandas as pd
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib import colors
-from reportlab.lib.units import inch
-
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
-
-# Create the app
-app = Flask(__name__)
+from food_catalog import get_catalog
+from nutrient_targets import targets_for
+from plan_cache import PlanCache
+from plan_table import PlanTable
+from plan_session import PlanSessionStore
+from plan_sensitivity import WhatIfAnalyzer
+from plan_servings import ServingPlanner
+from plan_jobs import PlanJobQueue, SQLiteJobStore, QueueFull
+from chat_backend import ChatTool, ChatSessionStore, backend_from_env
+from solve_pool import SolvePool
+from static_assets import AssetStore, pick_encoding, IMMUTABLE, REVALIDATE
+from page_cache import PageCache
+from pantry import parse_stock, plan_usage, copy_pantry
+import metrics
+from plan_export import (csv_lines, build_plan_pdf, build_combined_pdf, render_plan_files,
+                         export_name, bounded_map, stream_zip)
+from models import db, StoredPlan, Pantry
+
+# Configure logging (LOG_LEVEL=DEBUG for per-solve detail)
+logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO').upper())
+
+# Create the app (static files are served from memory by static_file below)
+app = Flask(__name__, static_folder=None)
 app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key-change-in-production")
 app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
 
-def load_foods_data():
-    """Load foods data from CSV file"""
-    try:
-        return pd.read_csv('foods.csv')
-    except Exception as e:
-        logging.error(f"Error loading foods data: {e}")
-        return pd.DataFrame()
+# Generated plans are kept server-side for exports (see PLAN_STORE_TTL)
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///plans.db')
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'pool_pre_ping': True}
+db.init_app(app)
+with app.app_context():
+    db.create_all()
+
+PLAN_STORE_TTL = float(os.environ.get('PLAN_STORE_TTL', 7 * 24 * 3600))
+
+# Bulk export limits; a combined PDF holds at most this many plans, larger ones come as a ZIP of PDFs
+BULK_EXPORT_MAX_PLANS = int(os.environ.get('BULK_EXPORT_MAX_PLANS', 10000))
+BULK_PDF_BATCH_PLANS = int(os.environ.get('BULK_PDF_BATCH_PLANS', 25))
+BULK_EXPORT_WORKERS = int(os.environ.get('BULK_EXPORT_WORKERS', os.cpu_count() or 1))
+BULK_EXPORT_MIN_PARALLEL = 8
+
+_optimizer = None
+
+def get_optimizer():
+    """Return a MealOptimizer for the current food catalog, rebuilt only when the catalog reloads"""
+    global _optimizer
+    catalog = get_catalog()
+    if _optimizer is None or _optimizer.catalog is not catalog:
+        _optimizer = MealOptimizer(catalog)
+    return _optimizer
+
+# Parse the catalog at import so gunicorn workers start warm
+get_catalog()
+
+# Memoized plans keyed on quantized optimizer inputs (see PLAN_CACHE_* env vars)
+plan_cache = PlanCache.from_env()
+
+# Plans precomputed at deploy time by `python -m plan_table` (None if not built)
+plan_table = PlanTable.open()
+
+# Per-user built models, re-solved incrementally when the form is tweaked
+plan_sessions = PlanSessionStore(
+    max_sessions=int(os.environ.get('PLAN_SESSIONS_MAX', 512)),
+    idle_timeout=float(os.environ.get('PLAN_SESSION_IDLE_TIMEOUT', 1800))
+)
+
+def planner_id():
+    """This browser session's planner id, which keys its warm-start model and its pantry"""
+    if 'planner_id' not in session:
+        session['planner_id'] = PlanSessionStore.new_id()
+    return session['planner_id']
+
+def get_plan_session():
+    """Return this browser session's warm-start model"""
+    return plan_sessions.get(planner_id(), get_optimizer())
+
+# Background pool for opt-in asynchronous plan generation
+plan_jobs = PlanJobQueue(
+    workers=int(os.environ.get('PLAN_JOB_WORKERS', 2)),
+    max_depth=int(os.environ.get('PLAN_JOB_QUEUE_DEPTH', 16)),
+    result_ttl=float(os.environ.get('PLAN_JOB_TTL', 600)),
+    store=SQLiteJobStore(os.environ['PLAN_JOBS_DB']) if os.environ.get('PLAN_JOBS_DB') else None
+)
+
+# Shared solver processes (SOLVE_PROCESSES > 0, set by the ASGI mode in asgi.py); with none,
+# plans are solved in the request's own worker and can warm-start from the user's session
+SOLVE_PROCESSES = int(os.environ.get('SOLVE_PROCESSES', 0))
+solve_pool = SolvePool(SOLVE_PROCESSES) if SOLVE_PROCESSES > 0 else None
+
+# Assistant replies come from CHAT_BACKEND (see chat_backend.py); conversations are kept server-side
+chat_backend = backend_from_env()
+chat_sessions = ChatSessionStore(
+    max_sessions=int(os.environ.get('CHAT_SESSIONS_MAX', 1024)),
+    idle_timeout=float(os.environ.get('CHAT_SESSION_IDLE_TIMEOUT', 1800)),
+    max_messages=int(os.environ.get('CHAT_HISTORY_MESSAGES', 20))
+)
+
+# RDA-based fiber/iron/macro bounds by age and sex on every plan (NUTRIENT_TARGETS=0 to
+# constrain only calories, protein and budget); the plan table is built for both
+NUTRIENT_TARGETS = os.environ.get('NUTRIENT_TARGETS', '1').lower() in ('1', 'true', 'on')
+
+# Opt-in Server-Timing header with the stage spans of each request
+SERVER_TIMING = os.environ.get('SERVER_TIMING', '0').lower() in ('1', 'true', 'on')
+
+metrics.counter('meal_planner_plan_cache_hits', 'Plan cache hits', lambda: plan_cache.hits)
+metrics.counter('meal_planner_plan_cache_misses', 'Plan cache misses', lambda: plan_cache.misses)
+metrics.gauge('meal_planner_plan_cache_hit_ratio', 'Plan cache hit ratio', lambda: plan_cache.stats()['hit_rate'])
+metrics.counter('meal_planner_plan_table_hits', 'Precomputed plan table hits', lambda: plan_table.hits if plan_table else 0)
+metrics.counter('meal_planner_plan_table_misses', 'Precomputed plan table misses', lambda: plan_table.misses if plan_table else 0)
+metrics.gauge('meal_planner_job_queue_depth', 'Plan jobs queued or running', lambda: plan_jobs.depth)
+metrics.counter('meal_planner_job_queue_rejected', 'Plan jobs rejected because the queue was full', lambda: plan_jobs.rejected)
+metrics.gauge('meal_planner_plan_sessions', 'Warm-start planner sessions held', lambda: len(plan_sessions))
+metrics.gauge('meal_planner_chat_sessions', 'Chat conversations held', lambda: len(chat_sessions))
+metrics.counter('meal_planner_page_cache_hits', 'Pages served from the render-once cache', lambda: page_cache.hits)
+metrics.counter('meal_planner_page_cache_renders', 'Pages rendered into the render-once cache', lambda: page_cache.renders)
+metrics.counter('meal_planner_solve_pool_submitted', 'Solves sent to the shared solver processes', lambda: solve_pool.submitted if solve_pool else 0)
+metrics.gauge('meal_planner_catalog_foods', 'Foods in the loaded catalog', lambda: len(get_catalog()))
+
+@app.before_request
+def start_request_timer():
+    request.environ['meal_planner.start'] = time.perf_counter()
+    if SERVER_TIMING:
+        request.environ['meal_planner.spans'] = metrics.start_request_spans()
+
+@app.after_request
+def record_request_time(response):
+    start = request.environ.get('meal_planner.start')
+    if start is None:
+        return response
+    elapsed = time.perf_counter() - start
+    metrics.REQUEST_SECONDS.observe(elapsed, request.endpoint or 'unknown', request.method, str(response.status_code))
+    token = request.environ.pop('meal_planner.spans', None)
+    if token is not None:
+        response.headers['Server-Timing'] = metrics.server_timing(metrics.finish_request_spans(token), elapsed)
+    return response
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Prometheus scrape endpoint (metrics are per worker process)"""
+    return Response(metrics.REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+def wants_async():
+    """Async mode is opt-in per request (async=1) or for every request (PLAN_ASYNC=1)"""
+    return request.values.get('async', os.environ.get('PLAN_ASYNC', '0')).lower() in ('1', 'true', 'on')
 
 def calculate_calorie_needs(age, sex, weight, height, activity_level):
     """Calculate daily calorie needs using Mifflin-St Jeor Equation"""
@@ -61,138 +187,385 @@ def calculate_calorie_needs(age, sex, weight, height, activity_level):
         logging.error(f"Error calculating calorie needs: {e}")
         return 2000, 60  # Default values
 
+# Fingerprinted, precompressed static files, and pages rendered once per deploy
+static_files = AssetStore(os.path.join(app.root_path, 'static'))
+page_cache = PageCache()
+
+# Compile every template at import so no request pays for it
+for template_name in app.jinja_env.list_templates():
+    app.jinja_env.get_template(template_name)
+
+def encoded_response(bodies, content_type, etag, cache_control):
+    """Serve precompressed bodies in the client's best encoding, answering revalidations with 304"""
+    encoding = pick_encoding(request.headers.get('Accept-Encoding', ''), bodies)
+    response = Response(bodies[encoding], content_type=content_type)
+    if encoding != 'identity':
+        response.headers['Content-Encoding'] = encoding
+    if len(bodies) > 1:
+        response.vary.add('Accept-Encoding')
+    response.set_etag(etag if encoding == 'identity' else f"{etag}-{encoding}")
+    response.headers['Cache-Control'] = cache_control
+    return response.make_conditional(request)
+
+def render_cached_page(template_name, version=None, **context):
+    """Render a page that is the same for every visitor once, then serve it from memory
+    
+    Pages carrying flashed messages are per-user and rendered live, as is
+    everything in debug mode so template edits show up.
+    """
+    if app.debug or session.get('_flashes'):
+        return render_template(template_name, **context)
+    page = page_cache.get((template_name, version), lambda: render_template(template_name, **context))
+    return encoded_response(page.bodies, 'text/html; charset=utf-8', page.etag, REVALIDATE)
+
+@app.url_defaults
+def fingerprint_static_urls(endpoint, values):
+    """url_for('static', filename='style.css') -> /static/style.<hash>.css"""
+    if endpoint == 'static' and 'filename' in values:
+        if app.debug:
+            static_files.refresh()
+        values['filename'] = static_files.hashed(values['filename'])
+
+@app.route('/static/<path:filename>', endpoint='static')
+def static_file(filename):
+    """Serve a static file from memory; fingerprinted names are cached by browsers for a year"""
+    if app.debug:
+        static_files.refresh()
+    asset, fingerprinted = static_files.lookup(filename)
+    if asset is None:
+        abort(404)
+    return encoded_response(asset.bodies, asset.content_type, asset.digest,
+                            IMMUTABLE if fingerprinted else REVALIDATE)
+
 @app.route('/')
 def main_index():
     """Render the main healthcare website homepage"""
-    return render_template('main_index.html')
+    return render_cached_page('main_index.html')
 
 @app.route('/meal-planner')
 def meal_planner():
-    """Render the meal planner page"""
-    foods_df = load_foods_data()
-    food_list = foods_df['Food'].tolist() if not foods_df.empty else []
-    return render_template('meal_planner.html', food_list=food_list)
+    """Render the meal planner page, with the food list of the loaded catalog"""
+    catalog = get_catalog()
+    return render_cached_page('meal_planner.html', version=catalog.version, food_list=catalog.names)
 
 @app.route('/chatbot')
 def chatbot():
     """Render the AI health assistant chatbot page"""
-    return render_template('bot.html')
+    return render_cached_page('bot.html')
 
 @app.route('/signin')
 def signin():
     """Render the signin page"""
-    return render_template('signin.html')
+    return render_cached_page('signin.html')
 
 @app.route('/signup')
 def signup():
     """Render the signup page"""
-    return render_template('signup.html')
+    return render_cached_page('signup.html')
 
 @app.route('/forgot-password')
 def forgot_password():
     """Render the forgot password page"""
-    return render_template('forgot-password.html')
+    return render_cached_page('forgot-password.html')
+
+def chat_session_key(client_id):
+    """Conversation key, scoped to the browser session so ids can't be reused across users"""
+    if 'chat_owner' not in session:
+        session['chat_owner'] = PlanSessionStore.new_id()
+    return f"{session['chat_owner']}:{client_id}"
+
+def sse(event, data):
+    """One server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
 @app.route('/chat', methods=['POST'])
 def chat():
-    """Simple chat endpoint for health assistant"""
-    data = request.get_json()
-    user_message = data.get("message", "").strip()
+    """Health assistant chat, streamed as server-sent events when the client accepts them"""
+    data = request.get_json(silent=True) or {}
+    user_message = str(data.get("message", "")).strip()
+    session_id = data.get("session_id", "demo")
     
     if not user_message:
         return {"response": "Please enter your message."}
     
-    # Simple echo response for demo - in production you'd integrate with AI service
-    response_message = f"Thank you for your message: '{user_message}'. This is a demo response. For a complete AI health assistant, please integrate with your preferred AI service (OpenAI, Gemini, etc.)."
+    conversation = chat_sessions.get(chat_session_key(session_id))
+    events = conversation.reply(chat_backend, user_message, CHAT_TOOLS)
+    failure = "I'm having trouble reaching the assistant right now. Please try again in a moment."
+    
+    if data.get('stream') or 'text/event-stream' in request.headers.get('Accept', ''):
+        def generate():
+            try:
+                for event in events:
+                    if event['type'] == 'text':
+                        yield sse('delta', {'text': event['text']})
+                    elif event['type'] == 'tool':
+                        yield sse('tool', {'name': event['name'], 'status': event['result'].get('status')})
+                yield sse('done', {'session_id': session_id, 'type': 'info'})
+            except Exception as e:
+                logging.error(f"Error streaming chat reply: {e}")
+                yield sse('error', {'response': failure, 'type': 'error'})
+        
+        # X-Accel-Buffering stops nginx-style proxies from holding the stream back
+        return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    
+    try:
+        response_message = ''.join(event['text'] for event in events if event['type'] == 'text')
+    except Exception as e:
+        logging.error(f"Error getting chat reply: {e}")
+        return {"response": failure, "session_id": session_id, "type": "error"}
     
     return {
         "response": response_message,
-        "session_id": data.get("session_id", "demo"),
+        "session_id": session_id,
         "type": "info"
     }
 
+def plan_meals_tool(arguments):
+    """Chat tool: a one-day plan for the profile the assistant collected"""
+    profile, error = validate_profile(dict(arguments, plan_days=1))
+    if error:
+        return {'status': 'error', 'message': error}
+    
+    result = solve_profile(get_optimizer(), profile)
+    if result['status'] != 'success':
+        return {'status': 'error', 'message': result['message']}
+    
+    return {
+        'status': 'success',
+        'total_cost': result['total_cost'],
+        'calories': result['nutrition_summary']['calories'],
+        'protein': result['nutrition_summary']['protein'],
+        'meals': {
+            meal: [f"{entry['quantity']:g} g {entry['name']}" for entry in entries]
+            for meal, entries in result['meal_plan'].items()
+        }
+    }
+
+CHAT_TOOLS = [
+    ChatTool(
+        name='plan_meals',
+        description='Build the cheapest one-day Indian meal plan meeting calorie, protein and RDA targets for a person.',
+        parameters={
+            'type': 'object',
+            'properties': {
+                'age': {'type': 'integer'},
+                'sex': {'type': 'string', 'enum': ['male', 'female']},
+                'weight': {'type': 'number', 'description': 'kg'},
+                'height': {'type': 'number', 'description': 'cm'},
+                'activity_level': {'type': 'string', 'enum': ['sedentary', 'lightly_active', 'moderately_active',
+                                                              'very_active', 'extremely_active']},
+                'budget': {'type': 'number', 'description': 'rupees per day'},
+                'dietary_preference': {'type': 'string', 'enum': ['veg', 'eggetarian', 'non_veg']},
+                'portion_mode': {'type': 'string', 'enum': ['grams', 'servings']}
+            },
+            'required': ['age', 'sex', 'weight', 'height', 'activity_level', 'budget', 'dietary_preference']
+        },
+        fn=plan_meals_tool
+    )
+]
+
+def validate_profile(data):
+    """Validate planner inputs, returning (profile, None) or (None, error message)"""
+    age = data.get('age')
+    sex = data.get('sex')
+    weight = data.get('weight')
+    height = data.get('height')
+    activity_level = data.get('activity_level')
+    budget = data.get('budget')
+    dietary_preference = data.get('dietary_preference')
+    pantry_items = data.get('pantry_items') or []
+    plan_days = data.get('plan_days') or 1
+    portion_mode = data.get('portion_mode') or 'grams'
+    
+    if not all([age, sex, weight, height, activity_level, budget, dietary_preference]):
+        return None, 'Please fill in all required fields.'
+    
+    try:
+        age = int(age)
+        weight = float(weight)
+        height = float(height)
+        budget = float(budget)
+    except (TypeError, ValueError):
+        return None, 'Please enter valid numbers for age, weight, height, and budget.'
+    
+    if age < 1 or age > 120:
+        return None, 'Please enter a valid age between 1 and 120.'
+    
+    if weight < 10 or weight > 300:
+        return None, 'Please enter a valid weight between 10 and 300 kg.'
+    
+    if height < 50 or height > 250:
+        return None, 'Please enter a valid height between 50 and 250 cm.'
+    
+    if budget < 10:
+        return None, 'Budget must be at least ₹10 per day.'
+    
+    # A list of names gets the pantry discount; {name: grams} is stock to use up first
+    if isinstance(pantry_items, dict):
+        pantry_items, error = parse_stock(pantry_items)
+        if error:
+            return None, error
+    
+    try:
+        plan_days = int(plan_days)
+    except (TypeError, ValueError):
+        plan_days = 0
+    if plan_days < 1 or plan_days > 7:
+        return None, 'Please choose a plan length between 1 and 7 days.'
+    
+    if portion_mode not in ('grams', 'servings'):
+        return None, 'Portions must be planned in grams or servings.'
+    
+    # Calculate nutritional needs
+    calorie_needs, protein_needs = calculate_calorie_needs(age, sex, weight, height, activity_level)
+    
+    return {
+        'age': age,
+        'sex': sex,
+        'weight': weight,
+        'height': height,
+        'activity_level': activity_level,
+        'budget': budget,
+        'dietary_preference': dietary_preference,
+        'pantry_items': copy_pantry(pantry_items),
+        'plan_days': plan_days,
+        'portion_mode': portion_mode,
+        'calorie_needs': calorie_needs,
+        'protein_needs': protein_needs
+    }, None
+
+def use_stored_pantry(profile):
+    """Plan from this user's saved pantry stock when the request names no pantry items"""
+    if not profile['pantry_items']:
+        profile['pantry_items'] = Pantry.stock(planner_id())
+    return profile
+
+def profile_nutrient_targets(profile):
+    """Nutrient bounds for a validated profile, limited to the catalog's columns"""
+    if not NUTRIENT_TARGETS:
+        return ()
+    return targets_for(profile['age'], profile['sex'], get_catalog().columns)
+
+def solve_profile(target, profile):
+    """Generate a meal plan for a validated profile
+
+    Served from the precomputed plan table for grid profiles, then from the
+    plan cache when a similar profile was solved, otherwise solved by
+    `target` (an optimizer or a user's warm-start session). Multi-day plans
+    are solved as one weekly model, in grams. Single-day plans in whole
+    servings skip the plan table and warm-start session. With a solve
+    pool, every solve runs in the pool instead of `target`.
+    """
+    if solve_pool is not None:
+        target = solve_pool.optimizer(get_catalog())
+    if profile.get('plan_days', 1) > 1:
+        solver = target if solve_pool is not None else get_optimizer()
+        return solver.optimize_weekly_plan(
+            calorie_target=profile['calorie_needs'],
+            protein_target=profile['protein_needs'],
+            budget=profile['budget'],
+            dietary_preference=profile['dietary_preference'],
+            pantry_items=profile['pantry_items'],
+            days=profile['plan_days'],
+            nutrient_targets=profile_nutrient_targets(profile)
+        )
+    if profile.get('portion_mode') == 'servings':
+        planner = solve_pool.optimizer(get_catalog(), 'servings') if solve_pool is not None else ServingPlanner(get_optimizer())
+        return plan_cache.optimize(
+            planner,
+            calorie_target=profile['calorie_needs'],
+            protein_target=profile['protein_needs'],
+            budget=profile['budget'],
+            dietary_preference=profile['dietary_preference'],
+            pantry_items=profile['pantry_items'],
+            nutrient_targets=profile_nutrient_targets(profile),
+            variant='servings'
+        )
+    if plan_table is not None:
+        result = plan_table.lookup(
+            get_optimizer(),
+            calorie_target=profile['calorie_needs'],
+            protein_target=profile['protein_needs'],
+            budget=profile['budget'],
+            dietary_preference=profile['dietary_preference'],
+            pantry_items=profile['pantry_items'],
+            nutrient_targets=profile_nutrient_targets(profile)
+        )
+        if result is not None:
+            return result
+    return plan_cache.optimize(
+        target,
+        calorie_target=profile['calorie_needs'],
+        protein_target=profile['protein_needs'],
+        budget=profile['budget'],
+        dietary_preference=profile['dietary_preference'],
+        pantry_items=profile['pantry_items'],
+        nutrient_targets=profile_nutrient_targets(profile)
+    )
+
+def profile_inputs(profile):
+    """The profile fields shown on results.html"""
+    return {k: v for k, v in profile.items() if k != 'pantry_items'}
+
+def render_plan(result, user_inputs, plan_id=None):
+    """Store a successful single-day or multi-day plan and render it"""
+    with metrics.span('store'):
+        plan_id = StoredPlan.save(result, user_inputs, PLAN_STORE_TTL, plan_id=plan_id).id
+    session['plan_id'] = plan_id
+    with metrics.span('render'):
+        if 'days' in result:
+            return render_template('weekly_results.html',
+                                 days=result['days'],
+                                 total_cost=result['total_cost'],
+                                 distinct_foods=result['distinct_foods'],
+                                 user_inputs=user_inputs,
+                                 plan_id=plan_id)
+        return render_template('results.html', 
+                             meal_plan=result['meal_plan'],
+                             nutrition_summary=result['nutrition_summary'],
+                             total_cost=result['total_cost'],
+                             user_inputs=user_inputs,
+                             plan_id=plan_id)
+
 @app.route('/generate_plan', methods=['POST'])
 def generate_plan():
     """Generate meal plan based on user inputs"""
     try:
         # Get form data
-        age = request.form.get('age')
-        sex = request.form.get('sex')
-        weight = request.form.get('weight')
-        height = request.form.get('height')
-        activity_level = request.form.get('activity_level')
-        budget = request.form.get('budget')
-        dietary_preference = request.form.get('dietary_preference')
-        pantry_items = request.form.getlist('pantry_items')
+        form_data = request.form.to_dict()
+        form_data['pantry_items'] = request.form.getlist('pantry_items')
         
         # Validate inputs
-        if not all([age, sex, weight, height, activity_level, budget, dietary_preference]):
-            flash('Please fill in all required fields.', 'error')
-            return redirect(url_for('index'))
-        
-        try:
-            age = int(age)
-            weight = float(weight)
-            height = float(height)
-            budget = float(budget)
-        except ValueError:
-            flash('Please enter valid numbers for age, weight, height, and budget.', 'error')
-            return redirect(url_for('index'))
-        
-        if age < 1 or age > 120:
-            flash('Please enter a valid age between 1 and 120.', 'error')
-            return redirect(url_for('index'))
-        
-        if weight < 10 or weight > 300:
-            flash('Please enter a valid weight between 10 and 300 kg.', 'error')
-            return redirect(url_for('index'))
-        
-        if height < 50 or height > 250:
-            flash('Please enter a valid height between 50 and 250 cm.', 'error')
-            return redirect(url_for('index'))
-        
-        if budget < 10:
-            flash('Budget must be at least ₹10 per day.', 'error')
+        profile, error = validate_profile(form_data)
+        if error:
+            flash(error, 'error')
             return redirect(url_for('index'))
+        use_stored_pantry(profile)
         
-        # Calculate nutritional needs
-        calorie_needs, protein_needs = calculate_calorie_needs(age, sex, weight, height, activity_level)
-        
-        # Load foods data
-        foods_df = load_foods_data()
-        if foods_df.empty:
+        # Shared optimizer over the cached food catalog
+        optimizer = get_optimizer()
+        if optimizer.catalog.empty:
             flash('Error: Food database not available. Please try again later.', 'error')
             return redirect(url_for('index'))
         
-        # Initialize optimizer
-        optimizer = MealOptimizer(foods_df)
+        if wants_async():
+            # Queue the solve and send the browser to a page that polls for it
+            try:
+                job_id = plan_jobs.submit(solve_profile, get_plan_session(), profile,
+                                          meta={'user_inputs': profile_inputs(profile)})
+            except QueueFull:
+                flash('The planner is busy right now. Please try again in a few seconds.', 'error')
+                response = make_response(render_template('meal_planner.html', food_list=get_catalog().names), 429)
+                response.headers['Retry-After'] = '5'
+                return response
+            return redirect(url_for('plan_job', job_id=job_id), code=303)
         
-        # Generate meal plan
-        result = optimizer.optimize_meal_plan(
-            calorie_target=calorie_needs,
-            protein_target=protein_needs,
-            budget=budget,
-            dietary_preference=dietary_preference,
-            pantry_items=pantry_items
-        )
+        # Generate meal plan, re-solved from this user's previous model when possible
+        result = solve_profile(get_plan_session(), profile)
         
         if result['status'] == 'success':
-            return render_template('results.html', 
-                                 meal_plan=result['meal_plan'],
-                                 nutrition_summary=result['nutrition_summary'],
-                                 total_cost=result['total_cost'],
-                                 alternatives=result['alternatives'],
-                                 user_inputs={
-                                     'age': age,
-                                     'sex': sex,
-                                     'weight': weight,
-                                     'height': height,
-                                     'activity_level': activity_level,
-                                     'budget': budget,
-                                     'dietary_preference': dietary_preference,
-                                     'calorie_needs': calorie_needs,
-                                     'protein_needs': protein_needs
-                                 })
+            return render_plan(result, profile_inputs(profile))
         else:
             flash(result['message'], 'error')
             return redirect(url_for('index'))
@@ -202,85 +575,373 @@ def generate_plan():
         flash('An error occurred while generating your meal plan. Please try again.', 'error')
         return redirect(url_for('index'))
 
-@app.route('/export_csv')
-def export_csv():
-    """Export meal plan as CSV"""
+def read_batch_profiles():
+    """Read batch profiles from a JSON body or a CSV body/upload"""
+    if request.is_json:
+        data = request.get_json()
+        return data.get('profiles', []) if isinstance(data, dict) else data
+    
+    upload = request.files.get('file')
+    text = upload.read().decode('utf-8-sig') if upload else request.get_data(as_text=True)
+    profiles = []
+    for row in csv.DictReader(io.StringIO(text)):
+        # Pantry items are ';'-separated in a single CSV column
+        row['pantry_items'] = [item.strip() for item in (row.get('pantry_items') or '').split(';') if item.strip()]
+        profiles.append(row)
+    return profiles
+
+@app.route('/api/plans/batch', methods=['POST'])
+def batch_plans():
+    """Plan a roster of profiles, streaming one NDJSON line per profile as it is solved"""
     try:
-        # Get meal plan data from session or form (simplified for demo)
-        # In production, you'd want to store this data properly
-        output = io.StringIO()
-        writer = csv.writer(output)
-        
-        writer.writerow(['Meal Plan Export'])
-        writer.writerow(['Meal', 'Food', 'Quantity (g)', 'Cost (₹)'])
-        
-        # This would be populated with actual meal plan data
-        writer.writerow(['Breakfast', 'Sample Food', '100', '10'])
-        
-        response = make_response(output.getvalue())
-        response.headers['Content-Type'] = 'text/csv'
-        response.headers['Content-Disposition'] = 'attachment; filename=meal_plan.csv'
-        
-        return response
+        raw_profiles = read_batch_profiles()
     except Exception as e:
-        logging.error(f"Error exporting CSV: {e}")
-        flash('Error exporting CSV. Please try again.', 'error')
-        return redirect(url_for('index'))
+        logging.error(f"Error reading batch profiles: {e}")
+        return {"error": "Could not parse profiles. Send JSON or CSV."}, 400
+    
+    if not isinstance(raw_profiles, list) or not raw_profiles:
+        return {"error": "No profiles provided."}, 400
+    
+    optimizer = get_optimizer()
+    if optimizer.catalog.empty:
+        return {"error": "Food database not available. Please try again later."}, 503
+    
+    profiles, invalid = [], []
+    for i, raw in enumerate(raw_profiles):
+        profile, error = validate_profile(raw if isinstance(raw, dict) else {})
+        if error:
+            invalid.append((i, error))
+        else:
+            profiles.append((i, raw.get('id'), profile))
+    
+    def generate():
+        for i, error in invalid:
+            yield json.dumps({'index': i, 'id': raw_profiles[i].get('id') if isinstance(raw_profiles[i], dict) else None,
+                              'status': 'error', 'message': error}) + '\n'
+        
+        problems = [
+            {
+                'calorie_target': profile['calorie_needs'],
+                'protein_target': profile['protein_needs'],
+                'budget': profile['budget'],
+                'dietary_preference': profile['dietary_preference'],
+                'pantry_items': profile['pantry_items'],
+                'nutrient_targets': profile_nutrient_targets(profile)
+            }
+            for _, _, profile in profiles
+        ]
+        for j, result in optimizer.optimize_batch(problems):
+            i, profile_id, profile = profiles[j]
+            if result['status'] == 'success':
+                # Stored so the cohort can be downloaded from /api/plans/export
+                user_inputs = dict(profile_inputs(profile), patient_id=profile_id)
+                result = dict(result, plan_id=StoredPlan.save(result, user_inputs, PLAN_STORE_TTL).id)
+            yield json.dumps({
+                'index': i,
+                'id': profile_id,
+                'calorie_needs': profile['calorie_needs'],
+                'protein_needs': profile['protein_needs'],
+                **result
+            }) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/plans/jobs/<job_id>')
+def plan_job(job_id):
+    """Render an asynchronously generated plan, or a page that polls until it is ready"""
+    job = plan_jobs.get(job_id)
+    if job is None:
+        abort(404)
+    
+    user_inputs = job['meta'].get('user_inputs', {})
+    if job['status'] in ('queued', 'running'):
+        return render_template('results.html',
+                             pending_job=job,
+                             status_url=url_for('plan_job_status', job_id=job_id),
+                             meal_plan={},
+                             nutrition_summary={},
+                             total_cost=0,
+                             user_inputs=user_inputs)
+    
+    result = job['result'] or {'status': 'error', 'message': job['error']}
+    if result['status'] != 'success':
+        flash(result['message'], 'error')
+        return redirect(url_for('meal_planner'))
+    
+    # Keyed by the job id so reloading the page does not store the plan twice
+    return render_plan(result, user_inputs, plan_id=job_id)
+
+@app.route('/api/jobs/<job_id>')
+def plan_job_status(job_id):
+    """Poll the status of a plan job"""
+    job = plan_jobs.get(job_id)
+    if job is None:
+        return {"error": "Unknown job."}, 404
+    return {
+        "id": job['id'],
+        "status": job['status'],
+        "error": job['error'],
+        "result": job['result'],
+        "queue_depth": plan_jobs.depth
+    }
+
+@app.route('/api/plans/weekly', methods=['POST'])
+def weekly_plan():
+    """Solve a multi-day plan (7 days unless plan_days is given) for a JSON profile"""
+    data = dict(request.get_json(silent=True) or {})
+    data.setdefault('plan_days', 7)
+    profile, error = validate_profile(data)
+    if error:
+        return {"error": error}, 400
+    
+    if get_optimizer().catalog.empty:
+        return {"error": "Food database not available. Please try again later."}, 503
+    
+    profile['plan_days'] = max(profile['plan_days'], 2)
+    result = solve_profile(get_optimizer(), use_stored_pantry(profile))
+    return result, (200 if result['status'] == 'success' else 422)
+
+@app.route('/api/plans/what-if', methods=['POST'])
+def what_if():
+    """Shadow prices, reduced costs, an optional budget/protein sweep and the minimum budget for a JSON profile"""
+    data = dict(request.get_json(silent=True) or {})
+    profile, error = validate_profile(data)
+    if error:
+        return {"error": error}, 400
+    
+    sweep = data.get('sweep')
+    if sweep is not None:
+        try:
+            sweep = {
+                'parameter': str(sweep['parameter']),
+                'start': float(sweep['start']),
+                'stop': float(sweep['stop']),
+                'steps': int(sweep.get('steps', 10))
+            }
+        except (KeyError, TypeError, ValueError):
+            return {"error": "sweep needs parameter, start, stop and optionally steps."}, 400
+    
+    optimizer = get_optimizer()
+    if optimizer.catalog.empty:
+        return {"error": "Food database not available. Please try again later."}, 503
+    
+    use_stored_pantry(profile)
+    result = WhatIfAnalyzer(optimizer).analyze(
+        calorie_target=profile['calorie_needs'],
+        protein_target=profile['protein_needs'],
+        budget=profile['budget'],
+        dietary_preference=profile['dietary_preference'],
+        pantry_items=profile['pantry_items'],
+        sweep=sweep,
+        nutrient_targets=profile_nutrient_targets(profile)
+    )
+    result.update(calorie_needs=profile['calorie_needs'], protein_needs=profile['protein_needs'])
+    return result, (400 if result['status'] == 'error' else 200)
+
+@app.route('/api/pantry', methods=['GET', 'PUT', 'PATCH'])
+def pantry_api():
+    """This user's pantry stock in grams: GET it, PUT a new one, or PATCH some foods (null removes one)"""
+    owner = planner_id()
+    if request.method == 'GET':
+        return {"items": Pantry.stock(owner)}
+    
+    data = request.get_json(silent=True)
+    items = data['items'] if isinstance(data, dict) and isinstance(data.get('items'), dict) else data
+    removed = []
+    if request.method == 'PATCH' and isinstance(items, dict):
+        removed = [name for name, grams in items.items() if grams is None]
+        items = {name: grams for name, grams in items.items() if grams is not None}
+    stock, error = parse_stock(items, known=get_catalog().name_index)
+    if error:
+        return {"error": error}, 400
+    
+    if request.method == 'PUT':
+        return {"items": Pantry.replace(owner, stock)}
+    return {"items": Pantry.update(owner, {**stock, **dict.fromkeys(removed)})}
+
+@app.route('/api/pantry/accept', methods=['POST'])
+def accept_plan():
+    """Deduct what a stored plan (or one day of a multi-day plan) takes from this user's pantry
+    
+    Accepting the same plan or day again deducts nothing, so the button can be retried.
+    """
+    data = request.get_json(silent=True) or {}
+    stored = StoredPlan.get_live(data.get('plan_id') or session.get('plan_id'))
+    if stored is None:
+        return {"error": "That meal plan is unknown or has expired."}, 404
+    
+    plan = stored.plan
+    day = data.get('day')
+    if 'days' in plan:
+        days = [d['day'] for d in plan['days']]
+        if day is not None and day not in days:
+            return {"error": f"day must be one of {days}."}, 400
+        usage = {f"{stored.id}:{d}": plan_usage(plan, d) for d in days if day is None or d == day}
+    else:
+        usage = {stored.id: plan_usage(plan)}
+    
+    items, accepted = Pantry.accept(planner_id(), usage)
+    return {
+        "items": items,
+        "accepted": accepted,
+        "already_accepted": [key for key in usage if key not in accepted]
+    }
+
+@app.route('/api/alternatives/<food>')
+def food_alternatives(food):
+    """Similar, cheaper substitutes for one food (?diet=veg&k=3, and exclude= once per food to leave out)
+
+    results.html calls this when a food's alternatives are opened, so plans
+    don't compute suggestions nobody looks at.
+    """
+    optimizer = get_optimizer()
+    if food not in optimizer.catalog.name_index:
+        return {"error": f"Unknown food: {food}"}, 404
+    
+    k = max(1, min(request.args.get('k', 3, type=int), 10))
+    diet = request.args.get('diet', 'non_veg')
+    alternatives = optimizer.substitutes.alternatives(
+        [food], allowed=optimizer.catalog.indices_for(diet), exclude=request.args.getlist('exclude'), k=k
+    )
+    return {"food": food, "diet": diet, "alternatives": alternatives[food]}
+
+@app.route('/api/plans/jobs', methods=['POST'])
+def submit_plan_job():
+    """Queue a plan for a JSON profile; returns 202 with a job id, or 429 when the queue is full"""
+    profile, error = validate_profile(request.get_json(silent=True) or {})
+    if error:
+        return {"error": error}, 400
+    
+    optimizer = get_optimizer()
+    if optimizer.catalog.empty:
+        return {"error": "Food database not available. Please try again later."}, 503
+    
+    try:
+        job_id = plan_jobs.submit(solve_profile, optimizer, profile,
+                                  meta={'user_inputs': profile_inputs(profile)})
+    except QueueFull:
+        return {"error": "The planner is busy right now. Please try again in a few seconds."}, 429, {'Retry-After': '5'}
+    
+    return {
+        "job_id": job_id,
+        "status_url": url_for('plan_job_status', job_id=job_id),
+        "result_url": url_for('plan_job', job_id=job_id)
+    }, 202
+
+def get_stored_plan():
+    """The plan named by ?plan_id=, defaulting to the last one generated in this session"""
+    return StoredPlan.get_live(request.args.get('plan_id') or session.get('plan_id'))
+
+@app.route('/export_csv')
+def export_csv():
+    """Export a stored meal plan as CSV, streamed row by row"""
+    stored = get_stored_plan()
+    if stored is None:
+        flash('That meal plan has expired. Please generate a new one.', 'error')
+        return redirect(url_for('meal_planner'))
+    
+    response = Response(stream_with_context(csv_lines(stored.plan)), mimetype='text/csv')
+    response.headers['Content-Disposition'] = f'attachment; filename=meal_plan_{stored.id[:8]}.csv'
+    return response
 
 @app.route('/export_pdf')
 def export_pdf():
-    """Export meal plan as PDF"""
+    """Export a stored meal plan as PDF, rendered once and then served from the store"""
+    stored = get_stored_plan()
+    if stored is None:
+        flash('That meal plan has expired. Please generate a new one.', 'error')
+        return redirect(url_for('meal_planner'))
+    
     try:
-        buffer = io.BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=letter)
-        elements = []
-        
-        styles = getSampleStyleSheet()
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=24,
-            spaceAfter=30,
-            textColor=colors.HexColor('#d2691e')
-        )
-        
-        elements.append(Paragraph("Smart Indian Meal Planner", title_style))
-        elements.append(Spacer(1, 12))
-        
-        # Add meal plan table (simplified)
-        data = [
-            ['Meal', 'Food', 'Quantity (g)', 'Cost (₹)'],
-            ['Breakfast', 'Sample Food', '100', '10'],
-            ['Lunch', 'Sample Food', '150', '15'],
-            ['Snack', 'Sample Food', '50', '5'],
-            ['Dinner', 'Sample Food', '120', '12']
-        ]
-        
-        table = Table(data)
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#d2691e')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 14),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        
-        elements.append(table)
-        doc.build(elements)
-        
-        buffer.seek(0)
-        response = make_response(buffer.getvalue())
-        response.headers['Content-Type'] = 'application/pdf'
-        response.headers['Content-Disposition'] = 'attachment; filename=meal_plan.pdf'
-        
-        return response
+        if stored.pdf is None:
+            stored.pdf = build_plan_pdf(stored.plan, stored.user_inputs)
+            stored.pdf_etag = hashlib.sha1(stored.pdf).hexdigest()
+            db.session.commit()
     except Exception as e:
+        db.session.rollback()
         logging.error(f"Error exporting PDF: {e}")
         flash('Error exporting PDF. Please try again.', 'error')
-        return redirect(url_for('index'))
+        return redirect(url_for('meal_planner'))
+    
+    # A stored plan never changes, so its PDF can be revalidated by ETag alone
+    response = make_response(stored.pdf)
+    response.headers['Content-Type'] = 'application/pdf'
+    response.headers['Content-Disposition'] = f'attachment; filename=meal_plan_{stored.id[:8]}.pdf'
+    response.headers['Cache-Control'] = 'private, max-age=3600'
+    response.set_etag(stored.pdf_etag)
+    return response.make_conditional(request)
+
+@app.route('/api/plans/export', methods=['POST'])
+def bulk_export():
+    """Stream stored plans as a ZIP of per-plan PDFs/CSVs, or as multi-page PDFs
+
+    format='pdf' returns one PDF of up to BULK_PDF_BATCH_PLANS plans, and
+    a ZIP of such PDFs for more, so no document grows with the export.
+    """
+    data = request.get_json(silent=True) or {}
+    plan_ids = data.get('plan_ids') or request.form.getlist('plan_id')
+    export_format = data.get('format') or request.form.get('format', 'zip')
+    formats = tuple(data.get('files') or request.form.getlist('files') or ('pdf', 'csv'))
+    
+    if not isinstance(plan_ids, list) or not plan_ids or not all(isinstance(p, str) for p in plan_ids):
+        return {"error": "Provide plan_ids as a list of plan ids."}, 400
+    if export_format not in ('zip', 'pdf'):
+        return {"error": "format must be 'zip' or 'pdf'."}, 400
+    if not formats or not set(formats) <= {'pdf', 'csv'}:
+        return {"error": "files must be a subset of ['pdf', 'csv']."}, 400
+    if len(plan_ids) > BULK_EXPORT_MAX_PLANS:
+        return {"error": f"At most {BULK_EXPORT_MAX_PLANS} plans can be exported at once."}, 413
+    
+    missing = StoredPlan.missing(plan_ids)
+    if missing:
+        return {"error": "Some plans are unknown or have expired.", "missing": missing}, 404
+    
+    if export_format == 'pdf':
+        def batches():
+            batch, first = [], 1
+            for position, stored in enumerate(StoredPlan.iter_live(plan_ids), start=1):
+                batch.append((stored.plan, stored.user_inputs))
+                if len(batch) == BULK_PDF_BATCH_PLANS:
+                    yield (first, position), (batch,)
+                    batch, first = [], position + 1
+            if batch:
+                yield (first, first + len(batch) - 1), (batch,)
+        
+        if len(plan_ids) <= BULK_PDF_BATCH_PLANS:
+            _, (batch,) = next(batches())
+            response = make_response(build_combined_pdf(batch))
+            response.headers['Content-Type'] = 'application/pdf'
+            response.headers['Content-Disposition'] = 'attachment; filename=meal_plans.pdf'
+            return response
+        
+        # Larger exports are a ZIP of one PDF per batch, rendered in the pool and streamed as they finish
+        workers = min(BULK_EXPORT_WORKERS, -(-len(plan_ids) // BULK_PDF_BATCH_PLANS))
+        rendered = bounded_map(build_combined_pdf, batches(), max_workers=workers, window=2 * max(workers, 1))
+        documents = ((f"meal_plans_{first:04d}-{last:04d}.pdf", pdf) for (first, last), pdf in rendered)
+        response = Response(stream_with_context(stream_zip(documents)), mimetype='application/zip')
+        response.headers['Content-Disposition'] = 'attachment; filename=meal_plans.zip'
+        return response
+    
+    workers = BULK_EXPORT_WORKERS if len(plan_ids) >= BULK_EXPORT_MIN_PARALLEL else 0
+    
+    def tasks():
+        for stored in StoredPlan.iter_live(plan_ids):
+            label = stored.user_inputs.get('patient_id') or stored.id[:8]
+            yield (label, stored.pdf), (stored.plan, stored.user_inputs,
+                                        tuple(f for f in formats if f != 'pdf' or stored.pdf is None))
+    
+    def entries():
+        rendered = bounded_map(render_plan_files, tasks(), max_workers=workers, window=2 * max(workers, 1))
+        for position, ((label, cached_pdf), files) in enumerate(rendered, start=1):
+            files = dict(files)
+            if cached_pdf is not None and 'pdf' in formats:
+                files['pdf'] = cached_pdf
+            for extension in formats:
+                yield export_name(position, str(label), extension), files[extension]
+    
+    response = Response(stream_with_context(stream_zip(entries())), mimetype='application/zip')
+    response.headers['Content-Disposition'] = 'attachment; filename=meal_plans.zip'
+    return response
 
 @app.errorhandler(404)
 def not_found(error):
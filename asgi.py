@@ -0,0 +1,243 @@
+"""ASGI serving mode: one event-loop worker per host, solves in a shared process pool.
+
+    gunicorn -k asgi -w 1 --worker-connections 1000 asgi:application
+
+Cheap GET routes (the static pages, /static/ and /metrics) are answered
+inline on the event loop. Every other route runs the Flask app in a
+thread (ASGI_THREADS of them), streaming its body back chunk by chunk,
+so /chat and /api/plans/batch still stream. Plan solves from those
+threads go to SOLVE_PROCESSES solver processes (see solve_pool.py) and
+wait there without holding the GIL.
+
+Worker sizing (measured with `python -m benchmarks.load_servers`):
+
+- SOLVE_PROCESSES = cores (the default). Solves are CPU-bound and
+  single-threaded, so more processes than cores only adds queueing.
+- ASGI_THREADS = requests that may be in flight at once past the loop:
+  slow chat replies and queued solves mostly wait, so 32-64 per worker
+  is cheap (a thread costs well under 1 MB, a sync worker 100-200 MB).
+- One ASGI worker (-w 1) up to ~4 cores. Past that, add one worker per
+  ~4 cores with SOLVE_PROCESSES=4 each, so the event loop and Flask's
+  own CPU time don't become the bottleneck. Each worker holds its own
+  plan cache, chat sessions and solver processes.
+- Warm-start planner sessions don't apply here (a user's next solve may
+  land in another solver process); the plan cache and plan table still do.
+
+Compare the sync setup (`gunicorn -w 2*cores+1 app:app`), where each
+worker is a full copy of the app and one slow solve or chat reply
+occupies it entirely. On one core with the plan cache off and 8-96
+clients, 3 sync workers served 60-65 req/s in 350-650 MB (PSS); one
+ASGI worker with one solver process served 140-180 req/s in ~200 MB,
+with page p95 latency of 7-93 ms instead of 0.2-1.7 s.
+"""
+import os
+import io
+import sys
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Dict, List, Any, Tuple, Iterator
+
+os.environ.setdefault('SOLVE_PROCESSES', str(os.cpu_count() or 1))
+
+from app import app, solve_pool
+
+ASGI_THREADS = int(os.environ.get('ASGI_THREADS', 32))
+
+# GET routes that render a template or read a file and never solve or call out
+LOOP_PATHS = {'/', '/meal-planner', '/chatbot', '/signin', '/signup', '/forgot-password', '/metrics'}
+LOOP_PREFIXES = ('/static/',)
+
+_threads = ThreadPoolExecutor(max_workers=ASGI_THREADS, thread_name_prefix='asgi-wsgi')
+
+
+def _environ(scope: Dict[str, Any], body: bytes) -> Dict[str, Any]:
+    """WSGI environ for an ASGI http scope"""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': str(server[0]),
+        'SERVER_PORT': str(server[1] or 80),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': str(client[0]),
+        'REMOTE_PORT': str(client[1]),
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+            continue
+        if name == 'CONTENT_LENGTH':
+            continue
+        key = f"HTTP_{name}"
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+def _call_app(environ: Dict[str, Any]) -> Tuple[Dict[str, Any], Any]:
+    """Call the Flask app; returns the (lazily filled) response start and the body iterable"""
+    start: Dict[str, Any] = {}
+
+    def start_response(status: str, headers: List[Tuple[str, str]], exc_info=None):
+        start['status'] = int(status.split(' ', 1)[0])
+        start['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+
+    return start, app(environ, start_response)
+
+
+def _start_message(start: Dict[str, Any]) -> Dict[str, Any]:
+    return {'type': 'http.response.start', 'status': start['status'], 'headers': start['headers']}
+
+
+def _batches(environ: Dict[str, Any]) -> Iterator[List[Dict[str, Any]]]:
+    """Run the Flask app, yielding ASGI messages in batches as the body is produced
+
+    A response with a Content-Length is complete for the client once its
+    last byte is out, so its last chunk is held back and sent in the same
+    batch as the end of the response: gunicorn reads the next keep-alive
+    request only once the app returns, and loses one that arrives while
+    the app is still running. Chunked responses (event streams, NDJSON)
+    end with the terminating chunk, so their chunks go out as produced.
+    """
+    start, body = _call_app(environ)
+    pending: List[Dict[str, Any]] = []
+    framed = None
+    try:
+        for chunk in body:
+            if not chunk:
+                continue
+            if framed is None:
+                pending.append(_start_message(start))
+                framed = any(name == b'content-length' for name, _ in start['headers'])
+            pending.append({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            ready = len(pending) - 1 if framed else len(pending)
+            if ready:
+                yield pending[:ready]
+                del pending[:ready]
+        if framed is None:
+            pending.append(_start_message(start))
+        if pending and pending[-1]['type'] == 'http.response.body':
+            pending[-1]['more_body'] = False
+        else:
+            pending.append({'type': 'http.response.body', 'body': b'', 'more_body': False})
+        yield pending
+    finally:
+        if hasattr(body, 'close'):
+            body.close()
+
+
+async def _respond_inline(environ: Dict[str, Any], send):
+    """Run a cheap route on the event loop itself"""
+    for batch in _batches(environ):
+        for message in batch:
+            await send(message)
+
+
+async def _respond_in_thread(environ: Dict[str, Any], send):
+    """Run a route in a pool thread, sending its batches from this task
+
+    The thread waits for each batch to be sent, so a slow client slows
+    the producer down instead of buffering the whole body, and a
+    disconnect stops it. This task returns right after the last batch,
+    while the thread finishes closing the response.
+    """
+    loop = asyncio.get_running_loop()
+    outbox: asyncio.Queue = asyncio.Queue()
+    aborted = threading.Event()
+
+    def forward(messages: List[Dict[str, Any]]):
+        if aborted.is_set():
+            raise ConnectionError('client went away')
+        sent: Future = Future()
+        loop.call_soon_threadsafe(outbox.put_nowait, (messages, sent))
+        while True:
+            try:
+                return sent.result(timeout=1.0)
+            except TimeoutError:
+                if aborted.is_set():
+                    raise ConnectionError('client went away')
+
+    def produce():
+        try:
+            for batch in _batches(environ):
+                forward(batch)
+        except BaseException as e:
+            loop.call_soon_threadsafe(outbox.put_nowait, (e, None))
+
+    loop.run_in_executor(_threads, produce)
+    try:
+        while True:
+            messages, sent = await outbox.get()
+            if isinstance(messages, BaseException):
+                raise messages
+            for message in messages:
+                await send(message)
+            sent.set_result(None)
+            if messages[-1]['type'] == 'http.response.body' and not messages[-1]['more_body']:
+                return
+    except BaseException:
+        aborted.set()
+        raise
+
+
+async def _read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            break
+    return b''.join(chunks)
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            if solve_pool is not None:
+                # Spawn the solver processes now rather than on the first request
+                await asyncio.get_running_loop().run_in_executor(None, solve_pool.warm)
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            if solve_pool is not None:
+                solve_pool.close()
+            _threads.shutdown(wait=False)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    """ASGI entry point wrapping the Flask app"""
+    if scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        # No websocket routes
+        return
+
+    environ = _environ(scope, await _read_body(receive))
+    try:
+        if scope['method'] in ('GET', 'HEAD') and (scope['path'] in LOOP_PATHS
+                                                    or scope['path'].startswith(LOOP_PREFIXES)):
+            await _respond_inline(environ, send)
+        else:
+            await _respond_in_thread(environ, send)
+    except Exception as e:
+        # Usually the client going away mid-stream
+        logging.warning(f"ASGI request {scope['method']} {scope['path']} ended early: {e}")
@@ -0,0 +1,105 @@
+"""Benchmark LP model construction time against catalog size.
+
+Compares the vectorized MealOptimizer._build_model with the previous
+row-by-row (iterrows + ``+=``) construction on synthetic catalogs.
+
+    python -m benchmarks.bench_model_build
+    python -m benchmarks.bench_model_build --sizes 100 1000 10000 --legacy-max 2000 --json build.json
+"""
+import argparse
+import time
+import numpy as np
+import pandas as pd
+import pulp
+from food_catalog import FoodCatalog, AFFINITY_SUFFIX, SERVING_COLUMN
+from meal_optimizer import MealOptimizer
+from benchmarks.report import write_json
+
+
+def synthetic_foods(size: int, seed: int = 0) -> pd.DataFrame:
+    """Build a catalog of `size` foods by jittering rows of foods.csv"""
+    rng = np.random.default_rng(seed)
+    base = pd.read_csv('foods.csv')
+    rows = base.iloc[rng.integers(0, len(base), size)].reset_index(drop=True)
+    numeric = [column for column in rows.select_dtypes('number').columns
+               if not column.endswith(AFFINITY_SUFFIX) and column != SERVING_COLUMN]
+    rows[numeric] = rows[numeric] * rng.uniform(0.8, 1.2, (size, len(numeric)))
+    rows['Cost'] = rows['Cost'].clip(lower=1)
+    rows['Food'] = [f"{name} #{i}" for i, name in enumerate(rows['Food'])]
+    return rows
+
+
+def legacy_build(available_foods: pd.DataFrame, calorie_target: float,
+                 protein_target: float, budget: float, pantry_items: list) -> pulp.LpProblem:
+    """The original row-by-row model construction, kept for comparison"""
+    prob = pulp.LpProblem("Meal_Plan_Optimization", pulp.LpMinimize)
+    food_vars = {}
+    for idx, food in available_foods.iterrows():
+        food_vars[food['Food']] = pulp.LpVariable(f"food_{idx}", lowBound=0, cat='Continuous')
+    cost_expr = 0
+    for idx, food in available_foods.iterrows():
+        cost_per_gram = food['Cost'] / 100
+        if food['Food'] in pantry_items:
+            cost_per_gram *= 0.5
+        cost_expr += food_vars[food['Food']] * cost_per_gram
+    prob += cost_expr
+    calorie_expr = 0
+    for idx, food in available_foods.iterrows():
+        calorie_expr += food_vars[food['Food']] * (food['Kcal'] / 100)
+    prob += calorie_expr >= calorie_target * 0.95
+    prob += calorie_expr <= calorie_target * 1.05
+    protein_expr = 0
+    for idx, food in available_foods.iterrows():
+        protein_expr += food_vars[food['Food']] * (food['Protein'] / 100)
+    prob += protein_expr >= protein_target
+    budget_expr = 0
+    for idx, food in available_foods.iterrows():
+        budget_expr += food_vars[food['Food']] * (food['Cost'] / 100)
+    prob += budget_expr <= budget
+    for idx, food in available_foods.iterrows():
+        prob += food_vars[food['Food']] <= 500
+    return prob
+
+
+def best_of(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[68, 250, 1000, 2500, 5000, 10000])
+    parser.add_argument('--legacy-max', type=int, default=2500,
+                        help='largest catalog to time the legacy builder on (it is quadratic)')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', metavar='PATH', help="write results as JSON ('-' for stdout)")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'foods':>8} {'vectorized ms':>14} {'legacy ms':>12} {'speedup':>8}")
+    for size in args.sizes:
+        foods = synthetic_foods(size)
+        optimizer = MealOptimizer(FoodCatalog.from_frame(foods))
+        food_idx = optimizer.catalog.indices_for('non_veg')
+        pantry = foods['Food'].iloc[::10].tolist()
+
+        vectorized = best_of(
+            lambda: optimizer._build_model(food_idx, 2200, 60, 150, pantry), args.repeat
+        )
+        results.append({'foods': size, 'builder': 'vectorized', 'min_ms': round(vectorized * 1000, 4)})
+        if size <= args.legacy_max:
+            legacy = best_of(lambda: legacy_build(foods, 2200, 60, 150, pantry), args.repeat)
+            results.append({'foods': size, 'builder': 'legacy', 'min_ms': round(legacy * 1000, 4)})
+            print(f"{size:>8} {vectorized * 1000:>14.2f} {legacy * 1000:>12.2f} {legacy / vectorized:>7.1f}x")
+        else:
+            print(f"{size:>8} {vectorized * 1000:>14.2f} {'-':>12} {'-':>8}")
+
+    write_json(args.json, 'model_build', vars(args), results)
+
+
+if __name__ == '__main__':
+    main()
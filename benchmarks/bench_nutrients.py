@@ -0,0 +1,78 @@
+"""Benchmark model build and solve time against the number of nutrient rows.
+
+Adds sparse synthetic micronutrient columns (each present in --density of
+the foods) to synthetic catalogs and constrains each one with a floor 25%
+above what the plan without it provides, on top of the RDA targets for
+fiber, iron, fat and carbs.
+
+    python -m benchmarks.bench_nutrients
+    python -m benchmarks.bench_nutrients --sizes 1000 10000 --nutrients 0 10 20 40 --json nutrients.json
+"""
+import argparse
+import logging
+import numpy as np
+from food_catalog import FoodCatalog
+from meal_optimizer import MealOptimizer
+from nutrient_targets import NutrientTarget, targets_for
+from benchmarks.bench_model_build import synthetic_foods
+from benchmarks.report import summarize, time_calls, write_json
+
+PROFILE = dict(calorie_target=2200, protein_target=60, budget=150, pantry_items=[])
+
+
+def with_micronutrients(size: int, count: int, density: float, seed: int = 0):
+    """A synthetic catalog with `count` extra sparse nutrient columns"""
+    rng = np.random.default_rng(seed)
+    foods = synthetic_foods(size, seed)
+    for i in range(count):
+        present = rng.random(size) < density
+        foods[f'Micro_{i}'] = np.where(present, rng.lognormal(0, 1, size), 0.0)
+    return foods
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[68, 1000, 5000, 10000])
+    parser.add_argument('--nutrients', type=int, nargs='+', default=[0, 5, 10, 20, 40],
+                        help='synthetic nutrient rows on top of the RDA targets')
+    parser.add_argument('--density', type=float, default=0.2, help='share of foods containing each synthetic nutrient')
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--json', metavar='PATH', help="write results as JSON ('-' for stdout)")
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    results = []
+    print(f"{'foods':>7} {'rows':>5} {'nnz':>9} {'build ms':>9} {'solve ms':>9} {'status':>10}")
+    for size in args.sizes:
+        foods = with_micronutrients(size, max(args.nutrients), args.density)
+        optimizer = MealOptimizer(FoodCatalog.from_frame(foods))
+        food_idx = optimizer.catalog.indices_for('non_veg')
+        rda = targets_for(30, 'female', optimizer.catalog.columns)
+        base = optimizer.solve_model(optimizer._build_model(food_idx, nutrient_targets=rda, **PROFILE))
+        daily = base.x.reshape(len(optimizer.meal_types), -1).sum(axis=0) if base.x is not None else None
+        coefs = optimizer._coefficients(food_idx)
+
+        for count in args.nutrients:
+            targets = list(rda)
+            for i in range(count):
+                column = f'Micro_{i}'
+                provided = float(coefs[column] @ daily) if daily is not None else 0.0
+                targets.append(NutrientTarget(column, lower=1.25 * provided if provided > 0 else 0.1))
+            build = lambda: optimizer._build_model(food_idx, nutrient_targets=targets, **PROFILE)
+            model = build()
+            solved = optimizer.solve_model(model)
+            build_times = summarize(time_calls(build, args.repeat))
+            solve_times = summarize(time_calls(lambda: optimizer.solver.solve(model), args.repeat))
+            nnz = int(model.A.nnz) if hasattr(model.A, 'nnz') else int(np.count_nonzero(model.A))
+            results.append({'foods': size, 'nutrient_rows': len(targets), 'stage': 'build', 'nnz': nnz,
+                            'status': solved.status, **build_times})
+            results.append({'foods': size, 'nutrient_rows': len(targets), 'stage': 'solve', 'nnz': nnz,
+                            'status': solved.status, **solve_times})
+            print(f"{size:>7} {len(targets):>5} {nnz:>9} {build_times['median_ms']:>9.2f} "
+                  f"{solve_times['median_ms']:>9.2f} {solved.status:>10}")
+
+    write_json(args.json, 'nutrients', vars(args), results)
+
+
+if __name__ == '__main__':
+    main()
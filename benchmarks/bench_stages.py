@@ -0,0 +1,87 @@
+"""Micro-benchmarks of each plan-generation stage over synthetic catalogs.
+
+Times, per catalog size:
+
+  filter        MealOptimizer.filter_foods_by_preference
+  build         MealOptimizer._build_model
+  solve         MealOptimizer.solve_model (cold, one backend per --solvers entry)
+  meal_plan     turning the solved meals × foods grams into the plan dict
+                (meal distribution itself happens inside the LP)
+  alternatives  one food's substitutes, as /api/alternatives serves them
+  end_to_end    MealOptimizer.optimize_meal_plan
+  servings      ServingPlanner.optimize_meal_plan (whole servings: rounding, then a time-limited MIP)
+
+    python -m benchmarks.bench_stages
+    python -m benchmarks.bench_stages --sizes 50 500 5000 --solvers highs cbc --json stages.json
+"""
+import argparse
+import logging
+from food_catalog import FoodCatalog
+from meal_optimizer import MealOptimizer
+from plan_servings import ServingPlanner
+from benchmarks.bench_model_build import synthetic_foods
+from benchmarks.report import summarize, time_calls, write_json
+
+PROFILE = dict(calorie_target=2200, protein_target=60, budget=150, dietary_preference='veg')
+
+
+def bench_size(size: int, solvers, repeat: int, cbc_max: int):
+    """Stage timings for one catalog size, as a list of result rows"""
+    foods = synthetic_foods(size)
+    optimizer = MealOptimizer(FoodCatalog.from_frame(foods))
+    pantry = foods['Food'].iloc[::10].tolist()
+    food_idx = optimizer.catalog.indices_for(PROFILE['dietary_preference'])
+    model = optimizer._build_model(food_idx, PROFILE['calorie_target'], PROFILE['protein_target'],
+                                   PROFILE['budget'], pantry)
+    solved = optimizer.solve_model(model)
+    if solved.status != 'optimal':
+        raise RuntimeError(f"synthetic catalog of {size} foods has no feasible plan ({solved.status})")
+
+    selected = optimizer._food_entries(food_idx, solved.x[:len(optimizer.meal_types) * len(food_idx)]
+                                       .reshape(len(optimizer.meal_types), -1).sum(axis=0))
+
+    stages = {
+        'filter': lambda: optimizer.filter_foods_by_preference(PROFILE['dietary_preference']),
+        'build': lambda: optimizer._build_model(food_idx, PROFILE['calorie_target'], PROFILE['protein_target'],
+                                                PROFILE['budget'], pantry),
+        'meal_plan': lambda: optimizer._build_result(food_idx, solved.x, pantry),
+        'alternatives': lambda: optimizer.substitutes.alternatives([selected[0]['name']], allowed=food_idx, k=3),
+        'end_to_end': lambda: optimizer.optimize_meal_plan(pantry_items=pantry, **PROFILE),
+        'servings': lambda: ServingPlanner(optimizer).optimize_meal_plan(pantry_items=pantry, **PROFILE),
+    }
+    for solver in solvers:
+        if solver == 'cbc' and size > cbc_max:
+            continue
+        backend = MealOptimizer(optimizer.catalog, solver=solver).solver
+        stages[f'solve[{solver}]'] = lambda backend=backend: backend.solve(model)
+
+    rows = []
+    for stage, fn in stages.items():
+        # CBC spawns a process per call; a few samples are enough
+        n = max(3, repeat // 5) if stage == 'solve[cbc]' else repeat
+        rows.append({'foods': size, 'variables': model.num_cols, 'stage': stage, **summarize(time_calls(fn, n))})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[50, 250, 1000, 2500, 5000, 10000])
+    parser.add_argument('--solvers', nargs='+', default=['highs'], help='backends to time the solve stage with')
+    parser.add_argument('--cbc-max', type=int, default=2500, help='largest catalog to solve with CBC')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--json', metavar='PATH', help="write results as JSON ('-' for stdout)")
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    results = []
+    print(f"{'foods':>7} {'stage':>14} {'median ms':>10} {'p95 ms':>9}")
+    for size in args.sizes:
+        for row in bench_size(size, args.solvers, args.repeat, args.cbc_max):
+            results.append(row)
+            print(f"{row['foods']:>7} {row['stage']:>14} {row['median_ms']:>10.3f} {row['p95_ms']:>9.3f}")
+
+    write_json(args.json, 'stages', vars(args), results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Benchmark a budget sweep re-solved warm vs. cold.
+
+Each step of the sweep changes only the budget row, the way a user
+nudging the planner form does. "cold" builds and solves a fresh model
+with MealOptimizer.optimize_meal_plan; "warm" re-solves one
+MealPlanSession from its previous basis, after moving its stored model
+to the new budget. The build column is the model build (cold) or
+re-bounding (warm) stage.
+
+    python -m benchmarks.bench_warm_start
+    python -m benchmarks.bench_warm_start --size 5000 --budgets 60 400 5 --json warm.json
+"""
+import argparse
+import logging
+import time
+import numpy as np
+from food_catalog import FoodCatalog, get_catalog
+from meal_optimizer import MealOptimizer
+from plan_session import MealPlanSession
+from metrics import start_request_spans, finish_request_spans
+from benchmarks.bench_model_build import synthetic_foods
+from benchmarks.report import summarize, write_json
+
+
+def sweep(target, budgets, **inputs):
+    """Run target.optimize_meal_plan over budgets, returning per-step wall, build and solver times"""
+    wall, build, solver = [], [], []
+    for budget in budgets:
+        token = start_request_spans()
+        start = time.perf_counter()
+        result = target.optimize_meal_plan(budget=float(budget), **inputs)
+        wall.append(time.perf_counter() - start)
+        build.append(sum(elapsed for stage, elapsed in finish_request_spans(token) if stage == 'build'))
+        solver.append(result.get('solver', {}).get('solve_time_ms', float('nan')) / 1000)
+    return np.array(wall), np.array(build), np.array(solver)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', type=int, default=0, help='synthetic catalog size (0 = foods.csv)')
+    parser.add_argument('--budgets', type=float, nargs=3, default=[60, 300, 5], metavar=('START', 'STOP', 'STEP'))
+    parser.add_argument('--solver', default=None, help='backend for the cold solves')
+    parser.add_argument('--json', metavar='PATH', help="write results as JSON ('-' for stdout)")
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    catalog = FoodCatalog.from_frame(synthetic_foods(args.size)) if args.size else get_catalog()
+    optimizer = MealOptimizer(catalog, solver=args.solver)
+    budgets = np.arange(*args.budgets)
+    inputs = dict(calorie_target=2200, protein_target=60, dietary_preference='veg', pantry_items=[])
+
+    # Prime imports and the first basis outside the timed sweep
+    optimizer.optimize_meal_plan(budget=float(budgets[0]), **inputs)
+    session = MealPlanSession(optimizer)
+    session.optimize_meal_plan(budget=float(budgets[0]), **inputs)
+
+    runs = (('cold', *sweep(optimizer, budgets, **inputs)), ('warm', *sweep(session, budgets, **inputs)))
+
+    print(f"{len(catalog)} foods, {len(budgets)} budgets from {budgets[0]:g} to {budgets[-1]:g}")
+    print(f"{'':>6} {'total ms':>10} {'mean ms':>9} {'p95 ms':>8} {'build mean ms':>14} {'solver mean ms':>15}")
+    for label, wall, build, solver in runs:
+        print(f"{label:>6} {wall.sum() * 1000:>10.1f} {wall.mean() * 1000:>9.2f} "
+              f"{np.percentile(wall, 95) * 1000:>8.2f} {build.mean() * 1000:>14.3f} {np.nanmean(solver) * 1000:>15.3f}")
+    print(f"warm re-solves: {session.warm_solves}, cold builds: {session.cold_solves}")
+
+    write_json(args.json, 'warm_start', dict(vars(args), foods=len(catalog)), [
+        {'mode': label, **summarize(wall), 'build_mean_ms': round(float(build.mean()) * 1000, 4),
+         'solver_mean_ms': round(float(np.nanmean(solver)) * 1000, 4)}
+        for label, wall, build, solver in runs
+    ])
+
+
+if __name__ == '__main__':
+    main()
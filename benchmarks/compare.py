@@ -0,0 +1,68 @@
+"""Compare two benchmark JSON files (e.g. from two commits).
+
+Rows are matched on their descriptive fields (foods, stage, kind, ...;
+everything except ``n``, ``*_ms`` and nested objects) and the chosen
+statistic is reported side by side with the relative change.
+
+    python -m benchmarks.compare before.json after.json
+    python -m benchmarks.compare before.json after.json --metric p95_ms --threshold 0.15 --fail
+"""
+import sys
+import json
+import argparse
+from typing import Dict, Tuple, Any
+
+
+def _is_measurement(field: str) -> bool:
+    return field == 'n' or field.endswith('_ms')
+
+
+def _rows(path: str) -> Tuple[Dict[str, Any], Dict[Tuple, Dict[str, Any]]]:
+    with open(path) as f:
+        document = json.load(f)
+    rows = {}
+    for row in document['results']:
+        key = tuple(sorted((k, v) for k, v in row.items()
+                           if not _is_measurement(k) and not isinstance(v, (dict, list))))
+        rows[key] = row
+    return document, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('before')
+    parser.add_argument('after')
+    parser.add_argument('--metric', default='median_ms')
+    parser.add_argument('--threshold', type=float, default=0.10, help='relative slowdown reported as a regression')
+    parser.add_argument('--fail', action='store_true', help='exit 1 if any row regressed')
+    args = parser.parse_args()
+
+    before_doc, before = _rows(args.before)
+    after_doc, after = _rows(args.after)
+    print(f"{before_doc['environment'].get('commit', '?')[:10]} -> {after_doc['environment'].get('commit', '?')[:10]} "
+          f"({args.metric})")
+
+    regressions = 0
+    for key in [k for k in before if k in after]:
+        old, new = before[key].get(args.metric), after[key].get(args.metric)
+        if old is None or new is None:
+            continue
+        change = (new - old) / old if old else 0.0
+        flag = ''
+        if change > args.threshold:
+            flag = '  REGRESSION'
+            regressions += 1
+        elif change < -args.threshold:
+            flag = '  faster'
+        label = ' '.join(f"{k}={v}" for k, v in key)
+        print(f"{label:<48} {old:>10.3f} {new:>10.3f} {change:>+8.1%}{flag}")
+
+    for key in [k for k in after if k not in before]:
+        print(f"{' '.join(f'{k}={v}' for k, v in key):<48} {'-':>10} {after[key].get(args.metric, float('nan')):>10.3f}   new")
+
+    if args.fail and regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Local OpenAI-compatible chat server backed by FakeChatBackend.
+
+Streams /v1/chat/completions replies as SSE chunks (text deltas and
+tool_calls) over keep-alive HTTP/1.1, so CHAT_BACKEND=openai can be run
+end to end without a model service:
+
+    python -m benchmarks.fake_chat_server --port 8765 --delay 0.02
+    CHAT_BACKEND=openai CHAT_BACKEND_URL=http://127.0.0.1:8765/v1 python main.py
+"""
+import argparse
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from chat_backend import ChatTool, FakeChatBackend
+
+
+def completion_chunks(backend: FakeChatBackend, body: dict):
+    """SSE `data:` payloads for a streamed completion of `body`"""
+    tools = [ChatTool(spec['function']['name'], '', {}, None) for spec in body.get('tools') or []]
+    base = {'id': f"chatcmpl-{time.time_ns()}", 'object': 'chat.completion.chunk', 'model': body.get('model', 'fake')}
+    calls = 0
+    for event in backend.stream(body['messages'], tools):
+        if event['type'] == 'text':
+            delta = {'content': event['text']}
+        else:
+            delta = {'tool_calls': [{'index': calls, 'id': event['id'], 'type': 'function', 'function': {
+                'name': event['name'], 'arguments': json.dumps(event['arguments'])
+            }}]}
+            calls += 1
+        yield json.dumps(dict(base, choices=[{'index': 0, 'delta': delta, 'finish_reason': None}]))
+    reason = 'tool_calls' if calls else 'stop'
+    yield json.dumps(dict(base, choices=[{'index': 0, 'delta': {}, 'finish_reason': reason}]))
+    yield '[DONE]'
+
+
+def make_handler(backend: FakeChatBackend):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            if not self.path.rstrip('/').endswith('/chat/completions'):
+                self.send_error(404)
+                return
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for payload in completion_chunks(backend, body):
+                data = f"data: {payload}\n\n".encode()
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+            self.wfile.write(b"0\r\n\r\n")
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--delay', type=float, default=0.0, help='seconds between streamed chunks')
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(FakeChatBackend(delay=args.delay)))
+    print(f"Fake chat backend on http://{args.host}:{args.port}/v1")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
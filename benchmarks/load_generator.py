@@ -0,0 +1,149 @@
+"""Replay a realistic profile mix against /generate_plan through the Flask test client.
+
+Each virtual user keeps its own cookie jar, so "tweak the budget and
+regenerate" requests hit the same warm-start session the way a browser
+would. Runs in-process: it measures the app and solver, not the network
+or the WSGI server.
+
+    python -m benchmarks.load_generator
+    python -m benchmarks.load_generator --requests 500 --users 4 --no-cache --json load.json
+"""
+import os
+import sys
+import time
+import random
+import logging
+import argparse
+import tempfile
+import threading
+from collections import Counter
+from typing import Dict, List, Any
+
+ACTIVITY_LEVELS = {
+    'sedentary': 0.30, 'lightly_active': 0.30, 'moderately_active': 0.25,
+    'very_active': 0.10, 'extremely_active': 0.05
+}
+DIETS = {'veg': 0.45, 'eggetarian': 0.20, 'non_veg': 0.35}
+BUDGETS = {60: 0.10, 80: 0.15, 100: 0.25, 120: 0.15, 150: 0.20, 200: 0.10, 300: 0.05}
+
+
+def _pick(rng: random.Random, weights: Dict[Any, float]):
+    return rng.choices(list(weights), weights=list(weights.values()))[0]
+
+
+def random_profile(rng: random.Random, food_names: List[str], pantry_share: float,
+                   weekly_share: float) -> Dict[str, Any]:
+    """One form submission drawn from the profile mix"""
+    sex = rng.choice(['male', 'female'])
+    male = sex == 'male'
+    form = {
+        'age': rng.randint(18, 70),
+        'sex': sex,
+        'weight': round(min(max(rng.gauss(72 if male else 60, 12 if male else 10), 40), 140), 1),
+        'height': round(min(max(rng.gauss(172 if male else 158, 7 if male else 6), 140), 200)),
+        'activity_level': _pick(rng, ACTIVITY_LEVELS),
+        'budget': _pick(rng, BUDGETS),
+        'dietary_preference': _pick(rng, DIETS),
+        'pantry_items': rng.sample(food_names, rng.randint(1, 3)) if rng.random() < pantry_share else [],
+        'plan_days': 7 if rng.random() < weekly_share else 1,
+    }
+    return form
+
+
+def run_user(app, user: int, count: int, args, food_names: List[str], samples: List[Dict[str, Any]],
+             lock: threading.Lock):
+    rng = random.Random(args.seed * 1000 + user)
+    client = app.test_client()
+    previous = None
+    for _ in range(count):
+        if previous is not None and previous['plan_days'] == 1 and rng.random() < args.tweak_share:
+            # Same user nudging the budget and regenerating
+            form, kind = dict(previous, budget=max(20, previous['budget'] + rng.choice([-20, -10, 10, 20]))), 'tweak'
+        else:
+            form = random_profile(rng, food_names, args.pantry_share, args.weekly_share)
+            kind = 'weekly' if form['plan_days'] > 1 else 'fresh'
+        start = time.perf_counter()
+        response = client.post('/generate_plan', data=form)
+        elapsed = time.perf_counter() - start
+        with lock:
+            samples.append({'kind': kind, 'status': response.status_code, 'seconds': elapsed})
+        previous = form
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--users', type=int, default=4, help='concurrent virtual users (threads)')
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--tweak-share', type=float, default=0.3, help='share of requests that re-submit with a new budget')
+    parser.add_argument('--pantry-share', type=float, default=0.3)
+    parser.add_argument('--weekly-share', type=float, default=0.05)
+    parser.add_argument('--no-cache', action='store_true', help='disable the plan cache')
+    parser.add_argument('--plan-table', default=None, help='precomputed plan table directory to serve from')
+    parser.add_argument('--json', metavar='PATH', help="write results as JSON ('-' for stdout)")
+    args = parser.parse_args()
+
+    # Configure the app before importing it; plans go to a throwaway database
+    tmpdir = tempfile.mkdtemp(prefix='planner-load-')
+    os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(tmpdir, 'plans.db')}")
+    os.environ['PLAN_TABLE'] = args.plan_table or os.path.join(tmpdir, 'no-plan-table')
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    if args.no_cache:
+        os.environ['PLAN_CACHE_SIZE'] = '0'
+    from app import app, plan_cache, plan_table
+    from food_catalog import get_catalog
+    import metrics
+    from benchmarks.report import summarize, write_json
+    logging.disable(logging.WARNING)
+
+    food_names = get_catalog().names
+    warm: List[Dict[str, Any]] = []
+    run_user(app, -1, args.warmup, args, food_names, warm, threading.Lock())
+
+    stages_before = metrics.STAGE_SECONDS.totals()
+    samples: List[Dict[str, Any]] = []
+    lock = threading.Lock()
+    per_user = [args.requests // args.users + (1 if u < args.requests % args.users else 0) for u in range(args.users)]
+    threads = [threading.Thread(target=run_user, args=(app, u, n, args, food_names, samples, lock))
+               for u, n in enumerate(per_user)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    results = [{'kind': 'all', **summarize([s['seconds'] for s in samples])}]
+    for kind in sorted({s['kind'] for s in samples}):
+        results.append({'kind': kind, **summarize([s['seconds'] for s in samples if s['kind'] == kind])})
+    statuses = Counter(str(s['status']) for s in samples)
+    stages = {}
+    for labels, (total, count) in metrics.STAGE_SECONDS.totals().items():
+        total_before, count_before = stages_before.get(labels, (0.0, 0.0))
+        if count > count_before:
+            stages[labels[0]] = {
+                'count': int(count - count_before),
+                'mean_ms': round((total - total_before) / (count - count_before) * 1000, 4)
+            }
+    summary = {
+        'wall_ms': round(wall * 1000, 1),
+        'throughput': {'requests': len(samples), 'per_second': round(len(samples) / wall, 2)},
+        'statuses': dict(statuses),
+        'plan_cache': plan_cache.stats(),
+        'plan_table': {'hits': plan_table.hits, 'misses': plan_table.misses} if plan_table else None,
+        'stages': stages,
+    }
+
+    print(f"{len(samples)} requests from {args.users} users in {wall:.2f}s "
+          f"({summary['throughput']['per_second']} req/s), statuses {dict(statuses)}")
+    print(f"{'kind':>8} {'n':>5} {'median ms':>10} {'p95 ms':>9} {'p99 ms':>9}")
+    for row in results:
+        print(f"{row['kind']:>8} {row['n']:>5} {row['median_ms']:>10.2f} {row['p95_ms']:>9.2f} {row['p99_ms']:>9.2f}")
+    print("stage means (ms): " + ', '.join(f"{k}={v['mean_ms']:.2f}" for k, v in stages.items()), file=sys.stderr)
+
+    write_json(args.json, 'load', vars(args), results + [{'kind': 'summary', **summary}])
+
+
+if __name__ == '__main__':
+    main()
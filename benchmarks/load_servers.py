@@ -0,0 +1,214 @@
+"""Compare gunicorn sync workers with the ASGI mode under concurrent load over HTTP.
+
+Starts each server setup on a local port, then holds --concurrency
+keep-alive clients busy for --duration seconds with a mix of page,
+static, plan and (fake, slow) chat requests. Reports throughput per
+core, latency by request kind and the servers' proportional memory (PSS).
+
+    python -m benchmarks.load_servers
+    python -m benchmarks.load_servers --concurrency 8 32 96 --duration 20 --no-cache --json servers.json
+
+The clients run on the same machine, so absolute numbers understate
+both setups; the comparison between them is what matters.
+"""
+import os
+import time
+import json
+import random
+import signal
+import logging
+import argparse
+import tempfile
+import threading
+import subprocess
+import http.client
+from urllib.parse import urlencode
+from collections import Counter
+from typing import Dict, List, Any
+from benchmarks.load_generator import random_profile
+from benchmarks.report import summarize, write_json
+
+STATIC_FILES = ['/static/style.css', '/static/script.js', '/static/main_style.css', '/static/auth.css']
+PAGES = ['/', '/meal-planner', '/chatbot']
+CHAT_MESSAGES = ['How much water should I drink?', 'Is walking good for my knees?', 'Any tips for better sleep?',
+                 'Make me a veg meal plan under ₹120']
+
+
+def server_command(setup: str, args) -> List[str]:
+    if setup == 'sync':
+        return ['gunicorn', '-w', str(args.sync_workers), '-b', f"127.0.0.1:{args.port}", 'app:app']
+    return ['gunicorn', '-k', 'asgi', '-w', '1', '--worker-connections', '1000',
+            '-b', f"127.0.0.1:{args.port}", 'asgi:application']
+
+
+def start_server(setup: str, args, tmpdir: str) -> subprocess.Popen:
+    env = dict(os.environ,
+               DATABASE_URL=f"sqlite:///{os.path.join(tmpdir, setup + '.db')}",
+               PLAN_TABLE=os.path.join(tmpdir, 'no-plan-table'),
+               CHAT_BACKEND='fake', CHAT_FAKE_DELAY=str(args.chat_delay),
+               SOLVE_PROCESSES=str(args.solve_processes) if setup == 'asgi' else '0',
+               ASGI_THREADS=str(args.asgi_threads), LOG_LEVEL='WARNING')
+    if args.no_cache:
+        env['PLAN_CACHE_SIZE'] = '0'
+    server = subprocess.Popen(server_command(setup, args), env=env, stdout=subprocess.DEVNULL,
+                              stderr=subprocess.DEVNULL, start_new_session=True)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', args.port, timeout=2)
+            conn.request('GET', '/signin')
+            if conn.getresponse().status == 200:
+                conn.close()
+                # Let the sync workers finish booting too
+                time.sleep(2)
+                return server
+        except OSError:
+            time.sleep(0.25)
+    stop_server(server)
+    raise RuntimeError(f"{setup} server did not start")
+
+
+def stop_server(server: subprocess.Popen):
+    try:
+        os.killpg(server.pid, signal.SIGTERM)
+        server.wait(timeout=15)
+    except (ProcessLookupError, subprocess.TimeoutExpired):
+        os.killpg(server.pid, signal.SIGKILL)
+
+
+def tree_pss_mb(root: int) -> float:
+    """Proportional set size of a process and all its descendants, in MB"""
+    children: Dict[int, List[int]] = {}
+    for entry in os.listdir('/proc'):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+                children.setdefault(ppid, []).append(int(entry))
+            except (OSError, ValueError, IndexError):
+                pass
+    total, stack = 0, [root]
+    while stack:
+        pid = stack.pop()
+        stack.extend(children.get(pid, []))
+        try:
+            with open(f"/proc/{pid}/smaps_rollup") as f:
+                total += next(int(line.split()[1]) for line in f if line.startswith('Pss:'))
+        except (OSError, StopIteration):
+            pass
+    return round(total / 1024, 1)
+
+
+def pick_request(rng: random.Random, args, food_names: List[str]):
+    """(kind, method, path, body, headers) drawn from the request mix"""
+    kind = rng.choices(['page', 'static', 'plan', 'chat'], weights=args.mix)[0]
+    if kind == 'page':
+        return kind, 'GET', rng.choice(PAGES), None, {}
+    if kind == 'static':
+        return kind, 'GET', rng.choice(STATIC_FILES), None, {}
+    if kind == 'plan':
+        form = random_profile(rng, food_names, pantry_share=0.3, weekly_share=0.0)
+        body = urlencode(form, doseq=True)
+        return kind, 'POST', '/generate_plan', body, {'Content-Type': 'application/x-www-form-urlencoded'}
+    body = json.dumps({'message': rng.choice(CHAT_MESSAGES), 'session_id': f"load-{rng.random()}", 'stream': True})
+    return kind, 'POST', '/chat', body, {'Content-Type': 'application/json'}
+
+
+def run_client(client: int, args, deadline: float, food_names: List[str], samples: List[Dict[str, Any]],
+               lock: threading.Lock):
+    rng = random.Random(args.seed * 1000 + client)
+    conn = None
+    while time.time() < deadline:
+        kind, method, path, body, headers = pick_request(rng, args, food_names)
+        start = time.perf_counter()
+        try:
+            if conn is None:
+                conn = http.client.HTTPConnection('127.0.0.1', args.port, timeout=args.timeout)
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            status = response.status
+            if response.getheader('Connection', '').lower() == 'close':
+                conn.close()
+                conn = None
+        except (OSError, http.client.HTTPException):
+            status = 'error'
+            if conn is not None:
+                conn.close()
+            conn = None
+        elapsed = time.perf_counter() - start
+        with lock:
+            samples.append({'kind': kind, 'status': status, 'seconds': elapsed})
+    if conn is not None:
+        conn.close()
+
+
+def main():
+    cores = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--setups', nargs='+', default=['sync', 'asgi'], choices=['sync', 'asgi'])
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[8, 32, 96])
+    parser.add_argument('--duration', type=float, default=15.0, help='seconds per concurrency level')
+    parser.add_argument('--mix', type=float, nargs=4, default=[0.35, 0.25, 0.25, 0.15],
+                        metavar=('PAGE', 'STATIC', 'PLAN', 'CHAT'), help='request mix weights')
+    parser.add_argument('--chat-delay', type=float, default=0.02, help='fake chat backend seconds per streamed chunk')
+    parser.add_argument('--sync-workers', type=int, default=2 * cores + 1)
+    parser.add_argument('--solve-processes', type=int, default=cores)
+    parser.add_argument('--asgi-threads', type=int, default=32)
+    parser.add_argument('--port', type=int, default=8642)
+    parser.add_argument('--timeout', type=float, default=60.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-cache', action='store_true', help='disable the plan cache so every plan is solved')
+    parser.add_argument('--json', metavar='PATH', help="write results as JSON ('-' for stdout)")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    from food_catalog import get_catalog
+    food_names = get_catalog().names
+    tmpdir = tempfile.mkdtemp(prefix='planner-servers-')
+
+    results = []
+    print(f"{'setup':>6} {'clients':>7} {'req/s':>8} {'req/s/core':>10} {'plan p95':>9} "
+          f"{'chat p95':>9} {'page p95':>9} {'errors':>6} {'PSS MB':>7}")
+    for setup in args.setups:
+        server = start_server(setup, args, tmpdir)
+        try:
+            for concurrency in args.concurrency:
+                samples: List[Dict[str, Any]] = []
+                lock = threading.Lock()
+                deadline = time.time() + args.duration
+                threads = [threading.Thread(target=run_client, args=(c, args, deadline, food_names, samples, lock))
+                           for c in range(concurrency)]
+                start = time.perf_counter()
+                for thread in threads:
+                    thread.start()
+                # Memory under load, half way through the run
+                time.sleep(args.duration / 2)
+                pss = tree_pss_mb(server.pid)
+                for thread in threads:
+                    thread.join()
+                wall = time.perf_counter() - start
+
+                ok = [s for s in samples if isinstance(s['status'], int) and s['status'] < 400]
+                errors = len(samples) - len(ok)
+                per_second = len(ok) / wall
+                by_kind = {kind: summarize([s['seconds'] for s in ok if s['kind'] == kind])
+                           for kind in sorted({s['kind'] for s in ok})}
+                for kind, latency in by_kind.items():
+                    results.append({'setup': setup, 'concurrency': concurrency, 'kind': kind, **latency})
+                results.append({'setup': setup, 'concurrency': concurrency, 'kind': 'summary',
+                                'per_second': round(per_second, 2), 'per_second_per_core': round(per_second / cores, 2),
+                                'errors': errors, 'statuses': dict(Counter(str(s['status']) for s in samples)),
+                                'pss_mb': pss})
+                p95 = lambda kind: by_kind[kind]['p95_ms'] if kind in by_kind else float('nan')
+                print(f"{setup:>6} {concurrency:>7} {per_second:>8.1f} {per_second / cores:>10.1f} "
+                      f"{p95('plan'):>9.0f} {p95('chat'):>9.0f} {p95('page'):>9.0f} {errors:>6} {pss:>7.0f}",
+                      flush=True)
+        finally:
+            stop_server(server)
+
+    write_json(args.json, 'servers', vars(args), results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""Shared helpers for benchmark JSON output.
+
+Every benchmark that takes ``--json PATH`` writes one document of the form
+
+    {"benchmark": ..., "environment": {...}, "config": {...}, "results": [...]}
+
+so runs from different commits can be diffed with ``python -m benchmarks.compare``.
+"""
+import os
+import sys
+import json
+import time
+import platform
+import subprocess
+from importlib import metadata
+import numpy as np
+from typing import Dict, List, Any, Optional
+
+
+def summarize(seconds: List[float]) -> Dict[str, float]:
+    """Latency summary in milliseconds"""
+    values = np.asarray(seconds, dtype=float) * 1000
+    return {
+        'n': int(len(values)),
+        'min_ms': round(float(values.min()), 4),
+        'median_ms': round(float(np.median(values)), 4),
+        'mean_ms': round(float(values.mean()), 4),
+        'p95_ms': round(float(np.percentile(values, 95)), 4),
+        'p99_ms': round(float(np.percentile(values, 99)), 4),
+        'max_ms': round(float(values.max()), 4),
+    }
+
+
+def time_calls(fn, repeat: int, warmup: int = 1) -> List[float]:
+    """Wall time of `repeat` calls of fn, after `warmup` untimed calls"""
+    for _ in range(warmup):
+        fn()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def _version(distribution: str) -> Optional[str]:
+    try:
+        return metadata.version(distribution)
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def environment() -> Dict[str, Any]:
+    """Commit, interpreter and library versions the numbers were measured with"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                timeout=10).stdout.strip() or None
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                                    capture_output=True, text=True, timeout=10).stdout.strip())
+    except Exception:
+        commit, dirty = None, None
+    return {
+        'commit': commit,
+        'dirty': dirty,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': _version('numpy'),
+        'scipy': _version('scipy'),
+        'highspy': _version('highspy'),
+        'pandas': _version('pandas'),
+        'solver': os.environ.get('MEAL_SOLVER'),
+    }
+
+
+def write_json(path: Optional[str], benchmark: str, config: Dict[str, Any], results: List[Dict[str, Any]]):
+    """Write the run to `path` ('-' for stdout); no-op when path is None"""
+    if path is None:
+        return
+    document = {'benchmark': benchmark, 'environment': environment(), 'config': config, 'results': results}
+    if path == '-':
+        json.dump(document, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+        return
+    with open(path, 'w') as f:
+        json.dump(document, f, indent=2)
+    print(f"wrote {path}", file=sys.stderr)
@@ -0,0 +1,317 @@
+"""Pluggable chat backends for the /chat assistant, with server-side conversation context.
+
+A backend streams a reply as events: {'type': 'text', 'text': ...} for
+each chunk of the answer and {'type': 'tool_call', 'id', 'name',
+'arguments'} when the model asks to run a tool (e.g. the meal optimizer).
+ChatSession.reply() runs the tool-calling loop and keeps the history, so
+the browser only sends the new message.
+
+    CHAT_BACKEND=echo     demo reply (default)
+    CHAT_BACKEND=fake     scripted replies that call tools; deterministic, for local testing
+    CHAT_BACKEND=openai   any OpenAI-compatible /chat/completions service at CHAT_BACKEND_URL
+"""
+import os
+import re
+import json
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Any, Optional, Iterator, Iterable, Callable
+from metrics import REGISTRY, Histogram
+
+try:
+    import httpx
+except ImportError:  # only the OpenAI-compatible backend needs it
+    httpx = None
+
+SYSTEM_PROMPT = (
+    "You are MEDIORA's health assistant. Give general health and nutrition information, "
+    "suggest seeing a doctor for anything urgent, and use the plan_meals tool when the user "
+    "asks for a meal plan."
+)
+
+# Tool calls a single reply may chain before the backend must answer in text
+MAX_TOOL_ROUNDS = 3
+MAX_MESSAGE_CHARS = 2000
+
+FIRST_TOKEN_SECONDS = REGISTRY.register(Histogram(
+    'meal_planner_chat_first_token_seconds', 'Time from chat request to the first streamed text', ('backend',)
+))
+REPLY_SECONDS = REGISTRY.register(Histogram(
+    'meal_planner_chat_reply_seconds', 'Time to stream a whole chat reply, tool calls included', ('backend',)
+))
+
+
+@dataclass
+class ChatTool:
+    """A function the backend may call, described by a JSON schema"""
+    name: str
+    description: str
+    parameters: Dict[str, Any]
+    fn: Callable[[Dict[str, Any]], Dict[str, Any]]
+
+    def spec(self) -> Dict[str, Any]:
+        """OpenAI function-calling declaration"""
+        return {'type': 'function', 'function': {
+            'name': self.name, 'description': self.description, 'parameters': self.parameters
+        }}
+
+
+class ChatBackend:
+    """Streams a reply to a list of {'role', 'content'} messages"""
+    name = 'base'
+
+    def stream(self, messages: List[Dict[str, Any]], tools: List[ChatTool]) -> Iterator[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+def _chunks(text: str) -> Iterator[str]:
+    """Split a canned reply into word-sized stream chunks"""
+    for match in re.finditer(r'\S+\s*', text):
+        yield match.group(0)
+
+
+class EchoBackend(ChatBackend):
+    """The original demo reply, streamed a word at a time"""
+    name = 'echo'
+
+    def stream(self, messages, tools):
+        user_message = messages[-1]['content']
+        reply = (f"Thank you for your message: '{user_message}'. This is a demo response. "
+                 "For a complete AI health assistant, please integrate with your preferred AI service "
+                 "(OpenAI, Gemini, etc.).")
+        for chunk in _chunks(reply):
+            yield {'type': 'text', 'text': chunk}
+
+
+class FakeChatBackend(ChatBackend):
+    """Deterministic stand-in for a model service
+
+    Asks for a meal plan (via the plan_meals tool) when the last user
+    message mentions one, summarizes tool results, and otherwise repeats
+    how many messages of context it was given, which makes server-side
+    history visible. `delay` seconds between chunks mimics token latency.
+    """
+    name = 'fake'
+    PLAN_WORDS = re.compile(r'\b(meal|diet|plan)\b', re.IGNORECASE)
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+
+    def stream(self, messages, tools):
+        last = messages[-1]
+        tool_names = {tool.name for tool in tools}
+        if last['role'] == 'tool':
+            result = json.loads(last['content'])
+            if result.get('status') == 'success':
+                reply = (f"Here is a plan costing ₹{result['total_cost']} for "
+                         f"{result['calories']} kcal and {result['protein']} g protein.")
+            else:
+                reply = f"I couldn't build a plan: {result.get('message', 'unknown error')}"
+        elif 'plan_meals' in tool_names and self.PLAN_WORDS.search(last['content']):
+            yield {'type': 'tool_call', 'id': f"call_{uuid.uuid4().hex[:8]}", 'name': 'plan_meals',
+                   'arguments': self._plan_arguments(last['content'])}
+            return
+        else:
+            turns = sum(1 for message in messages if message['role'] == 'user')
+            reply = f"(fake backend, turn {turns}) You said: {last['content']}"
+        for chunk in _chunks(reply):
+            if self.delay:
+                time.sleep(self.delay)
+            yield {'type': 'text', 'text': chunk}
+
+    @staticmethod
+    def _plan_arguments(text: str) -> Dict[str, Any]:
+        """A fixed profile, with the budget and diet taken from the message when present"""
+        budget = re.search(r'(?:₹|rs\.?\s*|budget\s*(?:of\s*)?)(\d+)', text, re.IGNORECASE)
+        return {
+            'age': 30, 'sex': 'female', 'weight': 60, 'height': 165, 'activity_level': 'moderately_active',
+            'budget': int(budget.group(1)) if budget else 200,
+            'dietary_preference': ('veg' if re.search(r'\bveg(etarian)?\b', text, re.IGNORECASE)
+                                   else 'eggetarian' if re.search(r'\begg', text, re.IGNORECASE) else 'non_veg')
+        }
+
+
+class OpenAIChatBackend(ChatBackend):
+    """OpenAI-compatible /chat/completions service, streamed over SSE
+
+    One pooled httpx client per process keeps TLS connections alive
+    between requests, so a reply costs one round trip instead of a new
+    handshake.
+    """
+    name = 'openai'
+
+    def __init__(self, base_url: str, model: str, api_key: Optional[str] = None,
+                 timeout: float = 60.0, max_connections: int = 20):
+        if httpx is None:
+            raise RuntimeError('httpx is required for CHAT_BACKEND=openai')
+        self.model = model
+        headers = {'Authorization': f"Bearer {api_key}"} if api_key else {}
+        self.client = httpx.Client(
+            base_url=base_url.rstrip('/'),
+            headers=headers,
+            timeout=httpx.Timeout(timeout, connect=5.0),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections,
+                                keepalive_expiry=60.0)
+        )
+
+    def stream(self, messages, tools):
+        body = {'model': self.model, 'messages': messages, 'stream': True}
+        if tools:
+            body['tools'] = [tool.spec() for tool in tools]
+        with self.client.stream('POST', '/chat/completions', json=body) as response:
+            response.raise_for_status()
+            yield from self.parse_events(response.iter_lines())
+
+    @staticmethod
+    def parse_events(lines: Iterable[str]) -> Iterator[Dict[str, Any]]:
+        """Turn `data:` lines of a streamed completion into text and tool_call events
+
+        Tool call names and arguments arrive in fragments keyed by index and
+        are emitted once complete, at the end of the stream.
+        """
+        calls: Dict[int, Dict[str, str]] = {}
+        for line in lines:
+            if not line.startswith('data:'):
+                continue
+            payload = line[5:].strip()
+            if payload == '[DONE]':
+                break
+            for choice in json.loads(payload).get('choices', []):
+                delta = choice.get('delta') or {}
+                if delta.get('content'):
+                    yield {'type': 'text', 'text': delta['content']}
+                for fragment in delta.get('tool_calls') or []:
+                    call = calls.setdefault(fragment.get('index', 0), {'id': '', 'name': '', 'arguments': ''})
+                    call['id'] = fragment.get('id') or call['id']
+                    function = fragment.get('function') or {}
+                    call['name'] += function.get('name') or ''
+                    call['arguments'] += function.get('arguments') or ''
+        for _, call in sorted(calls.items()):
+            try:
+                arguments = json.loads(call['arguments'] or '{}')
+            except json.JSONDecodeError:
+                arguments = {}
+            yield {'type': 'tool_call', 'id': call['id'], 'name': call['name'], 'arguments': arguments}
+
+    def close(self):
+        self.client.close()
+
+
+def backend_from_env() -> ChatBackend:
+    """The backend selected by CHAT_BACKEND (echo if unset or unavailable)"""
+    kind = os.environ.get('CHAT_BACKEND', 'echo').lower()
+    if kind == 'fake':
+        return FakeChatBackend(delay=float(os.environ.get('CHAT_FAKE_DELAY', 0)))
+    if kind == 'openai':
+        try:
+            return OpenAIChatBackend(
+                base_url=os.environ.get('CHAT_BACKEND_URL', 'https://api.openai.com/v1'),
+                model=os.environ.get('CHAT_MODEL', 'gpt-4o-mini'),
+                api_key=os.environ.get('CHAT_API_KEY') or os.environ.get('OPENAI_API_KEY'),
+                timeout=float(os.environ.get('CHAT_TIMEOUT', 60)),
+                max_connections=int(os.environ.get('CHAT_MAX_CONNECTIONS', 20))
+            )
+        except RuntimeError as e:
+            logging.error(f"Chat backend unavailable, using the demo reply: {e}")
+    return EchoBackend()
+
+
+@dataclass
+class ChatSession:
+    """One conversation's history, trimmed to the last `max_messages`"""
+    max_messages: int = 20
+    messages: List[Dict[str, Any]] = field(default_factory=list)
+    last_used: float = field(default_factory=time.time)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def reply(self, backend: ChatBackend, user_message: str, tools: List[ChatTool]) -> Iterator[Dict[str, Any]]:
+        """Stream the backend's reply to `user_message`, running tool calls along the way
+
+        Yields the backend's text events, a {'type': 'tool', 'name',
+        'result'} event per tool run, and a final {'type': 'done'}. The
+        exchange is added to the history once the reply is complete.
+        """
+        with self.lock:
+            self.last_used = time.time()
+            start = time.perf_counter()
+            first_token = None
+            turn = [{'role': 'user', 'content': user_message[:MAX_MESSAGE_CHARS]}]
+            by_name = {tool.name: tool for tool in tools}
+            text = ''
+
+            for round_ in range(MAX_TOOL_ROUNDS + 1):
+                messages = [{'role': 'system', 'content': SYSTEM_PROMPT}] + self.messages + turn
+                # Out of tool rounds: offer no tools, so the backend has to answer
+                offered = tools if round_ < MAX_TOOL_ROUNDS else []
+                text, calls = '', []
+                for event in backend.stream(messages, offered):
+                    if event['type'] == 'text':
+                        if first_token is None:
+                            first_token = time.perf_counter() - start
+                            FIRST_TOKEN_SECONDS.observe(first_token, backend.name)
+                        text += event['text']
+                        yield event
+                    elif event['type'] == 'tool_call':
+                        calls.append(event)
+                if not calls:
+                    break
+                turn.append({'role': 'assistant', 'content': text or None, 'tool_calls': [
+                    {'id': call['id'], 'type': 'function',
+                     'function': {'name': call['name'], 'arguments': json.dumps(call['arguments'])}}
+                    for call in calls
+                ]})
+                for call in calls:
+                    result = self._run_tool(by_name.get(call['name']), call['arguments'])
+                    yield {'type': 'tool', 'name': call['name'], 'result': result}
+                    turn.append({'role': 'tool', 'tool_call_id': call['id'], 'content': json.dumps(result)})
+
+            turn.append({'role': 'assistant', 'content': text})
+            self.messages = (self.messages + turn)[-self.max_messages:]
+            # Never start the kept history mid-exchange (a tool result without its call)
+            while self.messages and self.messages[0]['role'] != 'user':
+                self.messages.pop(0)
+            REPLY_SECONDS.observe(time.perf_counter() - start, backend.name)
+            yield {'type': 'done'}
+
+    @staticmethod
+    def _run_tool(tool: Optional[ChatTool], arguments: Dict[str, Any]) -> Dict[str, Any]:
+        if tool is None:
+            return {'status': 'error', 'message': 'Unknown tool.'}
+        try:
+            return tool.fn(arguments)
+        except Exception as e:
+            logging.error(f"Error running chat tool {tool.name}: {e}")
+            return {'status': 'error', 'message': 'The tool failed. Please try again.'}
+
+
+class ChatSessionStore:
+    """Bounded, idle-expiring map of conversation id -> ChatSession"""
+
+    def __init__(self, max_sessions: int = 1024, idle_timeout: float = 1800, max_messages: int = 20):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.max_messages = max_messages
+        self._sessions: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> ChatSession:
+        now = time.time()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None or now - session.last_used > self.idle_timeout:
+                session = ChatSession(self.max_messages)
+                self._sessions[session_id] = session
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+            return session
+
+    def __len__(self) -> int:
+        return len(self._sessions)
@@ -0,0 +1,296 @@
+import os
+import io
+import sys
+import csv
+import json
+import hashlib
+import logging
+import argparse
+import threading
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from metrics import span
+
+FOODS_CSV_PATH = os.environ.get('FOODS_CSV', 'foods.csv')
+
+# Foods excluded from the vegetarian and eggetarian plans
+MEAT_FOODS = ['Chicken', 'Fish', 'Mutton', 'Prawns', 'Beef']
+EGG_FOODS = ['Egg']
+
+DIETARY_PREFERENCES = ['veg', 'eggetarian', 'non_veg']
+
+# Optional per-meal affinity columns, e.g. "Breakfast_Affinity" (0 = never served at that meal)
+AFFINITY_SUFFIX = '_Affinity'
+
+# Optional serving size: grams per serving and the name of one serving ("roti", "katori")
+SERVING_COLUMN = 'ServingGrams'
+UNIT_COLUMN = 'Unit'
+
+# Version of the compiled <name>.catalog.npy / .catalog.json pair
+CATALOG_FORMAT = 2
+
+
+class FoodCatalog:
+    """Immutable, array-backed view of the foods table.
+
+    A catalog is loaded once and shared by every request in the worker.
+    Numeric columns are stored as one (foods × columns) float64 matrix so
+    the optimizer can slice coefficient vectors directly; when the catalog
+    comes from the compiled binary, that matrix is a read-only memory map
+    shared by all workers through the page cache.
+    """
+
+    def __init__(self, names: List[str], columns: List[str], values: np.ndarray,
+                 digest: str = '', mtime: Optional[float] = None,
+                 units: Optional[List[str]] = None):
+        self.digest = digest
+        self.mtime = mtime
+
+        self.names: List[str] = list(names)
+        self.name_index: Dict[str, int] = {name: i for i, name in enumerate(self.names)}
+        self.columns: List[str] = list(columns)
+        self.values = values if values.shape == (len(self.names), len(self.columns)) \
+            else np.zeros((len(self.names), len(self.columns)))
+        self._column_index = {column: i for i, column in enumerate(self.columns)}
+        self.units: List[str] = list(units) if units is not None and len(units) == len(self.names) \
+            else [''] * len(self.names)
+
+        self.diet_index = self._build_diet_index()
+
+    @classmethod
+    def from_frame(cls, foods_df, **kwargs) -> 'FoodCatalog':
+        """Build a catalog from a pandas DataFrame (e.g. synthetic benchmark catalogs)"""
+        import pandas as pd
+        foods_df = foods_df.reset_index(drop=True)
+        names = foods_df['Food'].astype(str).tolist() if 'Food' in foods_df else []
+        columns = [
+            column for column in foods_df.columns
+            if column != 'Food' and pd.api.types.is_numeric_dtype(foods_df[column])
+        ]
+        values = foods_df[columns].to_numpy(dtype=np.float64) if names and columns else np.zeros((len(names), len(columns)))
+        units = foods_df[UNIT_COLUMN].fillna('').astype(str).tolist() if UNIT_COLUMN in foods_df else None
+        return cls(names, columns, np.ascontiguousarray(values), units=units, **kwargs)
+
+    @property
+    def version(self) -> str:
+        """Short form of the CSV digest, so every process that loaded the same file agrees on it"""
+        return self.digest[:12]
+
+    @property
+    def frame(self):
+        """The catalog as a pandas DataFrame; imports pandas, so keep it off request paths"""
+        import pandas as pd
+        frame = pd.DataFrame(np.asarray(self.values), columns=self.columns)
+        frame.insert(0, 'Food', self.names)
+        if any(self.units):
+            frame[UNIT_COLUMN] = self.units
+        return frame
+
+    def take(self, indices: np.ndarray) -> 'FoodCatalog':
+        """A catalog of the given rows"""
+        return FoodCatalog([self.names[i] for i in indices], self.columns, self.values[indices],
+                           digest=self.digest, mtime=self.mtime,
+                           units=[self.units[i] for i in indices])
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @property
+    def empty(self) -> bool:
+        return len(self.names) == 0
+
+    def column(self, name: str) -> np.ndarray:
+        """Return the values of a numeric column (per 100g)"""
+        return self.values[:, self._column_index[name]]
+
+    def meal_affinity(self, meal_types: List[str]) -> np.ndarray:
+        """Return a (meals × foods) affinity matrix; meals without a column default to 1"""
+        return np.vstack([
+            self.column(meal + AFFINITY_SUFFIX) if meal + AFFINITY_SUFFIX in self._column_index
+            else np.ones(len(self.names))
+            for meal in meal_types
+        ])
+
+    def serving_grams(self) -> np.ndarray:
+        """Grams per serving, 0 for foods measured in grams"""
+        if SERVING_COLUMN not in self._column_index:
+            return np.zeros(len(self.names))
+        grams = np.nan_to_num(self.column(SERVING_COLUMN))
+        return np.where(grams > 0, grams, 0.0)
+
+    def indices_for(self, dietary_preference: str) -> np.ndarray:
+        """Return catalog row indices allowed for a dietary preference"""
+        return self.diet_index.get(dietary_preference, self.diet_index['non_veg'])
+
+    def _build_diet_index(self) -> Dict[str, np.ndarray]:
+        names = np.array(self.names, dtype=object)
+        is_meat = np.isin(names, MEAT_FOODS)
+        is_egg = np.isin(names, EGG_FOODS)
+        return {
+            'veg': np.flatnonzero(~is_meat & ~is_egg),
+            'eggetarian': np.flatnonzero(~is_meat),
+            'non_veg': np.arange(len(self.names)),
+        }
+
+
+_catalogs: Dict[str, FoodCatalog] = {}
+_catalog_lock = threading.Lock()
+
+
+def parse_csv(data: bytes) -> Tuple[List[str], List[str], np.ndarray, List[str]]:
+    """Parse foods CSV bytes into (names, numeric columns, values, units) with the csv module
+
+    A column is numeric when every non-empty cell parses as a float; empty
+    cells become NaN. Text columns other than Food and Unit are ignored.
+    """
+    reader = csv.reader(io.StringIO(data.decode('utf-8-sig')))
+    header = next(reader, None)
+    if not header or 'Food' not in header:
+        return [], [], np.zeros((0, 0)), []
+    rows = [row for row in reader if any(cell.strip() for cell in row)]
+    food = header.index('Food')
+    names = [row[food].strip() if food < len(row) else '' for row in rows]
+    unit = header.index(UNIT_COLUMN) if UNIT_COLUMN in header else None
+    units = [row[unit].strip() if unit is not None and unit < len(row) else '' for row in rows]
+
+    columns, data_columns = [], []
+    for j, column in enumerate(header):
+        if j in (food, unit):
+            continue
+        cells = [row[j].strip() if j < len(row) else '' for row in rows]
+        try:
+            data_columns.append([float(cell) if cell else np.nan for cell in cells])
+        except ValueError:
+            continue
+        columns.append(column)
+    values = np.array(data_columns, dtype=np.float64).T.copy() if columns else np.zeros((len(names), 0))
+    return names, columns, values.reshape(len(names), len(columns)), units
+
+
+def compiled_paths(path: str) -> Tuple[str, str]:
+    """The compiled (values .npy, name table .json) files for a foods CSV"""
+    base = os.path.splitext(path)[0] + '.catalog'
+    return base + '.npy', base + '.json'
+
+
+def compile_catalog(path: str = FOODS_CSV_PATH) -> Tuple[str, str]:
+    """Compile a foods CSV into a structured .npy array plus a JSON name table
+
+    The CSV stays the source of truth: the name table records the CSV's
+    digest, and load_catalog ignores compiled files that don't match it.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    names, columns, values, units = parse_csv(data)
+    records = np.zeros(len(names), dtype=[(column, '<f8') for column in columns])
+    for i, column in enumerate(columns):
+        records[column] = values[:, i]
+
+    npy_path, json_path = compiled_paths(path)
+    for target, write in (
+        (npy_path, lambda f: np.save(f, records)),
+        (json_path, lambda f: f.write(json.dumps({
+            'format': CATALOG_FORMAT,
+            'source_digest': hashlib.sha1(data).hexdigest(),
+            'columns': columns,
+            'names': names,
+            'units': units
+        }).encode('utf-8')))
+    ):
+        tmp = f"{target}.tmp-{os.getpid()}"
+        with open(tmp, 'wb') as f:
+            write(f)
+        os.replace(tmp, target)
+    return npy_path, json_path
+
+
+def _load_compiled(path: str, digest: str) -> Optional[Tuple[List[str], List[str], np.ndarray, List[str]]]:
+    """Memory-map the compiled catalog if it was built from this exact CSV"""
+    npy_path, json_path = compiled_paths(path)
+    try:
+        with open(json_path) as f:
+            table = json.load(f)
+        if table.get('format') != CATALOG_FORMAT or table.get('source_digest') != digest:
+            return None
+        records = np.load(npy_path, mmap_mode='r')
+    except (OSError, ValueError):
+        return None
+
+    names, columns, units = table['names'], table['columns'], table['units']
+    if list(records.dtype.names or ()) != columns or len(records) != len(names):
+        return None
+    if not columns or not names:
+        return names, columns, np.zeros((len(names), len(columns))), units
+    # All fields are float64, so the records are a (foods × columns) matrix in place
+    return names, columns, records.view(np.float64).reshape(len(names), len(columns)), units
+
+
+def load_catalog(path: str = FOODS_CSV_PATH) -> FoodCatalog:
+    """Load a foods CSV, from its compiled binary when that is up to date"""
+    with span('catalog_load'):
+        stat = os.stat(path)
+        with open(path, 'rb') as f:
+            data = f.read()
+        digest = hashlib.sha1(data).hexdigest()
+        loaded = _load_compiled(path, digest)
+        if loaded is None:
+            logging.info(f"No up-to-date compiled catalog for {path}; parsing the CSV "
+                         f"(run `python -m food_catalog` to build one)")
+            loaded = parse_csv(data)
+    names, columns, values, units = loaded
+    return FoodCatalog(
+        names, columns, values,
+        digest=digest,
+        mtime=stat.st_mtime_ns,
+        units=units
+    )
+
+
+def get_catalog(path: str = FOODS_CSV_PATH) -> FoodCatalog:
+    """Return the process-wide catalog, reloading it if the file changed
+
+    The old catalog keeps serving until the new one is fully parsed, and
+    is kept if the reload fails (for example on a half-written file).
+    """
+    catalog = _catalogs.get(path)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError as e:
+        if catalog is None:
+            logging.error(f"Error loading foods data: {e}")
+            return FoodCatalog([], [], np.zeros((0, 0)))
+        return catalog
+
+    if catalog is not None and catalog.mtime == mtime:
+        return catalog
+
+    with _catalog_lock:
+        catalog = _catalogs.get(path)
+        if catalog is not None and catalog.mtime == mtime:
+            return catalog
+        try:
+            new_catalog = load_catalog(path)
+        except Exception as e:
+            logging.error(f"Error loading foods data: {e}")
+            return catalog if catalog is not None else FoodCatalog([], [], np.zeros((0, 0)))
+        # A file that was touched but not changed keeps its digest, and with it its version, so caches stay warm
+        _catalogs[path] = new_catalog
+        logging.info(f"Loaded food catalog {path} (version {new_catalog.version}, {len(new_catalog)} foods)")
+        return new_catalog
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Compile the foods CSV into the binary catalog workers load')
+    parser.add_argument('--csv', default=FOODS_CSV_PATH, help='foods CSV (default: $FOODS_CSV or foods.csv)')
+    args = parser.parse_args(argv)
+    try:
+        npy_path, json_path = compile_catalog(args.csv)
+    except OSError as e:
+        print(f"Error compiling {args.csv}: {e}", file=sys.stderr)
+        return 1
+    print(f"Compiled {args.csv} -> {npy_path}, {json_path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,282 +1,907 @@
-import pandas as pd
+import os
+import time
+import numpy as np
 import pulp
 import logging
-from typing import Dict, List, Tuple, Any
+from dataclasses import dataclass, field, replace
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Tuple, Any, Union, Optional, Iterator, Iterable
+from food_catalog import FoodCatalog
+from nutrient_targets import NutrientTarget
+from pantry import Pantry, pantry_stock, pantry_names, pantry_key, copy_pantry
+from substitution_index import SubstitutionIndex
+from metrics import span, record_solve
+
+try:
+    from scipy import optimize as _scipy_optimize
+    from scipy import sparse as _scipy_sparse
+except ImportError:  # CBC through PuLP still works without scipy
+    _scipy_optimize = None
+    _scipy_sparse = None
+
+# Maximum grams of any single food per day
+MAX_GRAMS_PER_FOOD = 500
+# Calorie band around the target (±5%)
+CALORIE_TOLERANCE = 0.05
+# Pantry items given by name only are priced at 50% in the objective
+# (with quantities, stocked grams are free up to the amount on hand)
+PANTRY_COST_FACTOR = 0.5
+# Batches with fewer distinct problems than this are solved in-process
+BATCH_MIN_PARALLEL = 8
+
+# Share of the daily calorie target eaten at each meal, ± MEAL_SHARE_TOLERANCE
+MEAL_CALORIE_SHARES = {'Breakfast': 0.25, 'Lunch': 0.35, 'Snack': 0.10, 'Dinner': 0.30}
+MEAL_SHARE_TOLERANCE = 0.10
+# A food with meal affinity a (from foods.csv) costs (1 + penalty × (1 - a)) in
+# the objective at that meal; affinity 0 means it is never served there
+AFFINITY_PENALTY = 0.25
+
+# Weekly planner variety rules
+MIN_GRAMS_IF_SELECTED = 20
+WEEKLY_MIN_FOODS_PER_DAY = 4
+WEEKLY_MAX_REPEAT_DAYS = 4
+WEEKLY_CAP_GRAMS = 1500
+# Accept the relax-and-fix weekly plan when within this gap of the LP bound,
+# otherwise run the full MIP for at most WEEKLY_TIME_LIMIT seconds
+WEEKLY_MIP_GAP = 0.05
+WEEKLY_TIME_LIMIT = 1.0
+# With nutrient targets the LP bound is weak: relax-and-fix plans sit 8-12% above
+# it but within ~1.5% of the MIP optimum (which takes 3-10 s to prove), so accept
+# them up to this gap instead of spending the time limit on the MIP
+WEEKLY_TARGETS_ACCEPT_GAP = 0.15
+
+# LinearModel.integrality values (HiGHS variable types)
+CONTINUOUS, INTEGER, SEMICONTINUOUS = 0, 1, 2
+
+# nutrition_summary key -> catalog column
+NUTRITION_COLUMNS = {
+    'calories': 'Kcal',
+    'protein': 'Protein',
+    'fat': 'Fat',
+    'carbs': 'Carbs',
+    'fiber': 'Fiber',
+    'iron': 'Iron'
+}
+
+
+@dataclass
+class LinearModel:
+    """A linear program in matrix form
+
+    minimize c @ x  subject to  row_lower <= A @ x <= row_upper
+                                col_lower <= x <= col_upper
+
+    ``A`` may be a dense array or a scipy.sparse matrix. Infinite bounds
+    mean the side is unconstrained. ``row_names`` label the rows so callers
+    can find e.g. the budget row without remembering its position.
+    ``integrality`` marks columns CONTINUOUS, INTEGER or SEMICONTINUOUS
+    (0 or between its bounds). ``time_limit`` (seconds) and ``mip_gap``
+    (relative) only apply to models with integer columns.
+    """
+    c: np.ndarray
+    A: Any
+    row_lower: np.ndarray
+    row_upper: np.ndarray
+    col_lower: np.ndarray
+    col_upper: np.ndarray
+    row_names: List[str] = field(default_factory=list)
+    integrality: Optional[np.ndarray] = None
+    time_limit: Optional[float] = None
+    mip_gap: Optional[float] = None
+
+    @property
+    def num_cols(self) -> int:
+        return len(self.c)
+
+    def row(self, name: str) -> int:
+        return self.row_names.index(name)
+
+
+@dataclass
+class SolveResult:
+    """Outcome of one solver call"""
+    status: str  # 'optimal', 'feasible' (MIP stopped early), 'timeout' (stopped with no plan), 'infeasible' or 'error'
+    x: Optional[np.ndarray]
+    objective: Optional[float]
+    backend: str
+    solve_time: float  # seconds
+    gap: Optional[float] = None  # relative gap to the best bound, for MIPs
+
+
+def _matrix_rows(A) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """Yield (column indices, values) for each row of a dense or sparse matrix"""
+    if hasattr(A, 'tocsr'):
+        A = A.tocsr()
+        for r in range(A.shape[0]):
+            start, end = A.indptr[r], A.indptr[r + 1]
+            yield A.indices[start:end], A.data[start:end]
+    else:
+        A = np.atleast_2d(np.asarray(A))
+        for values in A:
+            cols = np.flatnonzero(values)
+            yield cols, values[cols]
+
+
+class _RowBuilder:
+    """Accumulates constraint rows as (row, col, value) triplets
+
+    Each add() call appends one row per leading index of `cols` (shape:
+    rows × terms), so whole blocks of constraints are added with array
+    operations. Zero coefficients are dropped, so rows over sparse nutrient
+    columns only store the foods that contain the nutrient. matrix()
+    returns a CSR matrix when scipy is available.
+    """
+
+    def __init__(self):
+        self._rows, self._cols, self._vals = [], [], []
+        self.lower, self.upper, self.names = [], [], []
+
+    def add(self, name: str, cols: np.ndarray, values, lower, upper):
+        cols = np.atleast_2d(cols)
+        start, count = len(self.names), cols.shape[0]
+        vals = np.broadcast_to(np.asarray(values, dtype=float), cols.shape).ravel()
+        nonzero = vals != 0
+        self._rows.append(np.repeat(np.arange(start, start + count), cols.shape[1])[nonzero])
+        self._cols.append(cols.ravel()[nonzero])
+        self._vals.append(vals[nonzero])
+        self.lower.append(np.broadcast_to(np.asarray(lower, dtype=float), (count,)))
+        self.upper.append(np.broadcast_to(np.asarray(upper, dtype=float), (count,)))
+        self.names.extend([name] if count == 1 else [f"{name}[{i}]" for i in range(count)])
+
+    def matrix(self, num_cols: int):
+        rows, cols, vals = (np.concatenate(parts) for parts in (self._rows, self._cols, self._vals))
+        shape = (len(self.names), num_cols)
+        if _scipy_sparse is not None:
+            return _scipy_sparse.csr_matrix((vals, (rows, cols)), shape=shape)
+        A = np.zeros(shape)
+        np.add.at(A, (rows, cols), vals)
+        return A
+
+    def bounds(self) -> Tuple[np.ndarray, np.ndarray]:
+        return np.concatenate(self.lower), np.concatenate(self.upper)
+
+
+class SolverBackend:
+    """Interface for LP/MIP engines used by MealOptimizer"""
+    name = 'base'
+
+    def solve(self, model: LinearModel) -> SolveResult:
+        raise NotImplementedError
+
+
+class HighsBackend(SolverBackend):
+    """In-process HiGHS via scipy, working on the model matrices directly"""
+    name = 'highs'
+
+    def solve(self, model: LinearModel) -> SolveResult:
+        start = time.perf_counter()
+        if model.integrality is not None and np.any(model.integrality):
+            options = {}
+            if model.time_limit is not None:
+                options['time_limit'] = model.time_limit
+            if model.mip_gap is not None:
+                options['mip_rel_gap'] = model.mip_gap
+            res = _scipy_optimize.milp(
+                model.c,
+                constraints=_scipy_optimize.LinearConstraint(model.A, model.row_lower, model.row_upper),
+                bounds=_scipy_optimize.Bounds(model.col_lower, model.col_upper),
+                integrality=model.integrality,
+                options=options,
+            )
+            elapsed = time.perf_counter() - start
+            if res.status == 1:
+                # Time limit hit, with or without an incumbent in hand
+                if res.x is None:
+                    return SolveResult('timeout', None, None, self.name, elapsed)
+                return SolveResult('feasible', np.asarray(res.x), float(res.fun), self.name, elapsed)
+        else:
+            A_ub, b_ub = self._inequalities(model)
+            res = _scipy_optimize.linprog(
+                model.c, A_ub=A_ub, b_ub=b_ub,
+                bounds=np.column_stack([model.col_lower, model.col_upper]),
+                method='highs',
+            )
+            elapsed = time.perf_counter() - start
+
+        if res.status == 0:
+            return SolveResult('optimal', np.asarray(res.x), float(res.fun), self.name, elapsed)
+        if res.status == 2:
+            return SolveResult('infeasible', None, None, self.name, elapsed)
+        return SolveResult('error', None, None, self.name, elapsed)
+
+    @staticmethod
+    def _inequalities(model: LinearModel) -> Tuple[Any, np.ndarray]:
+        """Rewrite row bounds as A_ub @ x <= b_ub for linprog"""
+        upper = np.isfinite(model.row_upper)
+        lower = np.isfinite(model.row_lower)
+        A = model.A
+        if hasattr(A, 'tocsr'):
+            A = A.tocsr()
+            A_ub = _scipy_sparse.vstack([A[upper], -A[lower]], format='csr')
+        else:
+            A = np.atleast_2d(np.asarray(A))
+            A_ub = np.vstack([A[upper], -A[lower]])
+        b_ub = np.concatenate([model.row_upper[upper], -model.row_lower[lower]])
+        return A_ub, b_ub
+
+
+class CbcBackend(SolverBackend):
+    """CBC through PuLP; spawns the solver binary on every call"""
+    name = 'cbc'
+
+    def solve(self, model: LinearModel) -> SolveResult:
+        start = time.perf_counter()
+        prob = pulp.LpProblem("Meal_Plan_Optimization", pulp.LpMinimize)
+        integrality = model.integrality if model.integrality is not None else np.zeros(model.num_cols)
+        variables = [
+            pulp.LpVariable(
+                f"x_{i}",
+                lowBound=(0 if kind == SEMICONTINUOUS else lo) if np.isfinite(lo) else None,
+                upBound=up if np.isfinite(up) else None,
+                cat='Integer' if kind == INTEGER else 'Continuous'
+            )
+            for i, (lo, up, kind) in enumerate(zip(model.col_lower.tolist(), model.col_upper.tolist(), integrality))
+        ]
+
+        prob += pulp.LpAffineExpression(zip(variables, model.c.tolist()))
+        # CBC has no semicontinuous columns: x = 0 or lo <= x <= up via an on/off binary
+        for i in np.flatnonzero(integrality == SEMICONTINUOUS):
+            on = pulp.LpVariable(f"on_{i}", cat='Binary')
+            prob += variables[i] <= model.col_upper[i] * on
+            prob += variables[i] >= model.col_lower[i] * on
+        for r, (cols, values) in enumerate(_matrix_rows(model.A)):
+            expr = pulp.LpAffineExpression(zip((variables[j] for j in cols), values.tolist()))
+            lo, up = model.row_lower[r], model.row_upper[r]
+            if np.isfinite(lo) and lo == up:
+                prob += expr == lo
+                continue
+            if np.isfinite(lo):
+                prob += expr >= lo
+            if np.isfinite(up):
+                prob += expr <= up
+
+        prob.solve(pulp.PULP_CBC_CMD(msg=0, timeLimit=model.time_limit, gapRel=model.mip_gap))
+        elapsed = time.perf_counter() - start
+
+        if prob.status == pulp.LpStatusOptimal:
+            x = np.array([var.varValue or 0.0 for var in variables])
+            status = 'feasible' if prob.sol_status == pulp.LpSolutionIntegerFeasible else 'optimal'
+            return SolveResult(status, x, float(model.c @ x), self.name, elapsed)
+        if prob.status == pulp.LpStatusInfeasible:
+            return SolveResult('infeasible', None, None, self.name, elapsed)
+        return SolveResult('error', None, None, self.name, elapsed)
+
+
+SOLVER_BACKENDS = {
+    HighsBackend.name: HighsBackend,
+    CbcBackend.name: CbcBackend,
+}
+
+
+def get_solver_backend(name: Optional[str] = None) -> SolverBackend:
+    """Return a solver backend by name, defaulting to $MEAL_SOLVER or in-process HiGHS"""
+    name = name or os.environ.get('MEAL_SOLVER') or (HighsBackend.name if _scipy_optimize else CbcBackend.name)
+    if name == HighsBackend.name and _scipy_optimize is None:
+        logging.warning("scipy is not installed; falling back to the CBC solver backend")
+        name = CbcBackend.name
+    if name not in SOLVER_BACKENDS:
+        raise ValueError(f"Unknown solver backend: {name}")
+    return SOLVER_BACKENDS[name]()
 
 class MealOptimizer:
-    def __init__(self, foods_df: pd.DataFrame):
-        self.foods_df = foods_df
+    def __init__(self, foods: FoodCatalog, 
+                 solver: Union[SolverBackend, str, None] = None):
+        # A DataFrame is still accepted and converted once; requests never touch pandas
+        self.catalog = foods if isinstance(foods, FoodCatalog) else FoodCatalog.from_frame(foods)
+        self.solver = solver if isinstance(solver, SolverBackend) else get_solver_backend(solver)
         self.meal_types = ['Breakfast', 'Lunch', 'Snack', 'Dinner']
+        self.substitutes = SubstitutionIndex(self.catalog)
+        
+    @property
+    def foods_df(self):
+        """The catalog as a DataFrame (imports pandas; for notebooks and scripts)"""
+        return self.catalog.frame
         
-    def filter_foods_by_preference(self, dietary_preference: str) -> pd.DataFrame:
+    def filter_foods_by_preference(self, dietary_preference: str) -> FoodCatalog:
         """Filter foods based on dietary preference"""
-        if dietary_preference == 'veg':
-            # Exclude non-veg items
-            non_veg_foods = ['Chicken', 'Fish', 'Mutton', 'Prawns', 'Beef']
-            return self.foods_df[~self.foods_df['Food'].isin(non_veg_foods)]
-        elif dietary_preference == 'non_veg':
-            # Include all foods
-            return self.foods_df
-        elif dietary_preference == 'eggetarian':
-            # Exclude meat but allow eggs
-            meat_foods = ['Chicken', 'Fish', 'Mutton', 'Prawns', 'Beef']
-            return self.foods_df[~self.foods_df['Food'].isin(meat_foods)]
-        
-        return self.foods_df
+        # veg excludes meat and eggs, eggetarian excludes meat, anything else gets all foods
+        return self.catalog.take(self.catalog.indices_for(dietary_preference))
     
     def optimize_meal_plan(self, calorie_target: int, protein_target: int, 
                           budget: float, dietary_preference: str, 
-                          pantry_items: List[str]) -> Dict[str, Any]:
+                          pantry_items: Pantry,
+                          nutrient_targets: Optional[Iterable[NutrientTarget]] = None) -> Dict[str, Any]:
         """
         Optimize meal plan using Linear Programming
+        
+        `nutrient_targets` adds a min/max row per nutrient on top of the
+        calorie, protein and budget rows (see nutrient_targets.targets_for).
         """
         try:
             # Filter foods based on dietary preference
-            available_foods = self.filter_foods_by_preference(dietary_preference)
+            with span('filter'):
+                food_idx = self.catalog.indices_for(dietary_preference)
             
-            if available_foods.empty:
+            if len(food_idx) == 0:
                 return {
                     'status': 'error',
                     'message': 'No foods available for your dietary preference.'
                 }
             
-            # Create the optimization problem
-            prob = pulp.LpProblem("Meal_Plan_Optimization", pulp.LpMinimize)
-            
-            # Decision variables: quantity of each food in grams
-            food_vars = {}
-            for idx, food in available_foods.iterrows():
-                food_vars[food['Food']] = pulp.LpVariable(
-                    f"food_{food['Food']}", 
-                    lowBound=0, 
-                    cat='Continuous'
+            with span('build'):
+                model = self._build_model(
+                    food_idx, calorie_target, protein_target, budget, pantry_items, nutrient_targets
                 )
             
-            # Objective: Minimize cost while preferring pantry items
-            cost_expr = 0
-            for idx, food in available_foods.iterrows():
-                food_name = food['Food']
-                cost_per_gram = food['Cost'] / 100  # Cost per gram
-                
-                # Give preference to pantry items by reducing their effective cost
-                if food_name in pantry_items:
-                    cost_per_gram *= 0.5  # 50% preference for pantry items
-                
-                cost_expr += food_vars[food_name] * cost_per_gram
-            
-            prob += cost_expr
-            
-            # Constraints
-            
-            # 1. Calorie constraint (±5% tolerance)
-            calorie_expr = 0
-            for idx, food in available_foods.iterrows():
-                calorie_per_gram = food['Kcal'] / 100
-                calorie_expr += food_vars[food['Food']] * calorie_per_gram
-            
-            prob += calorie_expr >= calorie_target * 0.95
-            prob += calorie_expr <= calorie_target * 1.05
-            
-            # 2. Protein constraint (at least target amount)
-            protein_expr = 0
-            for idx, food in available_foods.iterrows():
-                protein_per_gram = food['Protein'] / 100
-                protein_expr += food_vars[food['Food']] * protein_per_gram
-            
-            prob += protein_expr >= protein_target
-            
-            # 3. Budget constraint
-            budget_expr = 0
-            for idx, food in available_foods.iterrows():
-                cost_per_gram = food['Cost'] / 100
-                budget_expr += food_vars[food['Food']] * cost_per_gram
-            
-            prob += budget_expr <= budget
-            
-            # 4. Reasonable portion constraints (prevent unrealistic solutions)
-            for idx, food in available_foods.iterrows():
-                food_name = food['Food']
-                # Maximum 500g of any single food per day
-                prob += food_vars[food_name] <= 500
-                
-                # Minimum variety: if food is selected, at least 20g
-                # This is handled by the solver automatically due to cost minimization
-            
-            # 5. Ensure some variety (at least 4 different foods)
-            # This is a complex constraint, simplified by encouraging variety through costs
-            
             # Solve the problem
-            prob.solve(pulp.PULP_CBC_CMD(msg=0))
+            with span('solve'):
+                solved = self.solve_model(model)
             
             # Check if solution exists
-            if prob.status != pulp.LpStatusOptimal:
+            if solved.status != 'optimal':
                 return {
                     'status': 'error',
                     'message': 'No feasible meal plan found with current constraints. Try increasing your budget or relaxing dietary restrictions.'
                 }
             
-            # Extract solution
-            solution = {}
-            total_cost = 0
-            total_nutrition = {
-                'calories': 0,
-                'protein': 0,
-                'fat': 0,
-                'carbs': 0,
-                'fiber': 0,
-                'iron': 0
+            result = self._build_result(food_idx, solved.x, pantry_items)
+            result['solver'] = {
+                'backend': solved.backend,
+                'solve_time_ms': round(solved.solve_time * 1000, 2)
             }
+            return result
             
-            selected_foods = []
-            for idx, food in available_foods.iterrows():
-                food_name = food['Food']
-                quantity = food_vars[food_name].varValue
-                
-                if quantity and quantity > 1:  # Only include foods with meaningful quantities
-                    food_cost = (quantity / 100) * food['Cost']
-                    total_cost += food_cost
-                    
-                    # Calculate nutrition
-                    factor = quantity / 100
-                    total_nutrition['calories'] += food['Kcal'] * factor
-                    total_nutrition['protein'] += food['Protein'] * factor
-                    total_nutrition['fat'] += food['Fat'] * factor
-                    total_nutrition['carbs'] += food['Carbs'] * factor
-                    total_nutrition['fiber'] += food['Fiber'] * factor
-                    total_nutrition['iron'] += food['Iron'] * factor
-                    
-                    selected_foods.append({
-                        'name': food_name,
-                        'quantity': round(quantity, 1),
-                        'cost': round(food_cost, 2),
-                        'calories': round(food['Kcal'] * factor, 1),
-                        'protein': round(food['Protein'] * factor, 1)
-                    })
+        except Exception as e:
+            logging.error(f"Error in meal optimization: {e}")
+            return {
+                'status': 'error',
+                'message': 'An error occurred during optimization. Please try again with different parameters.'
+            }
+    
+    def optimize_weekly_plan(self, calorie_target: int, protein_target: int, 
+                             budget: float, dietary_preference: str, 
+                             pantry_items: Pantry, days: int = 7,
+                             min_foods_per_day: int = WEEKLY_MIN_FOODS_PER_DAY,
+                             max_repeat_days: int = WEEKLY_MAX_REPEAT_DAYS,
+                             weekly_cap_grams: float = WEEKLY_CAP_GRAMS,
+                             nutrient_targets: Optional[Iterable[NutrientTarget]] = None) -> Dict[str, Any]:
+        """
+        Optimize a multi-day plan as one MIP over days × meals × foods.
+        
+        Every day meets the calorie, protein and per-day budget targets, each
+        meal gets its share of the day's calories, at least `min_foods_per_day`
+        different foods (20g or more each) are eaten per day, no food appears on
+        more than `max_repeat_days` days, and no food exceeds `weekly_cap_grams`.
+        Nutrient targets apply to each day. Pantry stock is shared by all
+        days, so the plan spreads it where it saves the most, and the result
+        carries a shopping list of what is left to buy for the whole plan.
+        """
+        try:
+            if _scipy_sparse is None:
+                return {
+                    'status': 'error',
+                    'message': 'Weekly plans are not available on this server.'
+                }
             
-            if not selected_foods:
+            food_idx = self.catalog.indices_for(dietary_preference)
+            if len(food_idx) == 0:
                 return {
                     'status': 'error',
-                    'message': 'No valid meal plan could be generated. Please try increasing your budget.'
+                    'message': 'No foods available for your dietary preference.'
+                }
+            nutrient_targets = tuple(nutrient_targets or ())
+            
+            with span('weekly_build'):
+                model = self._build_weekly_model(
+                    food_idx, calorie_target, protein_target, budget, pantry_items,
+                    days, min_foods_per_day, max_repeat_days, weekly_cap_grams, nutrient_targets
+                )
+            with span('weekly_solve'):
+                solved = self._solve_weekly(model, food_idx, days, min_foods_per_day, max_repeat_days,
+                                            WEEKLY_TARGETS_ACCEPT_GAP if nutrient_targets else model.mip_gap)
+            
+            if solved.status not in ('optimal', 'feasible'):
+                return {
+                    'status': 'error',
+                    'message': 'No feasible weekly plan found with current constraints. Try increasing your budget or relaxing dietary restrictions.'
                 }
             
-            # Distribute foods across meals
-            meal_plan = self._distribute_foods_to_meals(selected_foods)
+            M, N = len(self.meal_types), len(food_idx)
+            num_x = days * M * N
+            grams = solved.x[:num_x].reshape(days, M, N)
+            pantry_pos, _ = self._pantry_columns(food_idx, pantry_items)
+            from_pantry = np.zeros((days, N))
+            from_pantry[:, pantry_pos] = solved.x[num_x + days * N:].reshape(days, len(pantry_pos))
+            coefs = self._coefficients(food_idx)
+            stocked = bool(pantry_stock(pantry_items))
             
-            # Generate alternatives
-            alternatives = self._generate_alternatives(available_foods, selected_foods)
+            week = []
+            for d in range(days):
+                daily = grams[d].sum(axis=0)
+                meal_plan = {
+                    meal_type: self._food_entries(food_idx, grams[d, m])
+                    for m, meal_type in enumerate(self.meal_types)
+                }
+                day = {
+                    'day': d + 1,
+                    'meal_plan': meal_plan,
+                    'nutrition_summary': {
+                        key: round(float(coefs[column] @ daily), 1)
+                        for key, column in NUTRITION_COLUMNS.items()
+                    },
+                    'total_cost': round(float(coefs['Cost'] @ daily), 2)
+                }
+                if stocked:
+                    day.update(self._pantry_summary(food_idx, daily, from_pantry[d]))
+                week.append(day)
             
-            return {
+            # One shopping trip for the whole plan: everything eaten that the pantry doesn't cover
+            eaten = grams.sum(axis=(0, 1))
+            to_buy = np.maximum(eaten - from_pantry.sum(axis=0), 0)
+            result = {
                 'status': 'success',
-                'meal_plan': meal_plan,
-                'nutrition_summary': {
-                    'calories': round(total_nutrition['calories'], 1),
-                    'protein': round(total_nutrition['protein'], 1),
-                    'fat': round(total_nutrition['fat'], 1),
-                    'carbs': round(total_nutrition['carbs'], 1),
-                    'fiber': round(total_nutrition['fiber'], 1),
-                    'iron': round(total_nutrition['iron'], 1)
-                },
-                'total_cost': round(total_cost, 2),
-                'alternatives': alternatives
+                'days': week,
+                'total_cost': round(sum(day['total_cost'] for day in week), 2),
+                'distinct_foods': int(np.count_nonzero(eaten > 1)),
+                'shopping_list': self._food_entries(food_idx, to_buy),
+                'solver': {
+                    'backend': solved.backend,
+                    'solve_time_ms': round(solved.solve_time * 1000, 2),
+                    'gap': solved.gap
+                }
             }
+            if stocked:
+                result['purchase_cost'] = round(float(coefs['Cost'] @ to_buy), 2)
+            return result
             
         except Exception as e:
-            logging.error(f"Error in meal optimization: {e}")
+            logging.error(f"Error in weekly meal optimization: {e}")
             return {
                 'status': 'error',
                 'message': 'An error occurred during optimization. Please try again with different parameters.'
             }
     
-    def _distribute_foods_to_meals(self, selected_foods: List[Dict]) -> Dict[str, List[Dict]]:
-        """Distribute selected foods across meals based on typical Indian eating patterns"""
-        meal_plan = {
-            'Breakfast': [],
-            'Lunch': [],
-            'Snack': [],
-            'Dinner': []
-        }
+    def optimize_batch(self, profiles: Iterable[Dict[str, Any]], 
+                       max_workers: Optional[int] = None) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """
+        Optimize many profiles, yielding (profile index, result) as each solve finishes.
         
-        # Define typical meal distributions
-        breakfast_foods = ['Poha', 'Upma', 'Milk', 'Banana', 'Egg', 'Bread']
-        lunch_foods = ['Rice', 'Roti', 'Dal', 'Rajma', 'Chole', 'Spinach', 'Curd']
-        snack_foods = ['Peanut', 'Banana', 'Biscuit', 'Tea']
-        dinner_foods = ['Rice', 'Roti', 'Dal', 'Paneer', 'Chicken', 'Spinach']
+        Each profile is a dict of optimize_meal_plan keyword arguments. Identical
+        problems are solved once; the rest are fanned out over a process pool whose
+        workers each hold one copy of this optimizer's catalog.
+        """
+        problems: Dict[Tuple, List[int]] = {}
+        params: Dict[Tuple, Dict[str, Any]] = {}
+        for i, profile in enumerate(profiles):
+            key = (
+                profile['calorie_target'], profile['protein_target'], float(profile['budget']),
+                profile['dietary_preference'], pantry_key(profile.get('pantry_items')),
+                tuple(profile.get('nutrient_targets') or ())
+            )
+            if key not in problems:
+                problems[key] = []
+                params[key] = {
+                    'calorie_target': key[0],
+                    'protein_target': key[1],
+                    'budget': key[2],
+                    'dietary_preference': key[3],
+                    'pantry_items': copy_pantry(profile.get('pantry_items')),
+                    'nutrient_targets': key[5]
+                }
+            problems[key].append(i)
         
-        total_foods = len(selected_foods)
-        foods_per_meal = max(1, total_foods // 4)
+        # Group by diet so consecutive solves in a worker share a column set
+        keys = sorted(problems, key=lambda k: k[3])
+        workers = min(max_workers or os.cpu_count() or 1, len(keys))
         
-        food_index = 0
+        if workers <= 1 or len(keys) < BATCH_MIN_PARALLEL:
+            for key in keys:
+                result = self.optimize_meal_plan(**params[key])
+                for i in problems[key]:
+                    yield i, result
+            return
         
-        for meal_type in self.meal_types:
-            meal_count = 0
-            
-            # First, try to assign foods typical for this meal
-            if meal_type == 'Breakfast':
-                typical_foods = breakfast_foods
-            elif meal_type == 'Lunch':
-                typical_foods = lunch_foods
-            elif meal_type == 'Snack':
-                typical_foods = snack_foods
-            else:  # Dinner
-                typical_foods = dinner_foods
-            
-            # Assign typical foods first
-            for food in selected_foods:
-                if food['name'] in typical_foods and meal_count < foods_per_meal:
-                    food_copy = food.copy()
-                    # Adjust quantity for meal portion
-                    food_copy['quantity'] = round(food_copy['quantity'] / 4, 1)
-                    food_copy['cost'] = round(food_copy['cost'] / 4, 2)
-                    meal_plan[meal_type].append(food_copy)
-                    meal_count += 1
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_batch_worker,
+                                 initargs=(self.catalog, self.solver.name)) as pool:
+            futures = {pool.submit(_solve_batch_problem, params[key]): key for key in keys}
+            for future in as_completed(futures):
+                key = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logging.error(f"Error in batch optimization: {e}")
+                    result = {
+                        'status': 'error',
+                        'message': 'An error occurred during optimization. Please try again with different parameters.'
+                    }
+                for i in problems[key]:
+                    yield i, result
+    
+    def _coefficients(self, food_idx: np.ndarray) -> Dict[str, np.ndarray]:
+        """Per-gram coefficient vectors for the selected catalog rows"""
+        values = self.catalog.values[food_idx] / 100
+        return {column: values[:, i] for i, column in enumerate(self.catalog.columns)}
+    
+    def _objective_costs(self, food_idx: np.ndarray, pantry_items: Pantry) -> np.ndarray:
+        """Per-gram objective costs, with pantry items given by name discounted"""
+        costs = self.catalog.column('Cost')[food_idx] / 100
+        pantry_rows = [self.catalog.name_index[name] for name in set(pantry_names(pantry_items)) 
+                       if name in self.catalog.name_index]
+        # Give preference to pantry items by reducing their effective cost
+        return np.where(np.isin(food_idx, pantry_rows), costs * PANTRY_COST_FACTOR, costs)
+    
+    def _pantry_columns(self, food_idx: np.ndarray, pantry_items: Pantry) -> Tuple[np.ndarray, np.ndarray]:
+        """Positions in food_idx of the foods with pantry stock, and the grams on hand of each"""
+        stock = {self.catalog.name_index[name]: grams for name, grams in pantry_stock(pantry_items).items()
+                 if name in self.catalog.name_index}
+        positions = np.flatnonzero(np.isin(food_idx, list(stock)))
+        return positions, np.array([stock[int(food_idx[p])] for p in positions], dtype=float)
+    
+    @staticmethod
+    def _add_pantry_rows(rows: '_RowBuilder', eaten: np.ndarray, taken: np.ndarray):
+        """Grams taken from the pantry can't exceed the grams eaten: eaten is (stocked foods, meals), taken (stocked foods,)"""
+        if len(taken):
+            cols = np.concatenate([eaten, taken[:, None]], axis=1)
+            rows.add('pantry_use', cols, np.append(-np.ones(eaten.shape[1]), 1), -np.inf, 0)
+    
+    def solve_model(self, model: LinearModel) -> SolveResult:
+        """Solve with the configured backend, falling back to CBC if it fails (not if it ran out of time)"""
+        try:
+            solved = self.solver.solve(model)
+        except Exception as e:
+            logging.warning(f"{self.solver.name} solver failed: {e}")
+            solved = SolveResult('error', None, None, self.solver.name, 0.0)
+        
+        if solved.status == 'error' and not isinstance(self.solver, CbcBackend):
+            logging.warning(f"{self.solver.name} solver returned no solution; retrying with CBC")
+            solved = CbcBackend().solve(model)
+        
+        record_solve(solved.backend, solved.status)
+        logging.debug(f"Solved {model.num_cols}-variable model with {solved.backend} "
+                      f"in {solved.solve_time * 1000:.1f}ms ({solved.status})")
+        return solved
+    
+    def _build_model(self, food_idx: np.ndarray, calorie_target: float, 
+                     protein_target: float, budget: float, 
+                     pantry_items: Pantry,
+                     nutrient_targets: Optional[Iterable[NutrientTarget]] = None) -> LinearModel:
+        """Build the meals × foods LP in one vectorized pass over the catalog arrays"""
+        coefs = self._coefficients(food_idx)
+        M, N = len(self.meal_types), len(food_idx)
+        
+        # Decision variables: x[m, f] grams of food f served at meal m, then u[k] grams of
+        # stocked food pantry_pos[k] taken from the pantry (free, up to the grams on hand)
+        x = np.arange(M * N).reshape(M, N)
+        pantry_pos, stock = self._pantry_columns(food_idx, pantry_items)
+        u = M * N + np.arange(len(pantry_pos))
+        rows = _RowBuilder()
+        
+        # Calorie constraint (±5% tolerance)
+        rows.add('calories', x.reshape(1, M * N), np.tile(coefs['Kcal'], M),
+                 calorie_target * (1 - CALORIE_TOLERANCE), calorie_target * (1 + CALORIE_TOLERANCE))
+        # Protein constraint (at least target amount)
+        rows.add('protein', x.reshape(1, M * N), np.tile(coefs['Protein'], M), protein_target, np.inf)
+        # Budget constraint on real cost of what has to be bought, not the pantry-discounted one
+        rows.add('budget', np.concatenate([x.ravel(), u])[None, :],
+                 np.concatenate([np.tile(coefs['Cost'], M), -coefs['Cost'][pantry_pos]]), -np.inf, budget)
+        # Each meal gets its share of the day's calories
+        self._add_meal_rows(rows, x, coefs, calorie_target)
+        # Maximum 500g of any single food per day
+        rows.add('max_portion', x.T, np.ones(M), -np.inf, MAX_GRAMS_PER_FOOD)
+        # Pantry grams only count when eaten
+        self._add_pantry_rows(rows, x[:, pantry_pos].T, u)
+        # Per-nutrient bounds (fiber, iron, fat/carb energy shares, ...)
+        self._add_nutrient_rows(rows, x.reshape(1, M * N), coefs, nutrient_targets)
+        
+        # Minimum portion (at least 20g if selected) needs semicontinuous columns;
+        # plan_servings.ServingPlanner adds them for plans in whole servings
+        
+        # Variety (at least WEEKLY_MIN_FOODS_PER_DAY foods a day) needs used-on-day flags, so it is
+        # enforced only by the 'variety' rows of _build_weekly_model; a day plan stays a pure LP
+        
+        c, col_upper = self._meal_costs_and_bounds(food_idx, pantry_items)
+        row_lower, row_upper = rows.bounds()
+        num_cols = M * N + len(u)
+        return LinearModel(
+            c=np.concatenate([c, -coefs['Cost'][pantry_pos]]),
+            A=rows.matrix(num_cols),
+            row_lower=row_lower,
+            row_upper=row_upper,
+            col_lower=np.zeros(num_cols),
+            col_upper=np.concatenate([col_upper, stock]),
+            row_names=rows.names
+        )
+    
+    def _add_meal_rows(self, rows: '_RowBuilder', x: np.ndarray, coefs: Dict[str, np.ndarray],
+                       calorie_target: float):
+        """Per-meal calorie bands for x of shape (..., meals, foods)"""
+        lower, upper = self._meal_calorie_bounds(calorie_target)
+        repeats = x.size // (len(self.meal_types) * x.shape[-1])
+        rows.add('meal_calories', x.reshape(-1, x.shape[-1]), coefs['Kcal'],
+                 np.tile(lower, repeats), np.tile(upper, repeats))
+    
+    def _meal_calorie_bounds(self, calorie_target: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Calorie band (lower, upper) of each meal type"""
+        M = len(self.meal_types)
+        shares = np.array([MEAL_CALORIE_SHARES.get(meal, 1 / M) for meal in self.meal_types])
+        return (np.clip(shares - MEAL_SHARE_TOLERANCE, 0, None) * calorie_target,
+                (shares + MEAL_SHARE_TOLERANCE) * calorie_target)
+    
+    def _retarget_model(self, model: LinearModel, food_idx: np.ndarray, calorie_target: float,
+                        protein_target: float, budget: float, pantry_items: Pantry,
+                        reprice: bool = True) -> Tuple[LinearModel, np.ndarray, np.ndarray]:
+        """A _build_model model moved to new targets, budget and pantry grams, sharing its matrix
+        
+        Only valid for the foods, nutrient targets and stocked foods the model
+        was built for, since those shape the matrix. Returns the model and the
+        rows and columns whose bounds were rewritten; with `reprice` the
+        objective is recomputed for the pantry foods discounted by name.
+        """
+        M, N = len(self.meal_types), len(food_idx)
+        names = model.row_names
+        meal_rows = names.index('meal_calories' if M == 1 else 'meal_calories[0]') + np.arange(M)
+        rows = np.concatenate([[names.index('calories'), names.index('protein'), names.index('budget')], meal_rows])
+        
+        row_lower, row_upper = model.row_lower.copy(), model.row_upper.copy()
+        row_lower[rows[:3]] = calorie_target * (1 - CALORIE_TOLERANCE), protein_target, -np.inf
+        row_upper[rows[:3]] = calorie_target * (1 + CALORIE_TOLERANCE), np.inf, budget
+        row_lower[meal_rows], row_upper[meal_rows] = self._meal_calorie_bounds(calorie_target)
+        
+        # Pantry columns follow the meal columns, in the order _pantry_columns returns them
+        _, stock = self._pantry_columns(food_idx, pantry_items)
+        cols = M * N + np.arange(len(stock))
+        col_upper = model.col_upper.copy()
+        col_upper[cols] = stock
+        
+        c = model.c
+        if reprice:
+            c = c.copy()
+            c[:M * N] = self._meal_costs_and_bounds(food_idx, pantry_items)[0]
+        return replace(model, c=c, row_lower=row_lower, row_upper=row_upper, col_upper=col_upper), rows, cols
+    
+    def _add_nutrient_rows(self, rows: '_RowBuilder', x: np.ndarray, coefs: Dict[str, np.ndarray],
+                           nutrient_targets: Optional[Iterable[NutrientTarget]]):
+        """One row per nutrient bound for x of shape (days, meals × foods)"""
+        M = len(self.meal_types)
+        kcal = np.nan_to_num(coefs['Kcal'])
+        for target in nutrient_targets or ():
+            if target.column not in coefs:
+                logging.warning(f"Ignoring nutrient target for unknown column {target.column}")
+                continue
+            name = f"nutrient_{target.column.lower()}"
+            values = np.nan_to_num(coefs[target.column])
+            if target.kcal_per_gram is None:
+                rows.add(name, x, np.tile(values, M), target.lower, target.upper)
+                continue
+            # share >= lower  <=>  kcal_per_gram * nutrient - lower * kcal >= 0 (and likewise for upper)
+            energy = target.kcal_per_gram * values
+            if target.lower > 0:
+                rows.add(f"{name}_min_share", x, np.tile(energy - target.lower * kcal, M), 0, np.inf)
+            if np.isfinite(target.upper):
+                rows.add(f"{name}_max_share", x, np.tile(energy - target.upper * kcal, M), -np.inf, 0)
+    
+    def _meal_costs_and_bounds(self, food_idx: np.ndarray, 
+                               pantry_items: Pantry) -> Tuple[np.ndarray, np.ndarray]:
+        """Objective costs and upper bounds for meals × foods gram variables"""
+        affinity = self.catalog.meal_affinity(self.meal_types)[:, food_idx]
+        costs = self._objective_costs(food_idx, pantry_items)[None, :] * (1 + AFFINITY_PENALTY * (1 - affinity))
+        col_upper = np.where(affinity > 0, float(MAX_GRAMS_PER_FOOD), 0.0)
+        return costs.ravel(), col_upper.ravel()
+    
+    def _solve_weekly(self, model: LinearModel, food_idx: np.ndarray, days: int,
+                      min_foods_per_day: int, max_repeat_days: int,
+                      accept_gap: Optional[float] = None) -> SolveResult:
+        """
+        Relax-and-fix heuristic for the weekly MIP, with the exact MIP as a fallback.
+        
+        The days are interchangeable, so branch-and-bound spends most of its time
+        on symmetric subtrees. Instead: solve the LP relaxation, forbid a food on
+        its lightest days while it is used on more than `max_repeat_days`, top up
+        days with too few foods using the cheapest per gram, then fix the
+        used-on-day flags and solve the remaining LP. That plan is returned
+        when within `accept_gap` (default: the model's MIP gap) of the LP bound.
+        """
+        start = time.perf_counter()
+        M, N = len(self.meal_types), len(food_idx)
+        num_x = days * M * N
+        flags = slice(num_x, num_x + days * N)
+        col_upper = model.col_upper.copy()
+        allowed = col_upper[flags].reshape(days, N)
+        
+        relaxed = self.solve_model(replace(model, integrality=None, col_upper=col_upper))
+        if relaxed.status != 'optimal':
+            return relaxed
+        bound = relaxed.objective
+        
+        while True:
+            daily = relaxed.x[:num_x].reshape(days, M, N).sum(axis=1)
+            used = daily > 1
+            over = np.flatnonzero(used.sum(axis=0) > max_repeat_days)
+            if len(over) == 0:
+                break
+            for f in over:
+                allowed[np.argsort(-daily[:, f])[max_repeat_days:], f] = 0
+            relaxed = self.solve_model(replace(model, integrality=None, col_upper=col_upper))
+            if relaxed.status != 'optimal':
+                break
+        
+        solved = None
+        if relaxed.status == 'optimal':
+            cheapest = np.argsort(self._coefficients(food_idx)['Cost'])
+            for d in range(days):
+                for f in cheapest:
+                    if used[d].sum() >= min_foods_per_day:
+                        break
+                    if not used[d, f] and allowed[d, f] and used[:, f].sum() < max_repeat_days:
+                        used[d, f] = True
             
-            # Fill remaining slots with other foods
-            while meal_count < foods_per_meal and food_index < len(selected_foods):
-                if selected_foods[food_index]['name'] not in [f['name'] for f in meal_plan[meal_type]]:
-                    food_copy = selected_foods[food_index].copy()
-                    food_copy['quantity'] = round(food_copy['quantity'] / 4, 1)
-                    food_copy['cost'] = round(food_copy['cost'] / 4, 2)
-                    meal_plan[meal_type].append(food_copy)
-                    meal_count += 1
-                food_index += 1
-        
-        # Ensure every meal has at least one food
-        for meal_type in self.meal_types:
-            if not meal_plan[meal_type] and selected_foods:
-                food_copy = selected_foods[0].copy()
-                food_copy['quantity'] = round(food_copy['quantity'] / 4, 1)
-                food_copy['cost'] = round(food_copy['cost'] / 4, 2)
-                meal_plan[meal_type].append(food_copy)
-        
-        return meal_plan
+            col_lower = model.col_lower.copy()
+            col_lower[flags] = used.ravel()
+            col_upper[flags] = used.ravel()
+            solved = self.solve_model(replace(model, integrality=None, col_lower=col_lower, col_upper=col_upper))
+        
+        heuristic = solved if solved is not None and solved.status == 'optimal' else None
+        if heuristic is not None:
+            # A fixed-flag LP optimum is only a feasible point of the MIP
+            heuristic.status = 'feasible'
+            heuristic.gap = self._gap(heuristic.objective, bound)
+            if heuristic.gap <= (accept_gap if accept_gap is not None else model.mip_gap or 0):
+                heuristic.solve_time = time.perf_counter() - start
+                return heuristic
+        
+        # Heuristic failed or is too far from the bound: fall back to the exact MIP
+        exact = self.solve_model(model)
+        if exact.status in ('optimal', 'feasible'):
+            exact.gap = self._gap(exact.objective, bound)
+        candidates = [s for s in (heuristic, exact) if s is not None and s.status in ('optimal', 'feasible')]
+        best = min(candidates, key=lambda s: s.objective) if candidates else exact
+        best.solve_time = time.perf_counter() - start
+        return best
+    
+    @staticmethod
+    def _gap(objective: float, bound: float) -> float:
+        """Relative gap between a MIP solution and its LP relaxation bound"""
+        return max(0.0, (objective - bound) / abs(objective)) if objective else 0.0
     
-    def _generate_alternatives(self, available_foods: pd.DataFrame, 
-                             selected_foods: List[Dict]) -> Dict[str, List[Dict]]:
-        """Generate alternative food suggestions for cost-effectiveness"""
-        alternatives = {}
-        selected_names = [food['name'] for food in selected_foods]
-        
-        for selected_food in selected_foods:
-            food_alternatives = []
+    def _build_weekly_model(self, food_idx: np.ndarray, calorie_target: float, 
+                            protein_target: float, budget: float, pantry_items: Pantry,
+                            days: int, min_foods_per_day: int, max_repeat_days: int,
+                            weekly_cap_grams: float,
+                            nutrient_targets: Optional[Iterable[NutrientTarget]] = None) -> LinearModel:
+        """Build the days × meals × foods MIP as one sparse constraint matrix"""
+        coefs = self._coefficients(food_idx)
+        D, M, N = days, len(self.meal_types), len(food_idx)
+        num_x = D * M * N
+        
+        # Columns: x[d, m, f] grams of food f at meal m on day d, then y[d, f] = food f used on day d,
+        # then u[d, k] grams of stocked food pantry_pos[k] taken from the pantry on day d
+        x = np.arange(num_x).reshape(D, M, N)
+        y = num_x + np.arange(D * N).reshape(D, N)
+        pantry_pos, stock = self._pantry_columns(food_idx, pantry_items)
+        P = len(pantry_pos)
+        u = num_x + D * N + np.arange(D * P).reshape(D, P)
+        rows = _RowBuilder()
+        
+        # Daily calorie band, protein floor and budget (on what is bought that day)
+        rows.add('calories', x.reshape(D, M * N), np.tile(coefs['Kcal'], M),
+                 calorie_target * (1 - CALORIE_TOLERANCE), calorie_target * (1 + CALORIE_TOLERANCE))
+        rows.add('protein', x.reshape(D, M * N), np.tile(coefs['Protein'], M), protein_target, np.inf)
+        rows.add('budget', np.concatenate([x.reshape(D, M * N), u], axis=1),
+                 np.concatenate([np.tile(coefs['Cost'], M), -coefs['Cost'][pantry_pos]]), -np.inf, budget)
+        
+        # Each meal gets its share of the day's calories
+        self._add_meal_rows(rows, x, coefs, calorie_target)
+        # Daily nutrient bounds
+        self._add_nutrient_rows(rows, x.reshape(D, M * N), coefs, nutrient_targets)
+        
+        # Link grams to the used flag: 20g <= daily grams <= 500g when used, 0 otherwise
+        link_cols = np.concatenate([x.transpose(0, 2, 1), y[:, :, None]], axis=2).reshape(D * N, M + 1)
+        rows.add('max_portion', link_cols, np.append(np.ones(M), -MAX_GRAMS_PER_FOOD), -np.inf, 0)
+        rows.add('min_portion', link_cols, np.append(np.ones(M), -MIN_GRAMS_IF_SELECTED), 0, np.inf)
+        
+        # Variety: enough different foods each day, and no food on too many days
+        rows.add('variety', y, np.ones(N), min(min_foods_per_day, N), np.inf)
+        rows.add('repeats', y.T, np.ones(D), -np.inf, max_repeat_days)
+        
+        # Per-food weekly cap
+        rows.add('weekly_cap', x.transpose(2, 0, 1).reshape(N, D * M), np.ones(D * M), -np.inf, weekly_cap_grams)
+        
+        # Pantry grams only count when eaten, and all days draw on the same stock
+        self._add_pantry_rows(rows, x[:, :, pantry_pos].transpose(0, 2, 1).reshape(D * P, M), u.ravel())
+        if P:
+            rows.add('pantry_stock', u.T, np.ones(D), -np.inf, stock)
+        
+        num_cols = num_x + D * N + D * P
+        meal_costs, meal_upper = self._meal_costs_and_bounds(food_idx, pantry_items)
+        row_lower, row_upper = rows.bounds()
+        
+        return LinearModel(
+            c=np.concatenate([np.tile(meal_costs, D), np.zeros(D * N), np.tile(-coefs['Cost'][pantry_pos], D)]),
+            A=rows.matrix(num_cols),
+            row_lower=row_lower,
+            row_upper=row_upper,
+            col_lower=np.zeros(num_cols),
+            col_upper=np.concatenate([np.tile(meal_upper, D), np.ones(D * N), np.tile(stock, D)]),
+            row_names=rows.names,
+            integrality=np.concatenate([np.zeros(num_x), np.ones(D * N), np.zeros(D * P)]),
+            time_limit=WEEKLY_TIME_LIMIT,
+            mip_gap=WEEKLY_MIP_GAP
+        )
+    
+    def _build_result(self, food_idx: np.ndarray, quantities: np.ndarray,
+                      pantry_items: Optional[Pantry] = None) -> Dict[str, Any]:
+        """Turn solved meals × foods grams (then pantry grams, if stocked) into the plan dict rendered by results.html"""
+        with span('meal_plan'):
+            M, N = len(self.meal_types), len(food_idx)
+            coefs = self._coefficients(food_idx)
+            grams = quantities[:M * N].reshape(M, N).copy()
             
-            # Find similar foods (simplified - based on similar nutritional profile)
-            selected_row = available_foods[available_foods['Food'] == selected_food['name']].iloc[0]
+            # Only include foods with meaningful quantities
+            grams[grams <= 1] = 0
+            daily = grams.sum(axis=0)
+            if not daily.any():
+                return {
+                    'status': 'error',
+                    'message': 'No valid meal plan could be generated. Please try increasing your budget.'
+                }
             
-            for idx, food in available_foods.iterrows():
-                if food['Food'] not in selected_names:
-                    # Calculate cost-effectiveness (protein per rupee)
-                    cost_effectiveness = food['Protein'] / food['Cost'] if food['Cost'] > 0 else 0
-                    
-                    food_alternatives.append({
-                        'name': food['Food'],
-                        'cost_effectiveness': round(cost_effectiveness, 3),
-                        'cost': food['Cost'],
-                        'protein': food['Protein'],
-                        'calories': food['Kcal']
-                    })
+            meal_plan = {
+                meal_type: self._food_entries(food_idx, grams[m])
+                for m, meal_type in enumerate(self.meal_types)
+            }
             
-            # Sort by cost-effectiveness and take top 2
-            food_alternatives.sort(key=lambda x: x['cost_effectiveness'], reverse=True)
-            alternatives[selected_food['name']] = food_alternatives[:2]
+            nutrition_summary = {
+                key: round(float(coefs[column] @ daily), 1)
+                for key, column in NUTRITION_COLUMNS.items()
+            }
         
-        return alternatives
+        result = {
+            'status': 'success',
+            'meal_plan': meal_plan,
+            'nutrition_summary': nutrition_summary,
+            'total_cost': round(float(coefs['Cost'] @ daily), 2)
+        }
+        if pantry_stock(pantry_items):
+            pantry_pos, _ = self._pantry_columns(food_idx, pantry_items)
+            from_pantry = np.zeros(N)
+            from_pantry[pantry_pos] = quantities[M * N:M * N + len(pantry_pos)]
+            result.update(self._pantry_summary(food_idx, daily, from_pantry))
+        return result
+    
+    def _pantry_summary(self, food_idx: np.ndarray, daily: np.ndarray, from_pantry: np.ndarray) -> Dict[str, Any]:
+        """What a day's plan takes from the pantry, and what is left to pay for"""
+        # Eaten amounts of 1g or less were dropped from the plan, so drop their pantry share too
+        from_pantry = np.where(daily > 0, np.minimum(from_pantry, daily), 0)
+        cost = self._coefficients(food_idx)['Cost']
+        return {
+            'pantry_used': self._food_entries(food_idx, from_pantry),
+            'purchase_cost': round(float(cost @ (daily - from_pantry)), 2)
+        }
+    
+    def _food_entries(self, food_idx: np.ndarray, quantities: np.ndarray) -> List[Dict]:
+        """Plan entries (name, grams, cost, kcal, protein) for foods with meaningful quantities"""
+        chosen = np.flatnonzero(quantities > 1)
+        grams = quantities[chosen]
+        values = self.catalog.values[food_idx[chosen]] / 100 * grams[:, None]
+        cost, kcal, protein = (self.catalog.columns.index(c) for c in ('Cost', 'Kcal', 'Protein'))
+        return [
+            {
+                'name': self.catalog.names[food_idx[j]],
+                'quantity': round(float(grams[k]), 1),
+                'cost': round(float(values[k, cost]), 2),
+                'calories': round(float(values[k, kcal]), 1),
+                'protein': round(float(values[k, protein]), 1)
+            }
+            for k, j in enumerate(chosen)
+        ]
+
+
+# Per-process optimizer for optimize_batch workers, set once by the pool initializer
+_batch_optimizer: Optional[MealOptimizer] = None
+
+def _init_batch_worker(catalog: FoodCatalog, solver_name: str):
+    global _batch_optimizer
+    _batch_optimizer = MealOptimizer(catalog, solver=solver_name)
+
+def _solve_batch_problem(params: Dict[str, Any]) -> Dict[str, Any]:
+    return _batch_optimizer.optimize_meal_plan(**params)
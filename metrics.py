@@ -0,0 +1,187 @@
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, List, Tuple, Callable, Optional, Iterator
+
+# Latency buckets in seconds, from sub-millisecond lookups to slow weekly solves
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Stage timings of the current request, collected only while Server-Timing is on
+_request_spans: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = contextvars.ContextVar(
+    'request_spans', default=None
+)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    """Monotonic counter with optional labels"""
+    kind = 'counter'
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name, self.help, self.labels = name, help_text, labels
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1.0):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            items = list(self._values.items())
+        for values, total in items:
+            yield f"{self.name}_total{_format_labels(self.labels, values)} {total:g}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels"""
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name, self.help, self.labels, self.buckets = name, help_text, labels, buckets
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str):
+        with self._lock:
+            # Per-bucket counts (non-cumulative), then sum and count
+            counts = self._values.setdefault(label_values, [0.0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            counts[-2] += value
+            counts[-1] += 1
+
+    def totals(self) -> Dict[Tuple[str, ...], Tuple[float, float]]:
+        """(sum, count) per label set"""
+        with self._lock:
+            return {values: (counts[-2], counts[-1]) for values, counts in self._values.items()}
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            items = [(values, list(counts)) for values, counts in self._values.items()]
+        for values, counts in items:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = 'le="%g"' % bound
+                yield f"{self.name}_bucket{_format_labels(self.labels, values, le)} {cumulative:g}"
+            le = 'le="+Inf"'
+            yield f"{self.name}_bucket{_format_labels(self.labels, values, le)} {counts[-1]:g}"
+            yield f"{self.name}_sum{_format_labels(self.labels, values)} {counts[-2]:.6f}"
+            yield f"{self.name}_count{_format_labels(self.labels, values)} {counts[-1]:g}"
+
+
+class Gauge:
+    """Value read from a callback at scrape time"""
+    kind = 'gauge'
+
+    def __init__(self, name: str, help_text: str, fn: Callable[[], float]):
+        self.name, self.help, self.fn = name, help_text, fn
+
+    def samples(self) -> Iterator[str]:
+        yield f"{self.name} {float(self.fn()):g}"
+
+
+class CallbackCounter(Gauge):
+    """Running total kept elsewhere (e.g. a cache's hit count), read at scrape time"""
+    kind = 'counter'
+
+    def samples(self) -> Iterator[str]:
+        yield f"{self.name}_total {float(self.fn()):g}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            # Re-registering (e.g. on module reload) replaces the old metric
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            name = f"{metric.name}_total" if metric.kind == 'counter' else metric.name
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    'meal_planner_stage_seconds', 'Time spent in each stage of plan generation', ('stage',)
+))
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    'meal_planner_http_request_seconds', 'HTTP request latency by endpoint', ('endpoint', 'method', 'status')
+))
+SOLVER_RESULTS = REGISTRY.register(Counter(
+    'meal_planner_solver_results', 'Solver calls by backend and outcome', ('backend', 'status')
+))
+
+
+def gauge(name: str, help_text: str, fn: Callable[[], float]) -> Gauge:
+    return REGISTRY.register(Gauge(name, help_text, fn))
+
+
+def counter(name: str, help_text: str, fn: Callable[[], float]) -> CallbackCounter:
+    return REGISTRY.register(CallbackCounter(name, help_text, fn))
+
+
+def record_solve(backend: str, status: str):
+    SOLVER_RESULTS.inc(backend, status)
+
+
+@contextmanager
+def span(stage: str):
+    """Time a block into the stage histogram (and the request's Server-Timing, if enabled)"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage)
+        spans = _request_spans.get()
+        if spans is not None:
+            spans.append((stage, elapsed))
+
+
+def start_request_spans() -> contextvars.Token:
+    return _request_spans.set([])
+
+
+def finish_request_spans(token: contextvars.Token) -> List[Tuple[str, float]]:
+    spans = _request_spans.get() or []
+    _request_spans.reset(token)
+    return spans
+
+
+def server_timing(spans: List[Tuple[str, float]], total: float) -> str:
+    """Server-Timing header value; repeated stages are summed"""
+    totals: Dict[str, float] = {}
+    for stage, elapsed in spans:
+        totals[stage] = totals.get(stage, 0.0) + elapsed
+    entries = [f"{stage};dur={elapsed * 1000:.2f}" for stage, elapsed in totals.items()]
+    entries.append(f"total;dur={total * 1000:.2f}")
+    return ', '.join(entries)
@@ -0,0 +1,153 @@
+import json
+import time
+import uuid
+from typing import Dict, Any, Optional, List, Iterator, Tuple
+from flask_sqlalchemy import SQLAlchemy
+from pantry import consume
+
+db = SQLAlchemy()
+
+
+class StoredPlan(db.Model):
+    """A generated plan kept for export until it expires"""
+    __tablename__ = 'stored_plans'
+
+    id = db.Column(db.String(32), primary_key=True)
+    created_at = db.Column(db.Float, nullable=False)
+    expires_at = db.Column(db.Float, nullable=False, index=True)
+    # Compact JSON of the optimizer result and the profile it was made for
+    plan_json = db.Column(db.Text, nullable=False)
+    inputs_json = db.Column(db.Text, nullable=False)
+    # Rendered once on first download, then served from here
+    pdf = db.Column(db.LargeBinary, nullable=True)
+    pdf_etag = db.Column(db.String(64), nullable=True)
+
+    @property
+    def plan(self) -> Dict[str, Any]:
+        return json.loads(self.plan_json)
+
+    @property
+    def user_inputs(self) -> Dict[str, Any]:
+        return json.loads(self.inputs_json)
+
+    @classmethod
+    def save(cls, plan: Dict[str, Any], user_inputs: Dict[str, Any], ttl: float,
+             plan_id: Optional[str] = None) -> 'StoredPlan':
+        """Store (or replace) a plan and purge expired ones"""
+        now = time.time()
+        stored = db.session.merge(cls(
+            id=plan_id or uuid.uuid4().hex,
+            created_at=now,
+            expires_at=now + ttl,
+            plan_json=json.dumps(plan, separators=(',', ':')),
+            inputs_json=json.dumps(user_inputs, separators=(',', ':'))
+        ))
+        cls.query.filter(cls.expires_at < now).delete()
+        db.session.commit()
+        return stored
+
+    @classmethod
+    def get_live(cls, plan_id: Optional[str]) -> Optional['StoredPlan']:
+        """Return a plan that has not expired yet"""
+        if not plan_id:
+            return None
+        stored = db.session.get(cls, plan_id)
+        if stored is None or stored.expires_at < time.time():
+            return None
+        return stored
+
+    @classmethod
+    def missing(cls, plan_ids: List[str], chunk_size: int = 500) -> List[str]:
+        """The ids among plan_ids that are unknown or expired"""
+        now = time.time()
+        live = set()
+        for start in range(0, len(plan_ids), chunk_size):
+            chunk = plan_ids[start:start + chunk_size]
+            live.update(row[0] for row in db.session.query(cls.id).filter(cls.id.in_(chunk), cls.expires_at >= now))
+        return [plan_id for plan_id in plan_ids if plan_id not in live]
+
+    @classmethod
+    def iter_live(cls, plan_ids: List[str], chunk_size: int = 50) -> Iterator['StoredPlan']:
+        """Yield live plans in the given order, loading and releasing them a chunk at a time"""
+        for start in range(0, len(plan_ids), chunk_size):
+            chunk = plan_ids[start:start + chunk_size]
+            rows = {stored.id: stored for stored in cls.query.filter(cls.id.in_(chunk), cls.expires_at >= time.time())}
+            for plan_id in chunk:
+                if plan_id in rows:
+                    yield rows[plan_id]
+            db.session.expunge_all()
+
+
+class Pantry(db.Model):
+    """One user's pantry stock (food name -> grams on hand), keyed by their planner id"""
+    __tablename__ = 'pantries'
+
+    owner_id = db.Column(db.String(32), primary_key=True)
+    updated_at = db.Column(db.Float, nullable=False)
+    items_json = db.Column(db.Text, nullable=False)
+    # Recently accepted plans (or plan days), so accepting one twice deducts it once
+    accepted_json = db.Column(db.Text, nullable=False)
+
+    MAX_ACCEPTED = 100
+
+    @property
+    def items(self) -> Dict[str, float]:
+        return json.loads(self.items_json)
+
+    @classmethod
+    def _locked(cls, owner_id: str) -> 'Pantry':
+        """The owner's row, locked for a read-modify-write (created empty if new)"""
+        pantry = db.session.query(cls).filter_by(owner_id=owner_id).with_for_update().first()
+        if pantry is None:
+            pantry = cls(owner_id=owner_id, updated_at=time.time(), items_json='{}', accepted_json='[]')
+            db.session.add(pantry)
+        return pantry
+
+    def _store(self, items: Dict[str, float]):
+        self.items_json = json.dumps(dict(sorted(items.items())), separators=(',', ':'))
+        self.updated_at = time.time()
+
+    @classmethod
+    def stock(cls, owner_id: str) -> Dict[str, float]:
+        pantry = db.session.get(cls, owner_id)
+        return pantry.items if pantry is not None else {}
+
+    @classmethod
+    def replace(cls, owner_id: str, items: Dict[str, float]) -> Dict[str, float]:
+        """Set the whole stock"""
+        pantry = cls._locked(owner_id)
+        pantry._store(items)
+        db.session.commit()
+        return items
+
+    @classmethod
+    def update(cls, owner_id: str, changes: Dict[str, Optional[float]]) -> Dict[str, float]:
+        """Set the grams of the given foods, removing those set to None"""
+        pantry = cls._locked(owner_id)
+        items = pantry.items
+        for name, grams in changes.items():
+            if grams is None:
+                items.pop(name, None)
+            else:
+                items[name] = grams
+        pantry._store(items)
+        db.session.commit()
+        return items
+
+    @classmethod
+    def accept(cls, owner_id: str, usage: Dict[str, Dict[str, float]]) -> Tuple[Dict[str, float], List[str]]:
+        """Deduct what each not-yet-accepted plan (or plan day) takes from the pantry
+
+        `usage` maps an acceptance key to the grams used per food. Returns
+        the new stock and the keys that were deducted now.
+        """
+        pantry = cls._locked(owner_id)
+        items = pantry.items
+        accepted = json.loads(pantry.accepted_json)
+        deducted = [key for key in usage if key not in accepted]
+        for key in deducted:
+            items = consume(items, usage[key])
+        pantry._store(items)
+        pantry.accepted_json = json.dumps((accepted + deducted)[-cls.MAX_ACCEPTED:])
+        db.session.commit()
+        return items, deducted
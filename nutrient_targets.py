@@ -0,0 +1,115 @@
+"""Daily nutrient targets by age and sex, as min/max bounds on foods.csv columns.
+
+Values are the US National Academies Dietary Reference Intakes: the RDA
+(or AI where no RDA exists) is the floor and the Tolerable Upper Intake
+Level the ceiling for micronutrients, and the Acceptable Macronutrient
+Distribution Ranges bound the share of energy from fat and carbohydrate.
+
+To constrain a new nutrient, add its column (per 100g) to foods.csv and a
+row to DAILY_TARGETS or ENERGY_SHARE_TARGETS.
+"""
+import math
+from dataclasses import dataclass
+from typing import Dict, List, Tuple, Optional, Iterable
+
+INF = math.inf
+
+# Absolute daily intakes: column -> [(max age, male (min, max), female (min, max)), ...]
+DAILY_TARGETS: Dict[str, List[Tuple[int, Tuple[float, float], Tuple[float, float]]]] = {
+    # g/day (AI, 14 g per 1000 kcal)
+    'Fiber': [
+        (3, (19, INF), (19, INF)),
+        (8, (25, INF), (25, INF)),
+        (13, (31, INF), (26, INF)),
+        (18, (38, INF), (26, INF)),
+        (50, (38, INF), (25, INF)),
+        (120, (30, INF), (21, INF)),
+    ],
+    # mg/day (RDA, UL)
+    'Iron': [
+        (3, (7, 40), (7, 40)),
+        (8, (10, 40), (10, 40)),
+        (13, (8, 40), (8, 40)),
+        (18, (11, 45), (15, 45)),
+        (50, (8, 45), (18, 45)),
+        (120, (8, 45), (8, 45)),
+    ],
+}
+
+# Shares of energy: column -> (kcal per gram, [(max age, (min share, max share)), ...])
+ENERGY_SHARE_TARGETS: Dict[str, Tuple[float, List[Tuple[int, Tuple[float, float]]]]] = {
+    'Fat': (9, [(3, (0.30, 0.40)), (18, (0.25, 0.35)), (120, (0.20, 0.35))]),
+    'Carbs': (4, [(120, (0.45, 0.65))]),
+}
+
+
+@dataclass(frozen=True)
+class NutrientTarget:
+    """Daily bounds on one catalog column
+
+    Without ``kcal_per_gram`` the bounds apply to the day's total (in the
+    column's unit, g or mg). With it they bound the share of the plan's
+    calories that come from the nutrient, so the same target holds at any
+    calorie level.
+    """
+    column: str
+    lower: float = 0.0
+    upper: float = INF
+    kcal_per_gram: Optional[float] = None
+
+    @property
+    def key(self) -> str:
+        """Compact form for cache keys"""
+        share = f"@{self.kcal_per_gram:g}" if self.kcal_per_gram else ''
+        return f"{self.column}{share}:{self.lower:g}-{self.upper:g}"
+
+
+def _band(bands: List[Tuple], age: int) -> Tuple:
+    for band in bands:
+        if age <= band[0]:
+            return band
+    return bands[-1]
+
+
+def targets_for(age: int, sex: str, columns: Optional[Iterable[str]] = None) -> Tuple[NutrientTarget, ...]:
+    """RDA-based targets for a person, limited to `columns` (the catalog's) when given
+
+    Sexes other than 'male' get the female values.
+    """
+    male = str(sex).lower() == 'male'
+    available = set(columns) if columns is not None else None
+    targets = []
+    for column, bands in DAILY_TARGETS.items():
+        _, male_bounds, female_bounds = _band(bands, age)
+        lower, upper = male_bounds if male else female_bounds
+        targets.append(NutrientTarget(column, float(lower), float(upper)))
+    for column, (kcal_per_gram, bands) in ENERGY_SHARE_TARGETS.items():
+        lower, upper = _band(bands, age)[1]
+        targets.append(NutrientTarget(column, lower, upper, kcal_per_gram=float(kcal_per_gram)))
+    return tuple(sorted(
+        (target for target in targets if available is None or target.column in available),
+        key=lambda target: target.column
+    ))
+
+
+def target_sets(columns: Optional[Iterable[str]] = None) -> List[Tuple[NutrientTarget, ...]]:
+    """Every distinct targets_for() result over all ages and both sexes
+
+    The tables are piecewise constant in age, so evaluating each band's
+    upper age covers every profile.
+    """
+    ages = sorted({band[0] for bands in DAILY_TARGETS.values() for band in bands}
+                  | {band[0] for _, bands in ENERGY_SHARE_TARGETS.values() for band in bands})
+    columns = list(columns) if columns is not None else None
+    sets = []
+    for age in ages:
+        for sex in ('male', 'female'):
+            targets = targets_for(age, sex, columns)
+            if targets not in sets:
+                sets.append(targets)
+    return sets
+
+
+def targets_key(targets: Optional[Iterable[NutrientTarget]]) -> str:
+    """Cache-key fragment for a set of targets ('' for none)"""
+    return ','.join(target.key for target in targets or ())
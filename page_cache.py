@@ -0,0 +1,46 @@
+"""Pages that are the same for every visitor, rendered once and kept in memory.
+
+Each page is rendered on its first request, precompressed, and served
+with an ETag from then on, so a browser revalidating it gets a bodyless
+304. Keys carry whatever the page depends on besides the deploy (e.g.
+the catalog version for the meal planner's food list), so a reload
+renders a new copy.
+"""
+import hashlib
+import threading
+from dataclasses import dataclass
+from typing import Dict, Tuple, Callable, Hashable
+from static_assets import compress
+
+
+@dataclass
+class CachedPage:
+    etag: str
+    bodies: Dict[str, bytes]
+
+
+class PageCache:
+    def __init__(self):
+        self.hits = 0
+        self.renders = 0
+        self._pages: Dict[Tuple[Hashable, ...], CachedPage] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[Hashable, ...], render: Callable[[], str]) -> CachedPage:
+        """The cached page for `key`, rendering it with `render` on a miss"""
+        page = self._pages.get(key)
+        if page is not None:
+            self.hits += 1
+            return page
+        body = render().encode('utf-8')
+        page = CachedPage(hashlib.sha256(body).hexdigest()[:16], compress(body))
+        with self._lock:
+            # Drop copies rendered for an older version of the same page
+            for stale in [k for k in self._pages if k[0] == key[0]]:
+                del self._pages[stale]
+            self._pages[key] = page
+            self.renders += 1
+        return page
+
+    def __len__(self) -> int:
+        return len(self._pages)
@@ -0,0 +1,80 @@
+"""Pantry stock: what a user already has at home, in grams.
+
+Everywhere the planner takes `pantry_items`, it accepts either a list of
+food names (the meal planner's tick boxes: those foods are priced at a
+discount, in any amount) or a dict of food name -> grams on hand. Stocked
+grams cost nothing, up to the amount on hand, so plans use them before
+buying anything and report what they took (`pantry_used`), which is
+deducted from the stock when the user accepts the plan.
+"""
+import math
+from typing import Dict, List, Any, Union, Tuple, Optional, Iterable
+
+Pantry = Union[List[str], Dict[str, float]]
+
+# Largest amount of one food a pantry may hold (grams)
+MAX_STOCK_GRAMS = 100000
+
+
+def pantry_stock(pantry_items: Optional[Pantry]) -> Dict[str, float]:
+    """Grams on hand per food, or {} for a plain list of names"""
+    return dict(pantry_items) if isinstance(pantry_items, dict) else {}
+
+
+def pantry_names(pantry_items: Optional[Pantry]) -> List[str]:
+    """Names to price at a discount, or [] for a stock with quantities"""
+    return [] if isinstance(pantry_items, dict) else list(pantry_items or [])
+
+
+def copy_pantry(pantry_items: Optional[Pantry]) -> Pantry:
+    """A picklable copy that keeps quantities (list(d) would keep only the names)"""
+    return pantry_stock(pantry_items) if isinstance(pantry_items, dict) else pantry_names(pantry_items)
+
+
+def pantry_key(pantry_items: Optional[Pantry]) -> Tuple:
+    """Hashable, order-independent form of a pantry for cache and dedup keys"""
+    if isinstance(pantry_items, dict):
+        return tuple(sorted((name, round(float(grams), 1)) for name, grams in pantry_items.items()))
+    return tuple(sorted(set(pantry_items or [])))
+
+
+def parse_stock(data: Any, known: Optional[Iterable[str]] = None) -> Tuple[Optional[Dict[str, float]], Optional[str]]:
+    """Validate a {food: grams} mapping from a request, returning (stock, None) or (None, error message)"""
+    if not isinstance(data, dict):
+        return None, 'Pantry quantities must be an object of food name to grams.'
+    stock = {}
+    for name, grams in data.items():
+        try:
+            grams = float(grams)
+        except (TypeError, ValueError):
+            grams = math.nan
+        if not math.isfinite(grams) or grams < 0 or grams > MAX_STOCK_GRAMS:
+            return None, f"Pantry quantity for {name} must be between 0 and {MAX_STOCK_GRAMS} grams."
+        stock[str(name)] = round(grams, 1)
+    if known is not None:
+        known = set(known)
+        unknown = sorted(name for name in stock if name not in known)
+        if unknown:
+            return None, f"Unknown foods in pantry: {', '.join(unknown)}."
+    return stock, None
+
+
+def plan_usage(plan: Dict[str, Any], day: Optional[int] = None) -> Dict[str, float]:
+    """Grams a plan takes from the pantry, per food (one day of a multi-day plan if `day` is given)"""
+    if 'days' in plan:
+        entries = [entry for d in plan['days'] if day is None or d['day'] == day for entry in d.get('pantry_used', [])]
+    else:
+        entries = plan.get('pantry_used', [])
+    used: Dict[str, float] = {}
+    for entry in entries:
+        used[entry['name']] = used.get(entry['name'], 0.0) + entry['quantity']
+    return used
+
+
+def consume(stock: Dict[str, float], used: Dict[str, float]) -> Dict[str, float]:
+    """The stock after eating `used`; foods that run out stay listed at 0 until restocked"""
+    updated = dict(stock)
+    for name, grams in used.items():
+        if name in updated:
+            updated[name] = round(max(0.0, updated[name] - grams), 1)
+    return updated
@@ -0,0 +1,245 @@
+import os
+import copy
+import json
+import math
+import time
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple, Iterable
+from nutrient_targets import NutrientTarget, targets_key
+from pantry import Pantry, pantry_key
+
+try:
+    import redis
+except ImportError:  # the Redis backend is optional
+    redis = None
+
+
+class SQLiteCacheBackend:
+    """Plan cache shared by every worker on the host through a SQLite file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS plan_cache "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        row = self._connect().execute(
+            "SELECT value FROM plan_cache WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: str, value: Dict[str, Any], ttl: float):
+        conn = self._connect()
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO plan_cache (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, json.dumps(value), now + ttl)
+        )
+        conn.execute("DELETE FROM plan_cache WHERE expires_at <= ?", (now,))
+
+
+class RedisCacheBackend:
+    """Plan cache shared through Redis (or any server speaking its protocol)"""
+
+    def __init__(self, url: str):
+        if redis is None:
+            raise RuntimeError("The redis package is required for a redis:// plan cache")
+        self.client = redis.Redis.from_url(url)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        value = self.client.get(f"plan:{key}")
+        return json.loads(value) if value else None
+
+    def set(self, key: str, value: Dict[str, Any], ttl: float):
+        self.client.set(f"plan:{key}", json.dumps(value), ex=max(1, int(ttl)))
+
+
+def shared_backend_from_url(url: Optional[str]):
+    """Build a shared backend from 'sqlite:///path', 'redis://...' or a bare file path"""
+    if not url:
+        return None
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisCacheBackend(url)
+    if url.startswith('sqlite:///'):
+        url = url[len('sqlite:///'):]
+    return SQLiteCacheBackend(url)
+
+
+class PlanCache:
+    """LRU/TTL cache in front of MealOptimizer.optimize_meal_plan
+
+    Inputs are snapped to buckets before solving so that nearby profiles
+    share one entry: calories to the nearest bucket, protein rounded up and
+    budget rounded down, so a cached plan never falls short of the user's
+    protein target or goes over their budget.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 3600,
+                 calorie_bucket: int = 25, protein_bucket: int = 1,
+                 budget_bucket: int = 5, shared=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.calorie_bucket = calorie_bucket
+        self.protein_bucket = protein_bucket
+        self.budget_bucket = budget_bucket
+        self.shared = shared
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> 'PlanCache':
+        """Configure from PLAN_CACHE_* environment variables"""
+        shared = None
+        try:
+            shared = shared_backend_from_url(os.environ.get('PLAN_CACHE_URL'))
+        except Exception as e:
+            logging.error(f"Error connecting shared plan cache: {e}")
+        return cls(
+            max_size=int(os.environ.get('PLAN_CACHE_SIZE', 1024)),
+            ttl=float(os.environ.get('PLAN_CACHE_TTL', 3600)),
+            calorie_bucket=int(os.environ.get('PLAN_CACHE_KCAL_BUCKET', 25)),
+            protein_bucket=int(os.environ.get('PLAN_CACHE_PROTEIN_BUCKET', 1)),
+            budget_bucket=int(os.environ.get('PLAN_CACHE_BUDGET_BUCKET', 5)),
+            shared=shared
+        )
+
+    def quantize(self, calorie_target: float, protein_target: float,
+                 budget: float) -> Tuple[int, int, float]:
+        """Snap optimizer inputs onto the cache grid"""
+        calories = int(round(calorie_target / self.calorie_bucket) * self.calorie_bucket)
+        protein = int(math.ceil(protein_target / self.protein_bucket) * self.protein_bucket)
+        quantized_budget = math.floor(budget / self.budget_bucket) * self.budget_bucket
+        return calories, protein, float(quantized_budget if quantized_budget > 0 else budget)
+
+    @staticmethod
+    def make_key(calorie_target: int, protein_target: int, budget: float,
+                 dietary_preference: str, pantry_items: Pantry, catalog_version: str,
+                 nutrient_targets: Optional[Iterable[NutrientTarget]] = None, variant: str = '') -> str:
+        # Names only, or name=grams for a stock with quantities
+        pantry = ','.join(item if isinstance(item, str) else f"{item[0]}={item[1]:g}" for item in pantry_key(pantry_items))
+        key = f"{catalog_version}|{calorie_target}|{protein_target}|{budget:g}|{dietary_preference}|{pantry}"
+        targets = targets_key(nutrient_targets)
+        if targets:
+            key = f"{key}|{targets}"
+        return f"{variant}:{key}" if variant else key
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.time():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return copy.deepcopy(value)
+                del self._entries[key]
+
+        if self.shared is not None:
+            try:
+                value = self.shared.get(key)
+            except Exception as e:
+                logging.warning(f"Shared plan cache read failed: {e}")
+                value = None
+            if value is not None:
+                self._store(key, value)
+                with self._lock:
+                    self.hits += 1
+                    self.shared_hits += 1
+                return copy.deepcopy(value)
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key: str, value: Dict[str, Any]):
+        self._store(key, value)
+        if self.shared is not None:
+            try:
+                self.shared.set(key, value, self.ttl)
+            except Exception as e:
+                logging.warning(f"Shared plan cache write failed: {e}")
+
+    def _store(self, key: str, value: Dict[str, Any]):
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, copy.deepcopy(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+    def optimize(self, optimizer, calorie_target: float, protein_target: float,
+                 budget: float, dietary_preference: str,
+                 pantry_items: Pantry,
+                 nutrient_targets: Optional[Iterable[NutrientTarget]] = None,
+                 variant: str = '') -> Dict[str, Any]:
+        """Return a cached plan for the quantized inputs, solving on a miss
+
+        Nutrient targets are part of the key as given; energy-share targets
+        don't depend on calories, so they don't fragment the cache.
+        `variant` separates plans of other kinds (e.g. 'servings') solved for
+        the same inputs.
+        """
+        calories, protein, quantized_budget = self.quantize(calorie_target, protein_target, budget)
+        key = self.make_key(calories, protein, quantized_budget, dietary_preference,
+                            pantry_items, optimizer.catalog.digest, nutrient_targets, variant)
+
+        result = self.get(key)
+        if result is not None:
+            return result
+
+        result = optimizer.optimize_meal_plan(
+            calorie_target=calories,
+            protein_target=protein,
+            budget=quantized_budget,
+            dietary_preference=dietary_preference,
+            pantry_items=pantry_items,
+            nutrient_targets=nutrient_targets
+        )
+        if result['status'] == 'success':
+            self.set(key, result)
+            return result
+
+        # Rounding the budget down can make a borderline profile infeasible
+        if quantized_budget != budget or protein != protein_target:
+            return optimizer.optimize_meal_plan(
+                calorie_target=calorie_target,
+                protein_target=protein_target,
+                budget=budget,
+                dietary_preference=dietary_preference,
+                pantry_items=pantry_items,
+                nutrient_targets=nutrient_targets
+            )
+        return result
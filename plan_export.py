@@ -0,0 +1,190 @@
+import io
+import re
+import csv
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, Iterator, Iterable, List, Tuple, Callable
+from reportlab.lib.pagesizes import letter
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib import colors
+
+PLAN_COLUMNS = ['Meal', 'Food', 'Quantity (g)', 'Cost (₹)']
+
+
+def plan_rows(plan: Dict[str, Any]) -> Iterator[List[Any]]:
+    """Yield one row per food, prefixed with the day number for multi-day plans"""
+    if 'days' in plan:
+        for day in plan['days']:
+            for meal_type, foods in day['meal_plan'].items():
+                for food in foods:
+                    yield [day['day'], meal_type, food['name'], food['quantity'], food['cost']]
+    else:
+        for meal_type, foods in plan['meal_plan'].items():
+            for food in foods:
+                yield [meal_type, food['name'], food['quantity'], food['cost']]
+
+
+def plan_header(plan: Dict[str, Any]) -> List[str]:
+    return (['Day'] if 'days' in plan else []) + PLAN_COLUMNS
+
+
+def csv_lines(plan: Dict[str, Any]) -> Iterator[str]:
+    """Yield the CSV export a line at a time"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in [['Meal Plan Export'], plan_header(plan)]:
+        writer.writerow(row)
+    for row in plan_rows(plan):
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+    writer.writerow([])
+    writer.writerow(['Total Cost', plan['total_cost']])
+    yield buffer.getvalue()
+
+
+def _plan_elements(plan: Dict[str, Any], user_inputs: Dict[str, Any], styles) -> List:
+    """Title, profile line and meal table flowables for one plan"""
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        spaceAfter=30,
+        textColor=colors.HexColor('#d2691e')
+    )
+
+    elements = [Paragraph("Smart Indian Meal Planner", title_style)]
+    if user_inputs:
+        patient = f"{user_inputs['patient_id']} • " if user_inputs.get('patient_id') else ''
+        elements.append(Paragraph(
+            f"{patient}{str(user_inputs.get('sex', '')).title()}, {user_inputs.get('age')} years • "
+            f"{user_inputs.get('calorie_needs')} kcal • {user_inputs.get('protein_needs')}g protein • "
+            f"budget ₹{user_inputs.get('budget')}",
+            styles['Normal']
+        ))
+    elements.append(Spacer(1, 12))
+
+    data = [plan_header(plan)] + list(plan_rows(plan))
+    data.append([''] * (len(data[0]) - 2) + ['Total', plan['total_cost']])
+
+    table = Table(data, repeatRows=1)
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#d2691e')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 14),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+    ]))
+    elements.append(table)
+    return elements
+
+
+def build_plan_pdf(plan: Dict[str, Any], user_inputs: Dict[str, Any]) -> bytes:
+    """Render a plan as a one-table PDF document"""
+    buffer = io.BytesIO()
+    SimpleDocTemplate(buffer, pagesize=letter).build(_plan_elements(plan, user_inputs, getSampleStyleSheet()))
+    return buffer.getvalue()
+
+
+def build_combined_pdf(plans: List[Tuple[Dict[str, Any], Dict[str, Any]]]) -> bytes:
+    """Render (plan, user_inputs) pairs into one PDF, each plan starting on a new page
+
+    Pool task for one batch of a combined export; larger exports stream
+    the batches as separate documents in a ZIP.
+    """
+    styles = getSampleStyleSheet()
+    elements = []
+    for i, (plan, user_inputs) in enumerate(plans):
+        if i:
+            elements.append(PageBreak())
+        elements.extend(_plan_elements(plan, user_inputs, styles))
+    buffer = io.BytesIO()
+    SimpleDocTemplate(buffer, pagesize=letter).build(elements)
+    return buffer.getvalue()
+
+
+def render_plan_files(plan: Dict[str, Any], user_inputs: Dict[str, Any],
+                      formats: Tuple[str, ...]) -> List[Tuple[str, bytes]]:
+    """Pool task: the (extension, content) export files for one plan"""
+    files = []
+    for fmt in formats:
+        if fmt == 'pdf':
+            files.append(('pdf', build_plan_pdf(plan, user_inputs)))
+        elif fmt == 'csv':
+            files.append(('csv', ''.join(csv_lines(plan)).encode('utf-8')))
+    return files
+
+
+def export_name(position: int, label: str, extension: str) -> str:
+    """Archive member name, e.g. 0007_patient-17.pdf"""
+    return f"{position:04d}_{re.sub(r'[^A-Za-z0-9_.-]+', '_', label).strip('_') or 'plan'}.{extension}"
+
+
+def bounded_map(fn: Callable, tasks: Iterable[Tuple[Any, tuple]],
+                max_workers: int, window: int) -> Iterator[Tuple[Any, Any]]:
+    """Yield (tag, fn(*args)) in task order, with at most `window` tasks in flight
+
+    Tasks are pulled from the iterable only as results are consumed, so
+    neither inputs nor rendered outputs pile up when the client reads
+    slowly. With max_workers < 1 the tasks run inline.
+    """
+    if max_workers < 1:
+        for tag, args in tasks:
+            yield tag, fn(*args)
+        return
+
+    pool = ProcessPoolExecutor(max_workers=max_workers)
+    pending = deque()
+    try:
+        for tag, args in tasks:
+            pending.append((tag, pool.submit(fn, *args)))
+            if len(pending) >= window:
+                tag, future = pending.popleft()
+                yield tag, future.result()
+        while pending:
+            tag, future = pending.popleft()
+            yield tag, future.result()
+    finally:
+        # Also reached when the client disconnects mid-download
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only, unseekable file that hands back whatever was written since the last drain"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_zip(entries: Iterable[Tuple[str, bytes]]) -> Iterator[bytes]:
+    """Stream a ZIP archive built from (name, content) pairs, one member at a time
+
+    The sink is unseekable, so zipfile writes data descriptors after each
+    member instead of seeking back; only the member being written and the
+    central directory are held in memory.
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, mode='w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in entries:
+            archive.writestr(name, content)
+            yield sink.drain()
+    yield sink.drain()
@@ -0,0 +1,205 @@
+import os
+import json
+import time
+import uuid
+import socket
+import logging
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Callable, Optional
+
+HOST = socket.gethostname()
+
+
+class QueueFull(Exception):
+    """Raised when the job queue is at its depth limit"""
+
+
+class MemoryJobStore:
+    """Job records kept in this process only"""
+
+    def __init__(self):
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def put(self, job: Dict[str, Any]):
+        with self._lock:
+            self._jobs[job['id']] = dict(job)
+
+    def admit(self, job: Dict[str, Any], max_depth: int) -> bool:
+        """Store a new job unless `max_depth` jobs are already unfinished"""
+        with self._lock:
+            if sum(1 for j in self._jobs.values() if j['finished_at'] is None) >= max_depth:
+                return False
+            self._jobs[job['id']] = dict(job)
+            return True
+
+    def pending(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [dict(job) for job in self._jobs.values() if job['finished_at'] is None]
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def purge(self, before: float):
+        with self._lock:
+            for job_id in [k for k, job in self._jobs.items() if job['finished_at'] and job['finished_at'] < before]:
+                del self._jobs[job_id]
+
+
+class SQLiteJobStore:
+    """Job records in a SQLite file, so any gunicorn worker can answer a poll"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._connect().execute(
+            "CREATE TABLE IF NOT EXISTS plan_jobs "
+            "(id TEXT PRIMARY KEY, data TEXT NOT NULL, finished_at REAL)"
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def put(self, job: Dict[str, Any]):
+        self._connect().execute(
+            "INSERT OR REPLACE INTO plan_jobs (id, data, finished_at) VALUES (?, ?, ?)",
+            (job['id'], json.dumps(job), job['finished_at'])
+        )
+
+    def admit(self, job: Dict[str, Any], max_depth: int) -> bool:
+        """Store a new job unless `max_depth` jobs are already unfinished, counted across every worker"""
+        conn = self._connect()
+        # Take the write lock before counting, so two workers can't both take the last slot
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            (pending,) = conn.execute("SELECT COUNT(*) FROM plan_jobs WHERE finished_at IS NULL").fetchone()
+            if pending >= max_depth:
+                conn.execute("ROLLBACK")
+                return False
+            self.put(job)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return True
+
+    def pending(self) -> List[Dict[str, Any]]:
+        rows = self._connect().execute("SELECT data FROM plan_jobs WHERE finished_at IS NULL").fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connect().execute("SELECT data FROM plan_jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def purge(self, before: float):
+        self._connect().execute("DELETE FROM plan_jobs WHERE finished_at < ?", (before,))
+
+
+def _owner_alive(owner: Optional[Dict[str, Any]]) -> bool:
+    """False only for an owner process on this host that no longer exists"""
+    if not owner or owner.get('host') != HOST:
+        return True
+    try:
+        os.kill(owner['pid'], 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class PlanJobQueue:
+    """Bounded background pool for plan generation
+
+    submit() returns a job id immediately and raises QueueFull once
+    `max_depth` jobs are queued or running, so callers can answer 429
+    instead of piling requests onto the workers. With a shared store the
+    limit is shared too: it counts every worker's unfinished jobs. Each job
+    records the process running it, and unfinished jobs whose process has
+    died (e.g. a killed gunicorn worker) are marked failed when they are
+    polled or when they would hold up a new job. Finished jobs are kept
+    for `result_ttl` seconds for polling.
+    """
+
+    def __init__(self, workers: int = 2, max_depth: int = 16,
+                 result_ttl: float = 600, store=None):
+        self.workers = workers
+        self.max_depth = max_depth
+        self.result_ttl = result_ttl
+        self.store = store or MemoryJobStore()
+        self.rejected = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='plan-job')
+
+    @property
+    def depth(self) -> int:
+        """Jobs queued or running, in every worker sharing the store"""
+        return len(self.store.pending())
+
+    def submit(self, fn: Callable[..., Any], *args, meta: Optional[Dict[str, Any]] = None, **kwargs) -> str:
+        self.reap()
+        job = {
+            'id': uuid.uuid4().hex,
+            'status': 'queued',
+            'created_at': time.time(),
+            'finished_at': None,
+            'owner': {'host': HOST, 'pid': os.getpid()},
+            'meta': meta or {},
+            'result': None,
+            'error': None
+        }
+        if not self.store.admit(job, self.max_depth):
+            with self._lock:
+                self.rejected += 1
+            raise QueueFull(f"{self.max_depth} plan jobs pending")
+        try:
+            self._executor.submit(self._run, job, fn, args, kwargs)
+        except Exception:
+            self._fail(job, 'An error occurred while generating your meal plan. Please try again.')
+            raise
+        self.store.purge(time.time() - self.result_ttl)
+        return job['id']
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self.store.get(job_id)
+        if job is not None and job['finished_at'] is None and not _owner_alive(job.get('owner')):
+            job = self._fail_orphan(job)
+        return job
+
+    def reap(self):
+        """Mark unfinished jobs whose owner process has died as failed"""
+        for job in self.store.pending():
+            if not _owner_alive(job.get('owner')):
+                self._fail_orphan(job)
+
+    def _fail_orphan(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        logging.warning(f"Plan job {job['id']} lost its worker (pid {job['owner']['pid']}); marking it failed")
+        return self._fail(job, 'The server restarted while generating your meal plan. Please try again.')
+
+    def _fail(self, job: Dict[str, Any], error: str) -> Dict[str, Any]:
+        job = dict(job, status='failed', error=error, finished_at=time.time())
+        self.store.put(job)
+        return job
+
+    def _run(self, job: Dict[str, Any], fn: Callable[..., Any], args, kwargs):
+        job = dict(job, status='running')
+        self.store.put(job)
+        try:
+            job['result'] = fn(*args, **kwargs)
+            job['status'] = 'done'
+        except Exception as e:
+            logging.error(f"Error in plan job {job['id']}: {e}")
+            job['status'] = 'failed'
+            job['error'] = 'An error occurred while generating your meal plan. Please try again.'
+        finally:
+            job['finished_at'] = time.time()
+            self.store.put(job)
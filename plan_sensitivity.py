@@ -0,0 +1,180 @@
+import time
+import logging
+import numpy as np
+from typing import Dict, Any, Optional, Iterable
+from meal_optimizer import MealOptimizer, LinearModel
+from plan_session import IncrementalHighs, highspy
+from nutrient_targets import NutrientTarget
+from pantry import Pantry
+
+# Row each sweepable parameter moves, and which side of it
+SWEEP_PARAMETERS = {
+    'budget': ('budget', 'upper'),
+    'protein': ('protein', 'lower'),
+    'fiber': ('nutrient_fiber', 'lower'),
+    'iron': ('nutrient_iron', 'lower'),
+}
+MAX_SWEEP_STEPS = 50
+# Unused foods reported with their reduced costs, closest to entering first
+REDUCED_COSTS_REPORTED = 10
+
+
+class WhatIfAnalyzer:
+    """Sensitivity analysis of the daily LP from one built model
+
+    The model is loaded into HiGHS once. Shadow prices and reduced costs
+    come from the duals of that solve; sweep points and the minimum
+    budget are warm re-solves that only change one row bound or the
+    objective, so each costs a few simplex iterations instead of a full
+    solve.
+    """
+
+    def __init__(self, optimizer: MealOptimizer):
+        self.optimizer = optimizer
+        self.catalog = optimizer.catalog
+
+    def analyze(self, calorie_target: int, protein_target: int, budget: float,
+                dietary_preference: str, pantry_items: Pantry,
+                sweep: Optional[Dict[str, Any]] = None,
+                nutrient_targets: Optional[Iterable[NutrientTarget]] = None) -> Dict[str, Any]:
+        """
+        Solve once and report shadow prices, reduced costs, an optional
+        parametric sweep ({'parameter', 'start', 'stop', 'steps'}) and the
+        minimum budget that makes the other constraints feasible.
+        """
+        if highspy is None:
+            return {
+                'status': 'error',
+                'message': 'What-if analysis needs the highspy package.'
+            }
+        try:
+            food_idx = self.catalog.indices_for(dietary_preference)
+            if len(food_idx) == 0:
+                return {
+                    'status': 'error',
+                    'message': 'No foods available for your dietary preference.'
+                }
+
+            model = self.optimizer._build_model(
+                food_idx, calorie_target, protein_target, budget, pantry_items, nutrient_targets
+            )
+            # Real cost of what has to be bought: pantry columns (after the meal columns) are credited
+            cost = self.optimizer._coefficients(food_idx)['Cost']
+            pantry_pos, _ = self.optimizer._pantry_columns(food_idx, pantry_items)
+            true_costs = np.concatenate([np.tile(cost, len(self.optimizer.meal_types)), -cost[pantry_pos]])
+            start = time.perf_counter()
+            engine = IncrementalHighs(model)
+            solved = engine.solve(model)
+
+            if solved.status == 'optimal':
+                result = self._sensitivity(engine, model, food_idx, solved.x, true_costs)
+            else:
+                result = {
+                    'status': 'infeasible',
+                    'message': 'No feasible meal plan found with current constraints.'
+                }
+
+            if sweep:
+                result['sweep'] = self._sweep(engine, model, true_costs, **sweep)
+            result['min_budget'] = self._min_budget(engine, model, true_costs)
+            if result['status'] == 'infeasible' and result['min_budget'] is not None:
+                result['message'] += f" The cheapest plan that meets your targets costs ₹{result['min_budget']}."
+
+            result['solver'] = {
+                'backend': engine.name,
+                'solves': engine.solves,
+                'solve_time_ms': round((time.perf_counter() - start) * 1000, 2)
+            }
+            return result
+
+        except ValueError as e:
+            return {'status': 'error', 'message': str(e)}
+        except Exception as e:
+            logging.error(f"Error in what-if analysis: {e}")
+            return {
+                'status': 'error',
+                'message': 'An error occurred during optimization. Please try again with different parameters.'
+            }
+
+    def _sensitivity(self, engine: IncrementalHighs, model: LinearModel, food_idx: np.ndarray,
+                     x: np.ndarray, true_costs: np.ndarray) -> Dict[str, Any]:
+        """Shadow prices of the nutrient/budget rows and reduced costs of unused foods"""
+        row_dual, col_dual = engine.duals()
+        meal_types = self.optimizer.meal_types
+        M, N = len(meal_types), len(food_idx)
+
+        # HiGHS reports d(objective)/d(bound): ₹ per extra g protein, per extra kcal, ...
+        shadow_prices = {name: round(float(row_dual[model.row(name)]), 4) for name in ('calories', 'protein', 'budget')}
+        shadow_prices['meal_calories'] = {
+            meal: round(float(row_dual[model.row(f'meal_calories[{m}]')]), 4)
+            for m, meal in enumerate(meal_types)
+        }
+        # ₹ per extra mg/g of a nutrient floor, or per extra unit of an energy-share row
+        shadow_prices['nutrients'] = {
+            name: round(float(dual), 4) for name, dual in zip(model.row_names, row_dual)
+            if name.startswith('nutrient_')
+        }
+        binding = [name for name, dual in zip(model.row_names, row_dual) if abs(dual) > 1e-9]
+
+        # Cheapest way into the plan for each unused food: its lowest reduced cost over the meals it may be served at
+        reduced = np.where(model.col_upper > 0, col_dual, np.inf)[:M * N].reshape(M, N).min(axis=0)
+        unused = np.flatnonzero((x[:M * N].reshape(M, N).sum(axis=0) <= 1) & np.isfinite(reduced))
+        unused = unused[np.argsort(reduced[unused])][:REDUCED_COSTS_REPORTED]
+        reduced_costs = [
+            {
+                'name': self.catalog.names[food_idx[f]],
+                'cost': float(self.catalog.column('Cost')[food_idx[f]]),
+                # Price drop per 100g at which the food would start to appear in the plan
+                'reduced_cost': round(float(reduced[f] * 100), 2)
+            }
+            for f in unused
+        ]
+
+        return {
+            'status': 'success',
+            'total_cost': round(max(0.0, float(true_costs @ x)), 2),
+            'objective': round(float(model.c @ x), 4),
+            'shadow_prices': shadow_prices,
+            'binding_constraints': binding,
+            'reduced_costs': reduced_costs
+        }
+
+    def _sweep(self, engine: IncrementalHighs, model: LinearModel, true_costs: np.ndarray,
+               parameter: str, start: float, stop: float, steps: int = 10) -> Dict[str, Any]:
+        """Re-solve with one row bound moved from start to stop, then restore it"""
+        if parameter not in SWEEP_PARAMETERS:
+            raise ValueError(f"Sweep parameter must be one of {sorted(SWEEP_PARAMETERS)}.")
+        steps = int(steps)
+        if not 2 <= steps <= MAX_SWEEP_STEPS:
+            raise ValueError(f"Sweep steps must be between 2 and {MAX_SWEEP_STEPS}.")
+
+        row_name, side = SWEEP_PARAMETERS[parameter]
+        if row_name not in model.row_names:
+            raise ValueError(f"{parameter} has no target for this profile.")
+        row = model.row(row_name)
+        lower, upper = model.row_lower[row], model.row_upper[row]
+        points = []
+        for value in np.linspace(float(start), float(stop), steps):
+            engine.set_row_bounds(row, value if side == 'lower' else lower, value if side == 'upper' else upper)
+            solved = engine.solve(model)
+            point = {'value': round(float(value), 2), 'status': solved.status}
+            if solved.status == 'optimal':
+                point['total_cost'] = round(max(0.0, float(true_costs @ solved.x)), 2)
+                point['shadow_price'] = round(float(engine.duals()[0][row]), 4)
+            points.append(point)
+        engine.set_row_bounds(row, lower, upper)
+        return {'parameter': parameter, 'points': points}
+
+    def _min_budget(self, engine: IncrementalHighs, model: LinearModel,
+                    true_costs: np.ndarray) -> Optional[float]:
+        """Real cost of the cheapest plan meeting every constraint except the budget"""
+        row = model.row('budget')
+        engine.set_row_bounds(row, -np.inf, np.inf)
+        engine.set_costs(true_costs)
+        solved = engine.solve(model)
+        engine.set_costs(model.c)
+        engine.set_row_bounds(row, model.row_lower[row], model.row_upper[row])
+        if solved.status != 'optimal':
+            return None
+        # Rounded up so the reported budget is itself feasible (a free pantry plan can cost 0)
+        return max(0.0, float(np.ceil(true_costs @ solved.x * 100) / 100))
@@ -0,0 +1,241 @@
+"""Meal plans in whole servings (1 roti, 1 katori dal, 1 egg) instead of continuous grams."""
+import time
+import logging
+import numpy as np
+from dataclasses import replace
+from typing import Dict, Any, Optional, Iterable
+from meal_optimizer import (MealOptimizer, LinearModel, SolveResult, CONTINUOUS, INTEGER, SEMICONTINUOUS,
+                            MIN_GRAMS_IF_SELECTED, _scipy_sparse)
+from plan_session import IncrementalHighs, highspy
+from nutrient_targets import NutrientTarget
+from pantry import Pantry
+from metrics import span, record_solve
+
+# Interactive latency budget: the rounded LP plan is accepted when within
+# ROUNDING_GAP of the LP bound (which whole servings rarely reach: the best
+# integer plan is typically 1-5% above it). Otherwise the MIP starts from
+# the rounded plan and stops at SERVING_MIP_GAP or after SERVING_TIME_LIMIT
+# seconds, whichever comes first.
+ROUNDING_GAP = 0.05
+SERVING_MIP_GAP = 0.01
+SERVING_TIME_LIMIT = 0.5
+# Greedy repair of the rounded plan: at most this many one-serving moves,
+# each chosen among the cheapest REPAIR_CANDIDATES columns of the worst row
+MAX_REPAIR_MOVES = 100
+REPAIR_CANDIDATES = 50
+
+
+class ServingPlanner:
+    """Daily plans where each food is eaten in whole servings
+
+    Foods with a ServingGrams column get integer serving-count columns;
+    foods measured in grams become semicontinuous (0, or at least
+    MIN_GRAMS_IF_SELECTED at a meal). The LP relaxation is rounded and
+    repaired into a feasible plan, which is returned as-is when close to
+    the LP bound and otherwise warm-starts a time-limited MIP. Exposes the
+    optimize_meal_plan() signature, so it can stand in for an optimizer
+    (e.g. in PlanCache).
+    """
+
+    def __init__(self, optimizer: MealOptimizer, time_limit: float = SERVING_TIME_LIMIT,
+                 mip_gap: float = SERVING_MIP_GAP, rounding_gap: float = ROUNDING_GAP):
+        self.optimizer = optimizer
+        self.catalog = optimizer.catalog
+        self.time_limit = time_limit
+        self.mip_gap = mip_gap
+        self.rounding_gap = rounding_gap
+
+    def optimize_meal_plan(self, calorie_target: int, protein_target: int,
+                           budget: float, dietary_preference: str,
+                           pantry_items: Pantry,
+                           nutrient_targets: Optional[Iterable[NutrientTarget]] = None) -> Dict[str, Any]:
+        """Optimize a meal plan in servings"""
+        try:
+            food_idx = self.catalog.indices_for(dietary_preference)
+            if len(food_idx) == 0:
+                return {
+                    'status': 'error',
+                    'message': 'No foods available for your dietary preference.'
+                }
+
+            with span('build'):
+                grams_model = self.optimizer._build_model(
+                    food_idx, calorie_target, protein_target, budget, pantry_items, nutrient_targets
+                )
+                scale = np.tile(self.catalog.serving_grams()[food_idx], len(self.optimizer.meal_types))
+                model = self._servings_model(grams_model, scale)
+            with span('solve'):
+                solved = self._solve(model)
+
+            if solved.status not in ('optimal', 'feasible'):
+                return {
+                    'status': 'error',
+                    'message': 'No feasible meal plan in whole servings found with current constraints. Try increasing your budget or planning in grams.'
+                }
+
+            units = np.where(scale > 0, scale, 1.0)
+            # Pantry columns (after the meal columns) stay in grams
+            units = np.concatenate([units, np.ones(model.num_cols - len(units))])
+            result = self.optimizer._build_result(food_idx, solved.x * units, pantry_items)
+            if result['status'] == 'success':
+                self._add_servings(result)
+            result['solver'] = {
+                'backend': solved.backend,
+                'solve_time_ms': round(solved.solve_time * 1000, 2),
+                'gap': solved.gap
+            }
+            return result
+
+        except Exception as e:
+            logging.error(f"Error in serving-size optimization: {e}")
+            return {
+                'status': 'error',
+                'message': 'An error occurred during optimization. Please try again with different parameters.'
+            }
+
+    def _servings_model(self, model: LinearModel, scale: np.ndarray) -> LinearModel:
+        """Re-express gram columns as servings where a serving size is known
+
+        x_grams = scale * servings, so columns are scaled by the serving size;
+        gram columns that may be served get a semicontinuous lower bound.
+        `scale` covers the meal columns; pantry columns after them stay
+        continuous grams.
+        """
+        pantry = model.num_cols - len(scale)
+        scale = np.concatenate([scale, np.zeros(pantry)])
+        counted = scale > 0
+        factor = np.where(counted, scale, 1.0)
+        A = model.A @ _scipy_sparse.diags(factor) if hasattr(model.A, 'tocsr') else np.asarray(model.A) * factor
+        servable = (model.col_upper > 0) & (np.arange(model.num_cols) < model.num_cols - pantry)
+        integrality = np.where(counted, INTEGER, np.where(servable, SEMICONTINUOUS, CONTINUOUS))
+        return replace(
+            model,
+            c=model.c * factor,
+            A=_scipy_sparse.csr_matrix(A) if hasattr(A, 'tocsr') else A,
+            col_lower=np.where(integrality == SEMICONTINUOUS, float(MIN_GRAMS_IF_SELECTED), 0.0),
+            col_upper=np.where(counted, np.floor(model.col_upper / factor), model.col_upper),
+            integrality=integrality.astype(float),
+            time_limit=self.time_limit,
+            mip_gap=self.mip_gap
+        )
+
+    def _solve(self, model: LinearModel) -> SolveResult:
+        """Round-and-repair the LP relaxation, then run the MIP only if the rounding is too far off"""
+        start = time.perf_counter()
+        relaxed = self.optimizer.solve_model(replace(
+            model, integrality=None, col_lower=np.zeros(model.num_cols)
+        ))
+        if relaxed.status != 'optimal':
+            return relaxed
+        bound = relaxed.objective
+
+        heuristic = None
+        rounded = self._round(model, relaxed.x)
+        if rounded is not None:
+            heuristic = SolveResult('feasible', rounded, float(model.c @ rounded), 'highs-rounding',
+                                    0.0, MealOptimizer._gap(float(model.c @ rounded), bound))
+            if heuristic.gap <= self.rounding_gap:
+                heuristic.solve_time = time.perf_counter() - start
+                record_solve(heuristic.backend, heuristic.status)
+                return heuristic
+
+        # Spend what is left of the time limit on the MIP, starting from the rounded plan
+        remaining = max(0.05, self.time_limit - (time.perf_counter() - start))
+        timed = replace(model, time_limit=remaining)
+        if highspy is not None:
+            # A one-off cold MIP solve, not a warm start
+            engine = IncrementalHighs(timed, name='highs-mip')
+            if rounded is not None:
+                engine.set_solution(rounded)
+            exact = engine.solve(timed)
+            record_solve(exact.backend, exact.status)
+        else:
+            exact = self.optimizer.solve_model(timed)
+        if exact.status in ('optimal', 'feasible'):
+            exact.gap = MealOptimizer._gap(exact.objective, bound)
+
+        candidates = [s for s in (heuristic, exact) if s is not None and s.status in ('optimal', 'feasible')]
+        best = min(candidates, key=lambda s: s.objective) if candidates else exact
+        best.solve_time = time.perf_counter() - start
+        return best
+
+    @staticmethod
+    def _round(model: LinearModel, x: np.ndarray) -> Optional[np.ndarray]:
+        """Round LP servings to whole numbers, then repair row violations one serving at a time
+
+        Returns None if the greedy repair gets stuck before the plan is feasible.
+        """
+        x = x.copy()
+        kind = model.integrality
+        counted = kind == INTEGER
+        semi = kind == SEMICONTINUOUS
+        x[counted] = np.round(x[counted])
+        # Semicontinuous grams: drop amounts below half the minimum, lift the rest to it
+        x[semi] = np.where(x[semi] < model.col_lower[semi] / 2, 0.0, np.maximum(x[semi], model.col_lower[semi]))
+        x = np.clip(x, 0, model.col_upper)
+
+        A = model.A.tocsc() if hasattr(model.A, 'tocsc') else np.asarray(model.A)
+        # Violations are relative to each row's bounds so kcal and grams weigh alike
+        finite = lambda bound: np.where(np.isfinite(bound), np.abs(bound), 0.0)
+        scale = np.maximum(1.0, np.maximum(finite(model.row_lower), finite(model.row_upper)))
+        lower, upper = model.row_lower[:, None], model.row_upper[:, None]
+
+        def violations(activity):
+            """Total scaled violation for each column of `activity` (rows × plans)"""
+            return ((np.maximum(lower - activity, 0) + np.maximum(activity - upper, 0)) / scale[:, None]).sum(axis=0)
+
+        activity = A @ x
+        movable = np.flatnonzero(counted)
+        for _ in range(MAX_REPAIR_MOVES):
+            per_row = (np.maximum(model.row_lower - activity, 0) + np.maximum(activity - model.row_upper, 0)) / scale
+            if per_row.sum() <= 1e-9:
+                return ServingPlanner._trim(model, A, x, activity, violations)
+            worst = int(np.argmax(per_row))
+            row = A[worst].toarray().ravel() if hasattr(A, 'toarray') else A[worst]
+            # One serving more or less of each food, whichever moves the worst row towards its bounds
+            need = 1.0 if activity[worst] < model.row_lower[worst] else -1.0
+            step = need * np.sign(row[movable])
+            valid = ((step > 0) & (x[movable] < model.col_upper[movable])) | ((step < 0) & (x[movable] >= 1))
+            candidates, step = movable[valid], step[valid]
+            if len(candidates) == 0:
+                return None
+            # Cheapest per unit of fix first
+            order = np.argsort(model.c[candidates] * step / np.abs(row[candidates]))[:REPAIR_CANDIDATES]
+            candidates, step = candidates[order], step[order]
+            columns = A[:, candidates]
+            columns = (columns.toarray() if hasattr(columns, 'toarray') else columns) * step
+            totals = violations(activity[:, None] + columns)
+            best = int(np.argmin(totals))
+            if totals[best] >= per_row.sum() - 1e-12:
+                return None
+            x[candidates[best]] += step[best]
+            activity = activity + columns[:, best]
+        return None
+
+    @staticmethod
+    def _trim(model: LinearModel, A, x: np.ndarray, activity: np.ndarray, violations) -> np.ndarray:
+        """Drop single servings while the plan stays feasible, most expensive first"""
+        for _ in range(MAX_REPAIR_MOVES):
+            candidates = np.flatnonzero((model.integrality == INTEGER) & (x >= 1) & (model.c > 0))
+            if len(candidates) == 0:
+                break
+            candidates = candidates[np.argsort(-model.c[candidates])][:REPAIR_CANDIDATES]
+            columns = A[:, candidates]
+            columns = columns.toarray() if hasattr(columns, 'toarray') else columns
+            feasible = np.flatnonzero(violations(activity[:, None] - columns) <= 1e-9)
+            if len(feasible) == 0:
+                break
+            # candidates are sorted by cost, so the first feasible removal saves the most
+            x[candidates[feasible[0]]] -= 1
+            activity = activity - columns[:, feasible[0]]
+        return x
+
+    def _add_servings(self, result: Dict[str, Any]):
+        """Annotate plan entries with their serving count and unit"""
+        grams = self.catalog.serving_grams()
+        for entries in result['meal_plan'].values():
+            for entry in entries:
+                row = self.catalog.name_index[entry['name']]
+                if grams[row] > 0:
+                    entry['servings'] = int(round(entry['quantity'] / grams[row]))
+                    entry['unit'] = self.catalog.units[row] or 'serving'
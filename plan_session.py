@@ -0,0 +1,261 @@
+import time
+import uuid
+import logging
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple, Iterable
+from meal_optimizer import MealOptimizer, LinearModel, SolveResult
+from nutrient_targets import NutrientTarget
+from pantry import Pantry, pantry_stock, pantry_names
+from metrics import span, record_solve
+
+try:
+    import highspy
+except ImportError:  # sessions still reuse the built model, but solve cold
+    highspy = None
+
+
+def _csc(A) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Column-compressed (start, index, value) arrays of a dense or sparse matrix"""
+    if hasattr(A, 'tocsc'):
+        A = A.tocsc()
+        return A.indptr, A.indices, A.data
+    A = np.atleast_2d(np.asarray(A, dtype=np.float64))
+    rows, cols = np.nonzero(A.T)
+    # np.nonzero on the transpose walks column by column
+    start = np.concatenate([[0], np.cumsum(np.bincount(rows, minlength=A.shape[1]))])
+    return start, cols, A.T[rows, cols]
+
+
+class IncrementalHighs:
+    """A HiGHS instance that keeps its model and basis between solves
+
+    Changing row bounds or column costs leaves the previous optimal basis
+    in place, so the next run() starts from it and typically needs only a
+    handful of dual simplex iterations. Models with integer or
+    semicontinuous columns are solved as MIPs under the model's time limit
+    and gap, optionally from a starting solution (set_solution).
+
+    `name` labels the results (solver backend and metrics); callers that
+    solve once and throw the instance away should pass their own.
+    """
+    name = 'highs-warm'
+
+    def __init__(self, model: LinearModel, name: Optional[str] = None):
+        if name is not None:
+            self.name = name
+        self.highs = highspy.Highs()
+        self.highs.setOptionValue('output_flag', False)
+        lp = highspy.HighsLp()
+        lp.num_col_ = model.num_cols
+        lp.num_row_ = len(model.row_lower)
+        lp.col_cost_ = model.c
+        lp.col_lower_ = model.col_lower
+        lp.col_upper_ = model.col_upper
+        lp.row_lower_ = model.row_lower
+        lp.row_upper_ = model.row_upper
+        start, index, value = _csc(model.A)
+        lp.a_matrix_.format_ = highspy.MatrixFormat.kColwise
+        lp.a_matrix_.start_ = start
+        lp.a_matrix_.index_ = index
+        lp.a_matrix_.value_ = value
+        if model.integrality is not None and np.any(model.integrality):
+            lp.integrality_ = [highspy.HighsVarType(int(kind)) for kind in model.integrality]
+            if model.time_limit is not None:
+                self.highs.setOptionValue('time_limit', float(model.time_limit))
+            if model.mip_gap is not None:
+                self.highs.setOptionValue('mip_rel_gap', float(model.mip_gap))
+        self.highs.passModel(lp)
+        self.solves = 0
+
+    def update(self, model: LinearModel, changed_rows: np.ndarray, cost_changed: bool,
+               changed_cols: np.ndarray = ()):
+        for row in changed_rows:
+            self.highs.changeRowBounds(int(row), float(model.row_lower[row]), float(model.row_upper[row]))
+        for col in changed_cols:
+            self.highs.changeColBounds(int(col), float(model.col_lower[col]), float(model.col_upper[col]))
+        if cost_changed:
+            self.set_costs(model.c)
+
+    def set_costs(self, c: np.ndarray):
+        self.highs.changeColsCost(len(c), np.arange(len(c), dtype=np.int32), c)
+
+    def set_row_bounds(self, row: int, lower: float, upper: float):
+        self.highs.changeRowBounds(int(row), float(lower), float(upper))
+
+    def set_solution(self, x: np.ndarray):
+        """Feasible starting point for the next MIP solve (ignored by HiGHS if it isn't)"""
+        solution = highspy.HighsSolution()
+        solution.col_value = np.asarray(x, dtype=np.float64)
+        self.highs.setSolution(solution)
+
+    def duals(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Row duals (shadow prices) and column duals (reduced costs) of the last solve"""
+        solution = self.highs.getSolution()
+        return np.asarray(solution.row_dual), np.asarray(solution.col_dual)
+
+    def solve(self, model: LinearModel) -> SolveResult:
+        start = time.perf_counter()
+        self.highs.run()
+        elapsed = time.perf_counter() - start
+        self.solves += 1
+
+        status = self.highs.getModelStatus()
+        info = self.highs.getInfo()
+        gap = float(info.mip_gap) if model.integrality is not None and np.any(model.integrality) else None
+        if status == highspy.HighsModelStatus.kOptimal:
+            x = np.asarray(self.highs.getSolution().col_value)
+            return SolveResult('optimal', x, float(model.c @ x), self.name, elapsed, gap)
+        if status == highspy.HighsModelStatus.kInfeasible:
+            return SolveResult('infeasible', None, None, self.name, elapsed)
+        if status == highspy.HighsModelStatus.kTimeLimit and info.primal_solution_status == 2:
+            # Stopped at the time limit with an incumbent in hand
+            x = np.asarray(self.highs.getSolution().col_value)
+            return SolveResult('feasible', x, float(model.c @ x), self.name, elapsed, gap)
+        return SolveResult('error', None, None, self.name, elapsed)
+
+
+class MealPlanSession:
+    """Keeps one user's built LP around for "tweak and regenerate" flows
+
+    Exposes the same optimize_meal_plan() signature as MealOptimizer, so it
+    can be passed anywhere an optimizer is expected (e.g. PlanCache). When
+    only the calorie band, protein floor, budget, pantry discount or the
+    grams of stocked pantry foods change, the stored model keeps its matrix
+    and gets new row bounds, pantry column bounds and (for a new discount)
+    costs, and is re-solved from the last optimal basis, so re-planning
+    after a plan was accepted (and its pantry grams deducted) is a delta
+    solve; a new dietary preference, nutrient targets, set of stocked foods
+    or catalog rebuilds it.
+    """
+
+    def __init__(self, optimizer: MealOptimizer):
+        self.optimizer = optimizer
+        self.catalog = optimizer.catalog
+        self.dietary_preference: Optional[str] = None
+        self.nutrient_targets: Tuple[NutrientTarget, ...] = ()
+        self.stocked: Tuple[str, ...] = ()
+        self.discounted: Tuple[str, ...] = ()
+        self.food_idx: Optional[np.ndarray] = None
+        self.model: Optional[LinearModel] = None
+        self.engine: Optional[IncrementalHighs] = None
+        self.warm_solves = 0
+        self.cold_solves = 0
+        self.last_used = time.time()
+        self._lock = threading.Lock()
+
+    def optimize_meal_plan(self, calorie_target: int, protein_target: int,
+                           budget: float, dietary_preference: str,
+                           pantry_items: Pantry,
+                           nutrient_targets: Optional[Iterable[NutrientTarget]] = None) -> Dict[str, Any]:
+        """Optimize a meal plan, re-solving incrementally when possible"""
+        with self._lock:
+            self.last_used = time.time()
+            try:
+                food_idx = self.catalog.indices_for(dietary_preference)
+                if len(food_idx) == 0:
+                    return {
+                        'status': 'error',
+                        'message': 'No foods available for your dietary preference.'
+                    }
+
+                nutrient_targets = tuple(nutrient_targets or ())
+                stocked = tuple(sorted(pantry_stock(pantry_items)))
+                discounted = tuple(sorted(set(pantry_names(pantry_items))))
+                # Energy-share targets are matrix coefficients and each stocked food has its own
+                # pantry column, so new targets or stocked foods mean a new model
+                reuse = (self.model is not None and dietary_preference == self.dietary_preference
+                         and nutrient_targets == self.nutrient_targets and stocked == self.stocked)
+                with span('build'):
+                    if reuse:
+                        reprice = discounted != self.discounted
+                        model, changed_rows, changed_cols = self.optimizer._retarget_model(
+                            self.model, food_idx, calorie_target, protein_target, budget, pantry_items, reprice
+                        )
+                        changes = (changed_rows, reprice, changed_cols)
+                    else:
+                        model = self.optimizer._build_model(
+                            food_idx, calorie_target, protein_target, budget, pantry_items, nutrient_targets
+                        )
+                        changes = None
+
+                self.dietary_preference = dietary_preference
+                self.nutrient_targets = nutrient_targets
+                self.stocked = stocked
+                self.discounted = discounted
+                self.food_idx = food_idx
+                self.model = model
+                with span('solve'):
+                    solved = self._solve(model, changes)
+
+                if solved.status != 'optimal':
+                    return {
+                        'status': 'error',
+                        'message': 'No feasible meal plan found with current constraints. Try increasing your budget or relaxing dietary restrictions.'
+                    }
+
+                result = self.optimizer._build_result(food_idx, solved.x, pantry_items)
+                result['solver'] = {
+                    'backend': solved.backend,
+                    'solve_time_ms': round(solved.solve_time * 1000, 2)
+                }
+                return result
+
+            except Exception as e:
+                logging.error(f"Error in meal optimization: {e}")
+                return {
+                    'status': 'error',
+                    'message': 'An error occurred during optimization. Please try again with different parameters.'
+                }
+
+    def _solve(self, model: LinearModel, changes: Optional[Tuple[np.ndarray, bool, np.ndarray]]) -> SolveResult:
+        """Solve `model`, warm from the last basis when `changes` lists the (rows, costs, columns) that moved"""
+        if highspy is None:
+            self.cold_solves += 1
+            return self.optimizer.solve_model(model)
+
+        if self.engine is None or changes is None:
+            self.engine = IncrementalHighs(model)
+            self.cold_solves += 1
+        else:
+            self.engine.update(model, *changes)
+            self.warm_solves += 1
+
+        solved = self.engine.solve(model)
+        record_solve(solved.backend, solved.status)
+        if solved.status == 'error':
+            # Drop the engine so the next call rebuilds from scratch
+            self.engine = None
+            return self.optimizer.solve_model(model)
+        return solved
+
+
+class PlanSessionStore:
+    """Bounded, idle-expiring map of session id -> MealPlanSession"""
+
+    def __init__(self, max_sessions: int = 512, idle_timeout: float = 1800):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self._sessions: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def new_id() -> str:
+        return uuid.uuid4().hex
+
+    def get(self, session_id: str, optimizer: MealOptimizer) -> MealPlanSession:
+        """Return the session for an id, replacing it if the catalog was reloaded"""
+        now = time.time()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None or session.optimizer is not optimizer or now - session.last_used > self.idle_timeout:
+                session = MealPlanSession(optimizer)
+                self._sessions[session_id] = session
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+            return session
+
+    def __len__(self) -> int:
+        return len(self._sessions)
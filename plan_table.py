@@ -0,0 +1,329 @@
+"""Precomputed daily plans over a (diet, nutrient targets, kcal, protein, budget) grid
+
+Build the table at deploy time for the current foods.csv:
+
+    python -m plan_table --out plan_table --kcal 1200:4000:25 --protein 30:150:1
+
+The targets axis holds every distinct RDA target set (one per age band
+and sex, see nutrient_targets.target_sets) plus no targets, so the table
+serves the default NUTRIENT_TARGETS=1 profiles as well as NUTRIENT_TARGETS=0
+ones (--targets rda or none builds only one side, in a tenth of the time).
+
+The table is a directory of .npy files opened with mmap, so every worker
+shares one copy through the page cache and a lookup is an index read plus
+building the result dict. Off-grid profiles, pantry items, multi-day
+plans and tables built from a different catalog fall back to a live solve.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Any, Optional, Tuple, Iterable
+from food_catalog import FoodCatalog, DIETARY_PREFERENCES, get_catalog
+from meal_optimizer import MealOptimizer
+from nutrient_targets import NutrientTarget, target_sets, targets_key
+from pantry import Pantry
+from metrics import span
+
+PLAN_TABLE_PATH = os.environ.get('PLAN_TABLE', 'plan_table')
+PLAN_TABLE_FORMAT = 2
+
+# Default grid; kcal and budget steps match the plan cache buckets
+DEFAULT_KCAL = (1200, 4000, 25)
+DEFAULT_PROTEIN = (30, 150, 1)
+DEFAULT_BUDGET = (25, 500, 25)
+
+# One planned food: grams of catalog row `food` served at meal `meal`
+ENTRY_DTYPE = np.dtype([('meal', np.uint8), ('food', np.int32), ('grams', np.float32)])
+
+NO_PLAN = -1
+
+
+def grid_values(axis: Tuple[float, float, float]) -> np.ndarray:
+    start, stop, step = axis
+    return np.arange(start, stop + step / 2, step, dtype=np.float64)
+
+
+class PlanTable:
+    """Read-only, memory-mapped plan table
+
+    Arrays are indexed by group (one per diet and target set, see
+    group()), then kcal and protein. For every cell the table holds the plan solved
+    with no budget limit and its real cost; any budget at or above that
+    cost gets the same plan. Tighter budgets use the per-budget index,
+    with the budget rounded down to the grid.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        if self.meta.get('format') != PLAN_TABLE_FORMAT:
+            raise ValueError(f"Unsupported plan table format in {path}")
+
+        def load(name):
+            return np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r')
+
+        self.free_plan = load('free_plan')
+        self.free_cost = load('free_cost')
+        self.budget_plan = load('budget_plan')
+        self.offsets = load('plan_offsets')
+        self.entries = load('plan_entries')
+
+        self.digest = self.meta['catalog_digest']
+        self.diets = {diet: i for i, diet in enumerate(self.meta['diets'])}
+        self.target_sets = {key: i for i, key in enumerate(self.meta['target_sets'])}
+        self.kcal, self.protein, self.budget = (tuple(self.meta[axis]) for axis in ('kcal', 'protein', 'budget'))
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def open(cls, path: str = PLAN_TABLE_PATH) -> Optional['PlanTable']:
+        """Open a table if one was built, otherwise return None"""
+        if not os.path.exists(os.path.join(path, 'meta.json')):
+            return None
+        try:
+            table = cls(path)
+        except Exception as e:
+            logging.error(f"Error opening plan table {path}: {e}")
+            return None
+        logging.info(f"Opened plan table {path} ({len(table.offsets) - 1} distinct plans)")
+        return table
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    @staticmethod
+    def _index(value: float, axis: Tuple[float, float, float], rounding) -> Optional[int]:
+        start, stop, step = axis
+        i = int(rounding((value - start) / step))
+        return i if 0 <= i <= int(round((stop - start) / step)) else None
+
+    def group(self, dietary_preference: str, nutrient_targets: Optional[Iterable[NutrientTarget]] = None) -> Optional[int]:
+        """First array index for a diet and target set, or None if the table wasn't built for them"""
+        diet = self.diets.get(dietary_preference)
+        targets = self.target_sets.get(targets_key(nutrient_targets))
+        if diet is None or targets is None:
+            return None
+        return diet * len(self.target_sets) + targets
+
+    def cell(self, calorie_target: float, protein_target: float, budget: float,
+             dietary_preference: str, nutrient_targets: Optional[Iterable[NutrientTarget]] = None) -> Optional[int]:
+        """Plan id for a profile, or None when it is off the grid"""
+        diet = self.group(dietary_preference, nutrient_targets)
+        k = self._index(calorie_target, self.kcal, lambda v: np.floor(v + 0.5))
+        # Protein is a floor, so round the target up; budget is a cap, so round it down
+        p = self._index(protein_target, self.protein, lambda v: np.ceil(v - 1e-9))
+        if diet is None or k is None or p is None:
+            return None
+        if budget >= self.free_cost[diet, k, p]:
+            plan = int(self.free_plan[diet, k, p])
+        else:
+            b = self._index(budget, self.budget, lambda v: np.floor(v + 1e-9))
+            if b is None:
+                return None
+            plan = int(self.budget_plan[diet, k, p, b])
+        return plan if plan != NO_PLAN else None
+
+    def lookup(self, optimizer: MealOptimizer, calorie_target: float, protein_target: float,
+               budget: float, dietary_preference: str,
+               pantry_items: Pantry,
+               nutrient_targets: Optional[Iterable[NutrientTarget]] = None) -> Optional[Dict[str, Any]]:
+        """Return the precomputed plan for a profile, or None to solve it live
+
+        The table covers calories, protein, budget and the RDA target sets it
+        was built for, so profiles with pantry items or other targets are
+        always solved live.
+        """
+        start = time.perf_counter()
+        if pantry_items or optimizer.catalog.digest != self.digest or optimizer.meal_types != self.meta['meal_types']:
+            self.misses += 1
+            return None
+        plan = self.cell(calorie_target, protein_target, budget, dietary_preference, nutrient_targets)
+        if plan is None:
+            self.misses += 1
+            return None
+
+        with span('table_lookup'):
+            food_idx = optimizer.catalog.indices_for(dietary_preference)
+            entries = self.entries[self.offsets[plan]:self.offsets[plan + 1]]
+            quantities = np.zeros((len(optimizer.meal_types), len(food_idx)))
+            quantities[entries['meal'], np.searchsorted(food_idx, entries['food'])] = entries['grams']
+
+        result = optimizer._build_result(food_idx, quantities.ravel())
+        result['solver'] = {
+            'backend': 'plan-table',
+            'solve_time_ms': round((time.perf_counter() - start) * 1000, 2)
+        }
+        self.hits += 1
+        return result
+
+
+def _solve_diet(catalog: FoodCatalog, diet: str, nutrient_targets: Tuple[NutrientTarget, ...],
+                kcal: np.ndarray, protein: np.ndarray,
+                budgets: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, List[np.ndarray]]:
+    """Solve every grid cell of one diet and target set with warm re-solves of one HiGHS model"""
+    from plan_session import IncrementalHighs
+
+    optimizer = MealOptimizer(catalog)
+    food_idx = catalog.indices_for(diet)
+    M = len(optimizer.meal_types)
+    true_costs = np.tile(optimizer._coefficients(food_idx)['Cost'], M)
+
+    free_plan = np.full((len(kcal), len(protein)), NO_PLAN, dtype=np.int32)
+    free_cost = np.full((len(kcal), len(protein)), np.inf, dtype=np.float32)
+    budget_plan = np.full((len(kcal), len(protein), len(budgets)), NO_PLAN, dtype=np.int32)
+    plans: List[np.ndarray] = []
+    seen: Dict[bytes, int] = {}
+
+    def store(x: np.ndarray) -> int:
+        grams = np.round(x.reshape(M, len(food_idx)), 1)
+        meals, foods = np.nonzero(grams > 1)
+        entries = np.empty(len(meals), dtype=ENTRY_DTYPE)
+        entries['meal'], entries['food'], entries['grams'] = meals, food_idx[foods], grams[meals, foods]
+        key = entries.tobytes()
+        if key not in seen:
+            seen[key] = len(plans)
+            plans.append(entries)
+        return seen[key]
+
+    engine, previous = None, None
+    for k, calories in enumerate(kcal):
+        for p, protein_target in enumerate(protein):
+            model = optimizer._build_model(food_idx, calories, protein_target, np.inf, [], nutrient_targets)
+            if engine is None:
+                engine = IncrementalHighs(model)
+            else:
+                engine.update(model, np.flatnonzero(
+                    (model.row_lower != previous.row_lower) | (model.row_upper != previous.row_upper)
+                ), False)
+            previous = model
+
+            solved = engine.solve(model)
+            if solved.status != 'optimal':
+                continue
+            free_plan[k, p] = store(solved.x)
+            free_cost[k, p] = cost = float(true_costs @ solved.x)
+            budget_plan[k, p, budgets >= cost] = free_plan[k, p]
+
+            # Only budgets below the unconstrained plan's cost change the answer
+            row = model.row('budget')
+            for b in np.flatnonzero(budgets < cost):
+                engine.set_row_bounds(row, -np.inf, budgets[b])
+                solved = engine.solve(model)
+                if solved.status == 'optimal':
+                    budget_plan[k, p, b] = store(solved.x)
+            engine.set_row_bounds(row, -np.inf, np.inf)
+
+    return free_plan, free_cost, budget_plan, plans
+
+
+def table_target_sets(catalog: FoodCatalog, which: str = 'all') -> List[Tuple[NutrientTarget, ...]]:
+    """Target sets to build: 'rda' (what NUTRIENT_TARGETS=1 profiles get), 'none', or 'all' (both)"""
+    sets = []
+    if which in ('all', 'none'):
+        sets.append(())
+    if which in ('all', 'rda'):
+        sets.extend(target_sets(catalog.columns))
+    return sets
+
+
+def build_plan_table(catalog: FoodCatalog, out: str, kcal=DEFAULT_KCAL, protein=DEFAULT_PROTEIN,
+                     budget=DEFAULT_BUDGET, diets: List[str] = DIETARY_PREFERENCES,
+                     workers: Optional[int] = None,
+                     nutrient_target_sets: Optional[List[Tuple[NutrientTarget, ...]]] = None) -> Dict[str, Any]:
+    """Solve the grid (one process per diet and target set) and write the table directory atomically"""
+    kcal_values, protein_values, budget_values = grid_values(kcal), grid_values(protein), grid_values(budget)
+    if nutrient_target_sets is None:
+        nutrient_target_sets = table_target_sets(catalog)
+    # Group order matches PlanTable.group(): diet-major, then target set
+    groups = [(diet, targets) for diet in diets for targets in nutrient_target_sets]
+    with ProcessPoolExecutor(max_workers=min(workers or os.cpu_count() or 1, len(groups))) as pool:
+        solved = list(pool.map(_solve_diet, [catalog] * len(groups), [diet for diet, _ in groups],
+                               [targets for _, targets in groups],
+                               [kcal_values] * len(groups), [protein_values] * len(groups),
+                               [budget_values] * len(groups)))
+
+    # Renumber each group's plans into one shared plan list
+    free_plans, free_costs, budget_plans, all_plans = [], [], [], []
+    for free_plan, free_cost, budget_plan, plans in solved:
+        base = len(all_plans)
+        free_plans.append(np.where(free_plan == NO_PLAN, NO_PLAN, free_plan + base))
+        budget_plans.append(np.where(budget_plan == NO_PLAN, NO_PLAN, budget_plan + base))
+        free_costs.append(free_cost)
+        all_plans.extend(plans)
+
+    offsets = np.zeros(len(all_plans) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(plan) for plan in all_plans])
+    entries = np.concatenate(all_plans) if all_plans else np.empty(0, dtype=ENTRY_DTYPE)
+    meta = {
+        'format': PLAN_TABLE_FORMAT,
+        'catalog_digest': catalog.digest,
+        'meal_types': MealOptimizer(catalog).meal_types,
+        'diets': list(diets),
+        'target_sets': [targets_key(targets) for targets in nutrient_target_sets],
+        'kcal': list(kcal),
+        'protein': list(protein),
+        'budget': list(budget),
+        'built_at': time.time()
+    }
+
+    tmp = f"{out.rstrip(os.sep)}.tmp-{os.getpid()}"
+    os.makedirs(tmp)
+    for name, array in (('free_plan', np.stack(free_plans)), ('free_cost', np.stack(free_costs)),
+                        ('budget_plan', np.stack(budget_plans)), ('plan_offsets', offsets),
+                        ('plan_entries', entries)):
+        np.save(os.path.join(tmp, f'{name}.npy'), array)
+    with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=2)
+
+    # Workers that already mapped the old files keep reading them until they reopen
+    if os.path.exists(out):
+        old = f"{out.rstrip(os.sep)}.old-{os.getpid()}"
+        os.rename(out, old)
+        os.rename(tmp, out)
+        shutil.rmtree(old)
+    else:
+        os.rename(tmp, out)
+    return {'cells': int(np.stack(budget_plans).size), 'plans': len(all_plans), 'entries': len(entries)}
+
+
+def _axis(text: str) -> Tuple[float, float, float]:
+    start, stop, step = (float(v) for v in text.split(':'))
+    if step <= 0 or stop < start:
+        raise argparse.ArgumentTypeError(f"expected start:stop:step, got {text}")
+    return start, stop, step
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--out', default=PLAN_TABLE_PATH, help='table directory (default: $PLAN_TABLE or plan_table)')
+    parser.add_argument('--kcal', type=_axis, default=DEFAULT_KCAL, help='start:stop:step')
+    parser.add_argument('--protein', type=_axis, default=DEFAULT_PROTEIN, help='start:stop:step')
+    parser.add_argument('--budget', type=_axis, default=DEFAULT_BUDGET, help='start:stop:step')
+    parser.add_argument('--diets', default=','.join(DIETARY_PREFERENCES))
+    parser.add_argument('--targets', choices=['all', 'rda', 'none'], default='all',
+                        help='nutrient target sets to cover (default: RDA sets and no targets)')
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    catalog = get_catalog()
+    if catalog.empty:
+        print("Food catalog is empty; nothing to build", file=sys.stderr)
+        return 1
+    start = time.perf_counter()
+    stats = build_plan_table(catalog, args.out, args.kcal, args.protein, args.budget,
+                             [d for d in args.diets.split(',') if d], args.workers,
+                             table_target_sets(catalog, args.targets))
+    print(f"Wrote {args.out}: {stats['cells']} cells, {stats['plans']} distinct plans, "
+          f"{stats['entries']} entries in {time.perf_counter() - start:.1f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,135 @@
+"""A process pool for optimizer solves, shared by every request of a server process.
+
+Threads waiting on a solve release the GIL, so one server process with a
+small pool of solver processes (one per core) can keep many requests in
+flight, instead of one forked worker per concurrent solve. Each solver
+process loads its own catalog (the compiled catalog is memory-mapped, so
+its pages are shared) and follows catalog reloads like get_catalog().
+"""
+import os
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Any, Optional, Iterable
+from food_catalog import FoodCatalog, get_catalog
+from meal_optimizer import MealOptimizer
+from nutrient_targets import NutrientTarget
+from pantry import Pantry, copy_pantry
+
+_worker_optimizer: Optional[MealOptimizer] = None
+
+
+def _worker_solve(kind: str, params: Dict[str, Any], catalog_digest: Optional[str] = None) -> Dict[str, Any]:
+    """Run one solve in a pool process
+
+    A result solved against a different catalog than the caller's would be
+    cached under the caller's digest, so a mismatch is refused instead.
+    """
+    global _worker_optimizer
+    catalog = get_catalog()
+    if catalog_digest is not None and catalog.digest != catalog_digest:
+        logging.warning(f"Solver process catalog {catalog.version} does not match the request's "
+                        f"{catalog_digest[:12]}; refusing the solve")
+        return {
+            'status': 'error',
+            'message': 'The food list was just updated. Please try again.'
+        }
+    if _worker_optimizer is None or _worker_optimizer.catalog is not catalog:
+        _worker_optimizer = MealOptimizer(catalog)
+    if kind == 'warm':
+        return {'status': 'success', 'pid': os.getpid()}
+    if kind == 'weekly':
+        return _worker_optimizer.optimize_weekly_plan(**params)
+    if kind == 'servings':
+        from plan_servings import ServingPlanner
+        return ServingPlanner(_worker_optimizer).optimize_meal_plan(**params)
+    return _worker_optimizer.optimize_meal_plan(**params)
+
+
+class SolvePool:
+    """Shared solver processes; run() blocks the calling thread, not the process"""
+
+    def __init__(self, processes: int):
+        self.processes = processes
+        self.submitted = 0
+        self._lock = threading.Lock()
+        self._executor = self._new_executor()
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        # Spawned, not forked: the server process has threads and an event loop running
+        return ProcessPoolExecutor(max_workers=self.processes, mp_context=multiprocessing.get_context('spawn'))
+
+    def warm(self):
+        """Start every solver process and load its catalog before the first request"""
+        futures = [self._executor.submit(_worker_solve, 'warm', {}) for _ in range(self.processes)]
+        for future in futures:
+            future.result()
+
+    def run(self, kind: str, params: Dict[str, Any], catalog_digest: Optional[str] = None) -> Dict[str, Any]:
+        """Solve in a pool process, refused if its catalog's digest isn't `catalog_digest`"""
+        with self._lock:
+            self.submitted += 1
+            executor = self._executor
+        try:
+            return executor.submit(_worker_solve, kind, params, catalog_digest).result()
+        except BrokenProcessPool as e:
+            # A solver process died (e.g. OOM-killed): replace the pool for the next request
+            logging.error(f"Solve pool broken, restarting it: {e}")
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = self._new_executor()
+        except Exception as e:
+            logging.error(f"Error in pooled optimization: {e}")
+        return {
+            'status': 'error',
+            'message': 'An error occurred during optimization. Please try again with different parameters.'
+        }
+
+    def optimizer(self, catalog: FoodCatalog, kind: str = 'meal') -> 'PooledOptimizer':
+        return PooledOptimizer(self, catalog, kind)
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class PooledOptimizer:
+    """Stands in for a MealOptimizer (or, with kind='servings', a ServingPlanner)
+
+    `catalog` is the server process's copy, used for cache keys; the solve
+    itself runs against the solver process's catalog, and only if the two
+    have the same digest.
+    """
+
+    def __init__(self, pool: SolvePool, catalog: FoodCatalog, kind: str = 'meal'):
+        self.pool = pool
+        self.catalog = catalog
+        self.kind = kind
+
+    def optimize_meal_plan(self, calorie_target: int, protein_target: int,
+                           budget: float, dietary_preference: str,
+                           pantry_items: Pantry,
+                           nutrient_targets: Optional[Iterable[NutrientTarget]] = None) -> Dict[str, Any]:
+        return self.pool.run(self.kind, {
+            'calorie_target': calorie_target,
+            'protein_target': protein_target,
+            'budget': budget,
+            'dietary_preference': dietary_preference,
+            'pantry_items': copy_pantry(pantry_items),
+            'nutrient_targets': tuple(nutrient_targets or ())
+        }, self.catalog.digest)
+
+    def optimize_weekly_plan(self, calorie_target: int, protein_target: int,
+                             budget: float, dietary_preference: str,
+                             pantry_items: Pantry, days: int = 7,
+                             nutrient_targets: Optional[Iterable[NutrientTarget]] = None) -> Dict[str, Any]:
+        return self.pool.run('weekly', {
+            'calorie_target': calorie_target,
+            'protein_target': protein_target,
+            'budget': budget,
+            'dietary_preference': dietary_preference,
+            'pantry_items': copy_pantry(pantry_items),
+            'days': days,
+            'nutrient_targets': tuple(nutrient_targets or ())
+        }, self.catalog.digest)
@@ -0,0 +1,145 @@
+"""Content-hashed, precompressed static assets served from memory.
+
+Every file in the static folder is read once, given a fingerprinted name
+(style.css -> style.3f2a9c1b7d4e.css) and compressed with gzip (and
+brotli, when installed) up front. Fingerprinted URLs never change
+content, so they are served with a one-year immutable Cache-Control;
+plain names keep working with an ETag and revalidation. Stylesheet
+url() references to other assets are rewritten to their fingerprinted
+names, so a new image also gives the stylesheet a new URL.
+"""
+import os
+import re
+import gzip
+import hashlib
+import logging
+import mimetypes
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'
+HASH_LENGTH = 12
+# Already-compressed formats (images, fonts) gain nothing from gzip
+COMPRESSIBLE = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+MIN_COMPRESS_BYTES = 512
+CSS_URL = re.compile(r'''url\((['"]?)([^'")]+)\1\)''')
+
+
+def compress(body: bytes) -> Dict[str, bytes]:
+    """The body in every available Content-Encoding, smallest first ('identity' always included)"""
+    encodings = {'identity': body}
+    if len(body) >= MIN_COMPRESS_BYTES:
+        encodings['gzip'] = gzip.compress(body, compresslevel=9, mtime=0)
+        if brotli is not None:
+            encodings['br'] = brotli.compress(body, quality=11)
+    return dict(sorted(encodings.items(), key=lambda item: len(item[1])))
+
+
+def pick_encoding(accept_encoding: str, available: Dict[str, bytes]) -> str:
+    """The smallest encoding the client accepts (q=0 excludes one)"""
+    accepted = set()
+    for part in (accept_encoding or '').split(','):
+        name, _, params = part.strip().partition(';')
+        if name and params.replace(' ', '') not in ('q=0', 'q=0.0'):
+            accepted.add(name.lower())
+    for encoding in available:
+        if encoding == 'identity' or encoding in accepted or '*' in accepted:
+            return encoding
+    return 'identity'
+
+
+@dataclass
+class Asset:
+    """One static file, fingerprinted and precompressed"""
+    name: str
+    hashed_name: str
+    content_type: str
+    digest: str
+    bodies: Dict[str, bytes] = field(default_factory=dict)
+
+
+class AssetStore:
+    """All static files of a folder, keyed by plain and fingerprinted name"""
+
+    def __init__(self, folder: str):
+        self.folder = folder
+        self._lock = threading.Lock()
+        self._build()
+
+    def _scan(self) -> Dict[str, int]:
+        mtimes = {}
+        for root, _, files in os.walk(self.folder):
+            for filename in files:
+                path = os.path.join(root, filename)
+                mtimes[os.path.relpath(path, self.folder).replace(os.sep, '/')] = os.stat(path).st_mtime_ns
+        return mtimes
+
+    def _build(self):
+        mtimes = self._scan() if os.path.isdir(self.folder) else {}
+        assets: Dict[str, Asset] = {}
+        # Stylesheets last, so the files they reference already have fingerprints
+        for name in sorted(mtimes, key=lambda n: (n.endswith('.css'), n)):
+            with open(os.path.join(self.folder, name), 'rb') as f:
+                body = f.read()
+            if name.endswith('.css'):
+                body = self._rewrite_css(name, body, assets)
+            assets[name] = self._asset(name, body)
+        self.mtimes = mtimes
+        self.assets = assets
+        self.by_hashed_name = {asset.hashed_name: asset for asset in assets.values()}
+        total = sum(len(asset.bodies['identity']) for asset in assets.values())
+        logging.info(f"Fingerprinted {len(assets)} static assets ({total // 1024} KB)")
+
+    @staticmethod
+    def _asset(name: str, body: bytes) -> Asset:
+        digest = hashlib.sha256(body).hexdigest()[:HASH_LENGTH]
+        stem, ext = os.path.splitext(name)
+        content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        bodies = compress(body) if content_type.startswith(COMPRESSIBLE) else {'identity': body}
+        if content_type.startswith('text/') or content_type == 'application/javascript':
+            content_type += '; charset=utf-8'
+        return Asset(name, f"{stem}.{digest}{ext}", content_type, digest, bodies)
+
+    @staticmethod
+    def _rewrite_css(name: str, body: bytes, assets: Dict[str, Asset]) -> bytes:
+        """Point relative url() references at fingerprinted names"""
+        base = os.path.dirname(name)
+
+        def replace(match):
+            quote, target = match.group(1), match.group(2)
+            asset = assets.get(os.path.normpath(os.path.join(base, target)).replace(os.sep, '/'))
+            if asset is None or ':' in target or target.startswith('/'):
+                return match.group(0)
+            hashed = os.path.join(os.path.dirname(target), os.path.basename(asset.hashed_name)).replace(os.sep, '/')
+            return f"url({quote}{hashed}{quote})"
+
+        return CSS_URL.sub(replace, body.decode('utf-8')).encode('utf-8')
+
+    def refresh(self):
+        """Rebuild if a file changed on disk (for debug mode; deploys restart the process)"""
+        if os.path.isdir(self.folder) and self._scan() != self.mtimes:
+            with self._lock:
+                if self._scan() != self.mtimes:
+                    self._build()
+
+    def hashed(self, name: str) -> str:
+        """Fingerprinted name for a static file (unchanged if unknown)"""
+        asset = self.assets.get(name)
+        return asset.hashed_name if asset is not None else name
+
+    def lookup(self, name: str) -> Tuple[Optional[Asset], bool]:
+        """(asset, whether `name` is its fingerprinted, immutable name)"""
+        asset = self.by_hashed_name.get(name)
+        if asset is not None:
+            return asset, True
+        return self.assets.get(name), False
+
+    def names(self) -> List[str]:
+        return sorted(self.assets)
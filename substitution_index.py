@@ -0,0 +1,80 @@
+import numpy as np
+from typing import Dict, List, Iterable, Optional
+from food_catalog import FoodCatalog
+
+# Nutrients compared when looking for substitutes
+SUBSTITUTION_FEATURES = ['Kcal', 'Protein', 'Fat', 'Carbs', 'Fiber', 'Iron']
+
+
+class SubstitutionIndex:
+    """Nearest-neighbour index of foods by nutrients per rupee
+
+    Each food is a vector of kcal/protein/fat/carbs/fiber/iron per rupee,
+    log-scaled and standardized per nutrient so that no single column
+    dominates the distance. Built once per catalog; queries are a single
+    broadcasted distance computation over the candidate rows.
+    """
+
+    def __init__(self, catalog: FoodCatalog):
+        self.catalog = catalog
+        features = [f for f in SUBSTITUTION_FEATURES if f in catalog.columns]
+        self.costs = catalog.column('Cost') if 'Cost' in catalog.columns else np.zeros(len(catalog))
+        nutrients = np.column_stack([catalog.column(f) for f in features]) if features else np.zeros((len(catalog), 0))
+
+        # Foods with no nutrients (salt) never make useful substitutes
+        self.has_nutrients = nutrients.sum(axis=1) > 0
+        safe_costs = np.where(self.costs > 0, self.costs, np.inf)
+        per_rupee = np.log1p(nutrients / safe_costs[:, None])
+        std = per_rupee.std(axis=0)
+        self.vectors = (per_rupee - per_rupee.mean(axis=0)) / np.where(std > 0, std, 1)
+
+        protein = catalog.column('Protein') if 'Protein' in catalog.columns else np.zeros(len(catalog))
+        self.protein_per_rupee = np.where(self.costs > 0, protein / safe_costs, 0)
+
+    def similar(self, rows: Iterable[int], allowed: Optional[np.ndarray] = None,
+                exclude: Iterable[int] = (), k: int = 2) -> List[List[int]]:
+        """Return, for each row, up to k cheaper catalog rows ordered by similarity"""
+        rows = np.asarray(list(rows), dtype=int)
+        if len(rows) == 0:
+            return []
+        candidates = np.arange(len(self.catalog)) if allowed is None else np.asarray(allowed, dtype=int)
+        candidates = candidates[~np.isin(candidates, list(exclude)) & self.has_nutrients[candidates]]
+
+        # (queries × candidates) squared distances, with dearer or identical foods masked out
+        diff = self.vectors[rows][:, None, :] - self.vectors[candidates][None, :, :]
+        distance = np.einsum('ijk,ijk->ij', diff, diff)
+        cheaper = self.costs[candidates][None, :] < self.costs[rows][:, None]
+        distance = np.where(cheaper & (candidates[None, :] != rows[:, None]), distance, np.inf)
+
+        k = min(k, len(candidates))
+        if k == 0:
+            return [[] for _ in rows]
+        nearest = np.argpartition(distance, k - 1, axis=1)[:, :k]
+        results = []
+        for i, cols in enumerate(nearest):
+            cols = cols[np.argsort(distance[i, cols])]
+            results.append([int(candidates[c]) for c in cols if np.isfinite(distance[i, c])])
+        return results
+
+    def describe(self, row: int) -> Dict:
+        """Alternative entry shown on results.html"""
+        return {
+            'name': self.catalog.names[row],
+            'cost_effectiveness': round(float(self.protein_per_rupee[row]), 3),
+            'cost': float(self.costs[row]),
+            'protein': float(self.catalog.column('Protein')[row]),
+            'calories': float(self.catalog.column('Kcal')[row])
+        }
+
+    def alternatives(self, names: List[str], allowed: Optional[np.ndarray] = None,
+                     exclude: Iterable[str] = (), k: int = 2) -> Dict[str, List[Dict]]:
+        """Map each food name to its top-k similar, cheaper substitutes"""
+        index = self.catalog.name_index
+        known = [name for name in names if name in index]
+        rows = self.similar(
+            [index[name] for name in known],
+            allowed=allowed,
+            exclude=[index[name] for name in exclude if name in index],
+            k=k
+        )
+        return {name: [self.describe(r) for r in similar] for name, similar in zip(known, rows)}
@@ -0,0 +1,25 @@
+import os
+import sys
+import tempfile
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Configure the app before it is imported: a throwaway database, no plan table, the fake chat backend
+_tmpdir = tempfile.mkdtemp(prefix='meal-planner-tests-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_tmpdir, 'plans.db')}"
+os.environ['PLAN_TABLE'] = os.path.join(_tmpdir, 'no-plan-table')
+os.environ['CHAT_BACKEND'] = 'fake'
+os.environ['SOLVE_PROCESSES'] = '0'
+
+
+@pytest.fixture(scope='session')
+def app_module():
+    import app
+    return app
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
@@ -0,0 +1,30 @@
+from food_catalog import get_catalog
+
+FORM = dict(age='30', sex='male', weight='70', height='175', activity_level='moderately_active',
+            budget='150', dietary_preference='veg')
+
+
+def test_results_page_leaves_alternatives_to_the_api(client):
+    page = client.post('/generate_plan', data=FORM).get_data(as_text=True)
+
+    assert 'class="alternative-card" data-food="' in page
+    assert 'data-url="/api/alternatives/FOOD"' in page
+    assert 'data-diet="veg"' in page
+    # Nothing is suggested until a card is opened
+    assert 'class="alternative-item"' not in page
+
+
+def test_alternatives_respect_diet_and_exclusions(client):
+    food = 'Rice'
+    first = client.get(f'/api/alternatives/{food}?diet=veg&k=3').get_json()
+    names = [alt['name'] for alt in first['alternatives']]
+    again = client.get(f'/api/alternatives/{food}?diet=veg&k=3&exclude={names[0]}').get_json()
+
+    assert first['food'] == food and 0 < len(names) <= 3
+    assert not set(names) & {'Chicken', 'Fish', 'Mutton', 'Prawns', 'Beef', 'Egg'}
+    assert names[0] not in [alt['name'] for alt in again['alternatives']]
+
+
+def test_unknown_food_is_404(client):
+    assert 'Nonexistent' not in get_catalog().name_index
+    assert client.get('/api/alternatives/Nonexistent').status_code == 404
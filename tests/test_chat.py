@@ -0,0 +1,110 @@
+import json
+import uuid
+import pytest
+from chat_backend import ChatBackend, FakeChatBackend, MAX_TOOL_ROUNDS
+
+
+def parse_sse(body: str):
+    """[(event, data)] from a text/event-stream body"""
+    events = []
+    for block in body.strip().split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.splitlines())
+        events.append((fields['event'], json.loads(fields['data'])))
+    return events
+
+
+@pytest.fixture
+def fake_backend(app_module, monkeypatch):
+    backend = FakeChatBackend()
+    monkeypatch.setattr(app_module, 'chat_backend', backend)
+    return backend
+
+
+def test_stream_sends_deltas_then_done(client, fake_backend):
+    session_id = f"test-{uuid.uuid4().hex}"
+    response = client.post('/chat', json={'message': 'Any tips for better sleep?', 'session_id': session_id},
+                           headers={'Accept': 'text/event-stream'})
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    events = parse_sse(response.get_data(as_text=True))
+    kinds = [event for event, _ in events]
+    assert kinds[-1] == 'done'
+    assert set(kinds[:-1]) == {'delta'}
+    assert events[-1][1]['session_id'] == session_id
+    text = ''.join(data['text'] for event, data in events if event == 'delta')
+    assert text == '(fake backend, turn 1) You said: Any tips for better sleep?'
+
+
+def test_json_mode(client, fake_backend):
+    response = client.post('/chat', json={'message': 'Hello', 'session_id': f"test-{uuid.uuid4().hex}"})
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['type'] == 'info'
+    assert data['response'] == '(fake backend, turn 1) You said: Hello'
+
+
+def test_tool_call_runs_the_optimizer(client, fake_backend):
+    response = client.post('/chat', json={'message': 'Make me a veg meal plan under ₹150',
+                                          'session_id': f"test-{uuid.uuid4().hex}", 'stream': True})
+
+    events = parse_sse(response.get_data(as_text=True))
+    tools = [data for event, data in events if event == 'tool']
+    assert tools == [{'name': 'plan_meals', 'status': 'success'}]
+    text = ''.join(data['text'] for event, data in events if event == 'delta')
+    assert text.startswith('Here is a plan costing ₹')
+    assert events[-1][0] == 'done'
+
+
+class AlwaysCallsTools(ChatBackend):
+    """Asks for a plan whenever a tool is offered, so only the round limit ends the loop"""
+    name = 'always-tools'
+
+    def __init__(self):
+        self.rounds = 0
+
+    def stream(self, messages, tools):
+        self.rounds += 1
+        if tools:
+            yield {'type': 'tool_call', 'id': f"call_{self.rounds}", 'name': 'plan_meals',
+                   'arguments': FakeChatBackend._plan_arguments('veg plan')}
+            return
+        yield {'type': 'text', 'text': 'Done planning.'}
+
+
+def test_tool_rounds_are_bounded(client, app_module, monkeypatch):
+    backend = AlwaysCallsTools()
+    monkeypatch.setattr(app_module, 'chat_backend', backend)
+
+    response = client.post('/chat', json={'message': 'Plan my meals', 'session_id': f"test-{uuid.uuid4().hex}",
+                                          'stream': True})
+
+    events = parse_sse(response.get_data(as_text=True))
+    tools = [data for event, data in events if event == 'tool']
+    assert len(tools) == MAX_TOOL_ROUNDS
+    assert all(tool['status'] == 'success' for tool in tools)
+    assert backend.rounds == MAX_TOOL_ROUNDS + 1
+    assert [data['text'] for event, data in events if event == 'delta'] == ['Done planning.']
+    assert events[-1][0] == 'done'
+
+
+def test_history_is_kept_server_side(client, fake_backend):
+    session_id = f"test-{uuid.uuid4().hex}"
+
+    first = client.post('/chat', json={'message': 'Hi there', 'session_id': session_id}).get_json()
+    second = client.post('/chat', json={'message': 'Still there?', 'session_id': session_id}).get_json()
+
+    assert first['response'].startswith('(fake backend, turn 1)')
+    # The client sends only the new message; the earlier turn comes from the server
+    assert second['response'] == '(fake backend, turn 2) You said: Still there?'
+
+
+def test_history_is_scoped_to_the_browser_session(app_module, fake_backend):
+    session_id = f"test-{uuid.uuid4().hex}"
+    alice, bob = app_module.app.test_client(), app_module.app.test_client()
+
+    alice.post('/chat', json={'message': 'Hi', 'session_id': session_id})
+    reply = bob.post('/chat', json={'message': 'Hi', 'session_id': session_id}).get_json()
+
+    assert reply['response'].startswith('(fake backend, turn 1)')
@@ -0,0 +1,14 @@
+from food_catalog import load_catalog
+
+
+def test_version_is_derived_from_the_csv(tmp_path):
+    path = tmp_path / 'foods.csv'
+    path.write_text('Food,Calories\nIdli,130\n')
+    first, second = load_catalog(str(path)), load_catalog(str(path))
+
+    path.write_text('Food,Calories\nIdli,135\n')
+    changed = load_catalog(str(path))
+
+    # Loads in different processes agree because nothing depends on load order
+    assert first.version == second.version == first.digest[:12]
+    assert changed.version != first.version
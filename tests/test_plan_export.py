@@ -0,0 +1,51 @@
+import io
+import zipfile
+import pytest
+from plan_export import build_combined_pdf
+
+pypdf = pytest.importorskip('pypdf')
+
+
+def make_plan(n: int):
+    return ({'meal_plan': {'breakfast': [{'name': f"Food {n}", 'quantity': 100, 'cost': 10.0}]}, 'total_cost': 10.0},
+            {'patient_id': f"patient-{n}", 'sex': 'female', 'age': 30, 'calorie_needs': 2000,
+             'protein_needs': 50, 'budget': 200})
+
+
+def page_texts(pdf: bytes):
+    return [page.extract_text() for page in pypdf.PdfReader(io.BytesIO(pdf), strict=True).pages]
+
+
+def test_combined_pdf_has_a_page_per_plan():
+    texts = page_texts(build_combined_pdf([make_plan(n) for n in range(3)]))
+
+    assert len(texts) == 3
+    assert ['patient-0' in texts[0], 'patient-1' in texts[1], 'Food 2' in texts[2]] == [True] * 3
+
+
+@pytest.fixture
+def stored_plan_ids(app_module):
+    with app_module.app.app_context():
+        return [app_module.StoredPlan.save(*make_plan(n), ttl=600).id for n in range(10)]
+
+
+def test_bulk_export_pdf_within_one_batch(client, stored_plan_ids):
+    response = client.post('/api/plans/export', json={'plan_ids': stored_plan_ids[:4], 'format': 'pdf'})
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/pdf'
+    assert len(page_texts(response.get_data())) == 4
+
+
+def test_bulk_export_pdf_streams_a_zip_of_batches(client, app_module, monkeypatch, stored_plan_ids):
+    monkeypatch.setattr(app_module, 'BULK_PDF_BATCH_PLANS', 4)
+
+    response = client.post('/api/plans/export', json={'plan_ids': stored_plan_ids, 'format': 'pdf'})
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/zip'
+    with zipfile.ZipFile(io.BytesIO(response.get_data())) as archive:
+        names = archive.namelist()
+        texts = [text for name in names for text in page_texts(archive.read(name))]
+    assert names == ['meal_plans_0001-0004.pdf', 'meal_plans_0005-0008.pdf', 'meal_plans_0009-0010.pdf']
+    assert [f"patient-{n}" in text for n, text in enumerate(texts)] == [True] * 10
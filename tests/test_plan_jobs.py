@@ -0,0 +1,48 @@
+import time
+import subprocess
+import sys
+import threading
+import pytest
+from plan_jobs import PlanJobQueue, SQLiteJobStore, QueueFull, HOST
+
+
+def dead_pid() -> int:
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+def test_depth_limit_is_shared_through_the_store(tmp_path):
+    path = str(tmp_path / 'jobs.db')
+    release = threading.Event()
+    first = PlanJobQueue(workers=1, max_depth=2, store=SQLiteJobStore(path))
+    second = PlanJobQueue(workers=1, max_depth=2, store=SQLiteJobStore(path))
+    try:
+        first.submit(release.wait)
+        second.submit(release.wait)
+
+        with pytest.raises(QueueFull):
+            first.submit(release.wait)
+        assert first.depth == second.depth == 2
+        assert first.rejected == 1
+    finally:
+        release.set()
+
+
+def test_jobs_of_a_dead_worker_are_failed(tmp_path):
+    store = SQLiteJobStore(str(tmp_path / 'jobs.db'))
+    queue = PlanJobQueue(workers=1, max_depth=1, store=store)
+    store.put({'id': 'orphan', 'status': 'running', 'created_at': time.time(), 'finished_at': None,
+               'owner': {'host': HOST, 'pid': dead_pid()}, 'meta': {}, 'result': None, 'error': None})
+
+    job = queue.get('orphan')
+    assert job['status'] == 'failed'
+    assert job['finished_at'] is not None
+
+    # The orphan no longer holds the only slot
+    job_id = queue.submit(lambda: {'status': 'success'})
+    for _ in range(100):
+        if queue.get(job_id)['status'] == 'done':
+            break
+        time.sleep(0.01)
+    assert queue.get(job_id)['result'] == {'status': 'success'}
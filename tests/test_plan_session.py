@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+from food_catalog import get_catalog
+from meal_optimizer import MealOptimizer
+from nutrient_targets import NutrientTarget
+from plan_session import MealPlanSession
+
+TARGETS = (NutrientTarget('Fiber', 25, np.inf),)
+REPLANS = [
+    dict(calorie_target=2000, protein_target=50, budget=200, pantry_items={'Rice': 300.0, 'Milk': 500.0}),
+    dict(calorie_target=2400, protein_target=65, budget=150, pantry_items={'Rice': 120.0, 'Milk': 0.0}),
+    dict(calorie_target=1800, protein_target=45, budget=300, pantry_items={'Rice': 300.0, 'Milk': 250.0}),
+]
+
+
+@pytest.fixture(scope='module')
+def optimizer():
+    return MealOptimizer(get_catalog())
+
+
+@pytest.mark.parametrize('pantries', [
+    [p['pantry_items'] for p in REPLANS],
+    [['Rice'], ['Rice', 'Dal'], []],
+])
+def test_retargeted_model_matches_a_fresh_build(optimizer, pantries):
+    food_idx = optimizer.catalog.indices_for('veg')
+    replans = [dict(params, pantry_items=pantry) for params, pantry in zip(REPLANS, pantries)]
+    first = optimizer._build_model(food_idx, nutrient_targets=TARGETS, **replans[0])
+
+    for params in replans[1:]:
+        built = optimizer._build_model(food_idx, nutrient_targets=TARGETS, **params)
+        moved, _, _ = optimizer._retarget_model(first, food_idx, **params)
+
+        for name in ('c', 'row_lower', 'row_upper', 'col_lower', 'col_upper'):
+            np.testing.assert_array_equal(getattr(moved, name), getattr(built, name), err_msg=name)
+        assert moved.A is first.A
+
+
+def test_replans_are_warm_and_match_a_cold_solve(optimizer):
+    session = MealPlanSession(optimizer)
+
+    for params in REPLANS:
+        warm = session.optimize_meal_plan(dietary_preference='veg', nutrient_targets=TARGETS, **params)
+        cold = optimizer.optimize_meal_plan(dietary_preference='veg', nutrient_targets=TARGETS, **params)
+
+        assert warm['status'] == cold['status'] == 'success'
+        assert warm['total_cost'] == pytest.approx(cold['total_cost'], abs=0.01)
+    assert (session.cold_solves, session.warm_solves) == (1, len(REPLANS) - 1)
@@ -0,0 +1,18 @@
+from food_catalog import get_catalog
+from solve_pool import _worker_solve
+
+PARAMS = {'calorie_target': 2000, 'protein_target': 50, 'budget': 200,
+          'dietary_preference': 'veg', 'pantry_items': [], 'nutrient_targets': ()}
+
+
+def test_worker_solves_against_the_callers_catalog():
+    result = _worker_solve('meal', PARAMS, get_catalog().digest)
+
+    assert result['status'] == 'success'
+
+
+def test_worker_refuses_a_different_catalog():
+    result = _worker_solve('meal', PARAMS, 'f' * 40)
+
+    assert result['status'] == 'error'
+    assert 'updated' in result['message']